@@ -0,0 +1,79 @@
+"""World throughput with timers firing while commands run.
+
+"thread" is the previous model: timers run on the game thread, and every
+database access takes the RWLock. "executor" attaches the game to the
+asyncio loop, which runs commands and timers alike without locking.
+
+Usage: uv run python benchmarks/bench_executor.py [objects] [seconds]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from mushroom.game import Game
+from mushroom.world import Thing
+
+TIMERS = 1000  # timers in flight, each one re-arms itself when it fires
+
+
+def populate(game, objects):
+    for i in range(objects):
+        game.db.add(Thing(f"thing {i}"))
+
+
+def command(game, rng, objects):
+    # what a typical command does: a few lookups by id, a reverse lookup
+    for _ in range(20):
+        obj = game.db.get(rng.randrange(objects))
+        game.db.get_id(obj)
+
+
+async def workload(game, objects, seconds):
+    rng = random.Random(42)
+    counts = {"commands": 0, "timers": 0}
+
+    def timer():
+        command(game, rng, objects)
+        counts["timers"] += 1
+        game.schedule(0.001, timer)
+
+    for _ in range(TIMERS):
+        game.schedule(0.001, timer)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        for _ in range(100):
+            command(game, rng, objects)
+        counts["commands"] += 100
+        await asyncio.sleep(0)  # let I/O (and timers, if attached) run
+    return counts
+
+
+async def run(model, objects, seconds):
+    game = Game()
+    populate(game, objects)
+    if model == "executor":
+        game.attach(asyncio.get_running_loop())
+    start = time.perf_counter()
+    counts = await workload(game, objects, seconds)
+    elapsed = time.perf_counter() - start
+    total = counts["commands"] + counts["timers"]
+    print(
+        f"{model:<9} {counts['commands'] / elapsed:>10,.0f} commands/s "
+        f"{counts['timers'] / elapsed:>10,.0f} timers/s "
+        f"{total / elapsed:>10,.0f} total/s"
+    )
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    for model in ("thread", "executor"):
+        asyncio.run(run(model, objects, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Cold start of the pickled and indexed world files.
+
+Usage: uv run python benchmarks/bench_indexed.py [objects]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mushroom.db import Database
+from mushroom.indexeddb import convert
+from mushroom.world import Player, Room, Thing
+
+
+def make_world(path, objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        thing = db.add(Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    db.add(Player("bob"))
+    db.dump(path)
+
+
+def startup(backend, path):
+    """In a fresh process: load, look at one room, list the players as a
+    login does, then search by name."""
+    if backend == "indexed":
+        from mushroom.indexeddb import IndexedDatabase
+
+        db = IndexedDatabase()
+    else:
+        db = Database()
+    start = time.perf_counter()
+    db.load(path)
+    [x.name for x in db.get(1).contents]
+    loaded = time.perf_counter()
+    db.search(type=Player)
+    listed = time.perf_counter()
+    db.search("bob")
+    searched = time.perf_counter()
+    db.save(path)
+    saved = time.perf_counter()
+    print(
+        f"{backend:<8} startup {(loaded - start) * 1000:>9.1f} ms,"
+        f" players {(listed - loaded) * 1000:>7.1f} ms,"
+        f" search by name {(searched - listed) * 1000:>7.1f} ms,"
+        f" save {(saved - searched) * 1000:>7.1f} ms"
+    )
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--startup":
+        startup(sys.argv[2], sys.argv[3])
+        return
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    with tempfile.TemporaryDirectory() as tmp:
+        pickled = os.path.join(tmp, "world.sav")
+        indexed = os.path.join(tmp, "world.idx")
+        make_world(pickled, objects)
+        start = time.perf_counter()
+        convert(pickled, indexed)
+        print(f"{objects} objects, converted in {time.perf_counter() - start:.2f}s")
+        for backend, path in (("pickle", pickled), ("indexed", indexed)):
+            subprocess.run(
+                [sys.executable, __file__, "--startup", backend, path], check=True
+            )
+
+
+if __name__ == "__main__":
+    main()
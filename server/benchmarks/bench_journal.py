@@ -0,0 +1,51 @@
+"""Cost of saving a few changes: full save vs journal append.
+
+Usage: uv run python benchmarks/bench_journal.py [objects] [changed]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from mushroom.db import Journal, journal_path
+from mushroom.game import Game
+from mushroom.world import Room, Thing
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    db = Game.get_instance().db
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        thing = db.add(Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    db.take_changes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "world.sav")
+        start = time.perf_counter()
+        db.dump(db_file)
+        full = time.perf_counter() - start
+
+        for room in rooms[:changed]:
+            room.description = "Changed."
+        journal = Journal(journal_path(db_file))
+        start = time.perf_counter()
+        journal.append(db, db.take_changes())
+        append = time.perf_counter() - start
+
+        start = time.perf_counter()
+        type(db)().load(db_file)
+        load = time.perf_counter() - start
+
+    print(f"{objects} objects, {changed} changed:")
+    print(f"  full save      {full * 1000:>10.1f} ms")
+    print(f"  journal append {append * 1000:>10.1f} ms")
+    print(f"  load + replay  {load * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
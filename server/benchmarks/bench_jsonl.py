@@ -0,0 +1,80 @@
+"""Backing up a world as JSON lines, against pickling it with Database.dump:
+saving and loading throughput, file size, and the memory saving takes on
+top of the world's.
+
+Usage: uv run python benchmarks/bench_jsonl.py [objects]
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from mushroom import jsonl
+from mushroom.commands import CustomCommand
+from mushroom.db import Database
+from mushroom.world import Examiner, Player, Room, Thing
+
+
+def make_world(objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i, room in enumerate(rooms):
+        room.exits.append(rooms[i // 2])  # a ring would be too deep to pickle
+        if i % 10 == 0:
+            room.custom_cmds["jump"] = CustomCommand("jump", "send('boing')")
+    for i in range(objects - len(rooms)):
+        if i % 100 == 0:
+            thing = db.add(Player(f"player {i}"))
+            thing.powers = [Examiner()]
+        else:
+            thing = db.add(Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    return db
+
+
+def timed(fn, *args):
+    gc.collect()
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def peak_memory(fn, *args):
+    """The most memory `fn` allocated at once."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    db = make_world(objects)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = os.path.join(tmp, "world.sav"), os.path.join(tmp, "world.jsonl")
+        savers = Database.dump, jsonl.dump
+        loaders = Database.load, jsonl.load
+        print(f"{objects} objects")
+        for label, path, save, load in zip(
+            ("pickle", "json lines"), paths, savers, loaders, strict=True
+        ):
+            saved = timed(save, db, path)
+            loaded = timed(load, Database(), path)
+            memory = peak_memory(save, db, path)
+            print(
+                f"{label:<11} save {objects / saved:>9,.0f} obj/s,"
+                f" load {objects / loaded:>9,.0f} obj/s,"
+                f" {os.path.getsize(path) / objects:>5.1f} bytes/obj,"
+                f" saving takes {memory / 2**20:>6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Loading a pickled world: per-object dummies, per-class defaults, and
+per-class defaults skipped thanks to the schema saved with the world.
+
+Usage: uv run python benchmarks/bench_load.py [objects]
+"""
+
+import gc
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from mushroom.commands import Lambda
+from mushroom.db import Database, track
+from mushroom.world import Object, Player, Room, Thing
+
+
+def legacy_setstate(self, odict):
+    """Object.__setstate__ as it was: a dummy object for each one loaded."""
+    self.__dict__.update({k: track(self, v) for k, v in odict.items()})
+    dummy = self._get_dummy()
+    for d in dummy.__dict__:
+        if d not in self.__dict__:
+            setattr(self, d, getattr(dummy, d))
+    for k, v in self.__dict__.items():
+        if isinstance(v, Lambda):
+            setattr(self, k, v.bind(self))
+
+
+def make_world(objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        cls = Player if i % 100 == 0 else Thing
+        thing = db.add(cls(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    return db
+
+
+def timed_load(path):
+    gc.collect()
+    db = Database()
+    start = time.perf_counter()
+    db.load(path)
+    return time.perf_counter() - start
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    db = make_world(objects)
+    with tempfile.TemporaryDirectory() as tmp:
+        with_schema = os.path.join(tmp, "world.sav")
+        without = os.path.join(tmp, "old.sav")
+        db.dump(with_schema)
+        with open(without, "wb") as f:
+            pickle.dump(db._objects, f)
+        del db
+
+        setstate = Object.__setstate__
+        Object.__setstate__ = legacy_setstate
+        try:
+            before = timed_load(without)
+        finally:
+            Object.__setstate__ = setstate
+        diff = timed_load(without)
+        skipped = timed_load(with_schema)
+    print(f"{objects} objects")
+    print(f"per-object dummies  {before:>7.2f}s")
+    print(f"per-class defaults  {diff:>7.2f}s")
+    print(f"schema saved        {skipped:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Count transport writes per command, with and without output coalescing.
+
+Usage: uv run python benchmarks/bench_output.py
+"""
+
+import asyncio
+import types
+
+from mushroom.client import Client
+from mushroom.config import Config
+from mushroom.game import Game
+from mushroom.server import ClientHandler
+from mushroom.world import Player, Room, Thing
+
+COMMANDS = ["look", "go cellar", "go attic", "look me", "say hello there"]
+
+
+class CountingWriter:
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 0)
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_world(game):
+    rooms = [Room(name) for name in ("hall", "cellar", "attic")]
+    for room in rooms:
+        room.exits = [r for r in rooms if r is not room]
+        for i in range(5):
+            thing = Thing(f"{room.name} thing {i}")
+            thing.location = room
+            room.contents.append(thing)
+            game.db.add(thing)
+        game.db.add(room)
+    return rooms[0]
+
+
+async def run(coalesce):
+    game = Game.get_instance()
+    server = types.SimpleNamespace(config=Config(coalesce_output=coalesce))
+    server.broadcast = server.broadcast_except = lambda *args: None
+    writer = CountingWriter()
+    handler = ClientHandler(server, writer)
+    client = Client(handler, "bench", game)
+    player = Player("bench")
+    game.db.add(player)
+    player.location = make_world(game)
+    player.location.contents.append(player)
+    player.play(client, game)
+    client.player = player
+
+    results = []
+    for cmd in COMMANDS:
+        writes = writer.writes
+        client.handle_input(cmd)
+        await asyncio.sleep(0)  # let the writer task run
+        results.append((cmd, writer.writes - writes))
+    handler.shutdown()
+    await handler.writer_task
+    return results
+
+
+def main():
+    for coalesce in (False, True):
+        print(f"coalesce_output={coalesce}")
+        for cmd, writes in asyncio.run(run(coalesce)):
+            print(f"  {cmd:<20} {writes} write(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Saving and loading throughput of world objects: the dict of fields that
+Object and Power used to pickle, against their (names, values) state.
+
+Usage: uv run python benchmarks/bench_pickle.py [objects]
+"""
+
+import contextlib
+import gc
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from mushroom.db import Database, _gc_paused, read_pickled
+from mushroom.world import Examiner, Object, Player, Room, Thing
+from mushroom.world.powers import Power
+
+
+def legacy_getstate(self):
+    return {k: getattr(self, k) for k in dir(self)}
+
+
+@contextlib.contextmanager
+def legacy_pickling():
+    """Object and Power pickled as they were."""
+    saved = [(cls, cls.__dict__["__reduce_ex__"]) for cls in (Object, Power)]
+    saved += [(cls, cls.__dict__["__getstate__"]) for cls in (Object, Power)]
+    for cls in (Object, Power):
+        del cls.__reduce_ex__
+        cls.__getstate__ = legacy_getstate
+    try:
+        yield
+    finally:
+        for cls, method in saved:
+            setattr(cls, method.__name__, method)
+
+
+def make_world(objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        if i % 100 == 0:
+            thing = db.add(Player(f"player {i}"))
+            thing.powers = [Examiner()]
+        else:
+            thing = db.add(Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    return db
+
+
+def save(db, path, protocol):
+    """Saves `db` to `path`. Returns the save rate, the pickling rate of
+    objects one by one, as the journal does, and the bytes per object."""
+    objects = len(db._objects)
+    gc.collect()
+    start = time.perf_counter()
+    with open(path, "wb") as f, _gc_paused():
+        pickle.dump(db._objects, f, protocol=protocol)
+    saved = time.perf_counter() - start
+    sample = list(db._objects.values())[: objects // 10]
+    start = time.perf_counter()
+    for obj in sample:
+        db.pickle_object(obj)
+    one_by_one = time.perf_counter() - start
+    return objects / saved, len(sample) / one_by_one, os.path.getsize(path) / objects
+
+
+def load(path, objects):
+    """The best load rate of a few."""
+    best = float("inf")
+    for _ in range(3):
+        gc.collect()
+        start = time.perf_counter()
+        read_pickled(path)
+        best = min(best, time.perf_counter() - start)
+    return objects / best
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    db = make_world(objects)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = os.path.join(tmp, "old.sav"), os.path.join(tmp, "new.sav")
+        with legacy_pickling():
+            before = save(db, paths[0], protocol=4)
+        after = save(db, paths[1], protocol=pickle.HIGHEST_PROTOCOL)
+        del db
+        rates = [load(path, objects) for path in paths]
+    print(f"{objects} objects")
+    for label, (saves, one_by_one, size), loads in zip(
+        ("fields dict", "names, values"), (before, after), rates, strict=True
+    ):
+        print(
+            f"{label:<14} save {saves:>9,.0f} obj/s, load {loads:>9,.0f} obj/s,"
+            f" {size:>5.1f} bytes/obj, one by one {one_by_one:>9,.0f} obj/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Connect/disconnect churn on the client register with 10k connected clients.
+
+Compares ClientRegister against the list-based register it replaced.
+
+Usage: uv run python benchmarks/bench_register.py [clients] [rounds]
+"""
+
+import random
+import sys
+import time
+
+from mushroom.server import ClientRegister
+
+
+class LinearRegister:
+    """The previous ClientRegister: a list plus a client -> id map."""
+
+    def __init__(self):
+        self.clients = []
+        self.idmap = {}
+        self.lastid = 0
+
+    def find_client(self, handler):
+        for client in self.clients:
+            if client.handler is handler:
+                return client
+        raise RuntimeError("Could not find a client for handler")
+
+    def get_client(self, cid):
+        for c, i in self.idmap.items():
+            if i == cid:
+                return c
+        return None
+
+    def add(self, client):
+        self.lastid += 1
+        self.clients.append(client)
+        self.idmap[client] = self.lastid
+
+    def delete(self, client):
+        del self.idmap[client]
+        self.clients.remove(client)
+
+
+class FakeClient:
+    def __init__(self):
+        self.handler = object()
+
+
+def churn(register, clients, rounds):
+    connected = [FakeClient() for _ in range(clients)]
+    for c in connected:
+        register.add(c)
+    rng = random.Random(42)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        # one disconnect, one connect, one @kick-style lookup and one
+        # broadcast_others-style handler lookup
+        i = rng.randrange(len(connected))
+        register.delete(connected[i])
+        connected[i] = FakeClient()
+        register.add(connected[i])
+        register.get_client(register.idmap[connected[rng.randrange(clients)]])
+        register.find_client(connected[rng.randrange(clients)].handler)
+    return time.perf_counter() - start
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    for cls in (LinearRegister, ClientRegister):
+        elapsed = churn(cls(), clients, rounds)
+        print(
+            f"{cls.__name__:<16} {clients} clients: "
+            f"{rounds / elapsed:>12,.0f} churn rounds/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Database.search with the type and name indexes, against a full scan.
+
+Usage: uv run python benchmarks/bench_search.py [objects]
+"""
+
+import sys
+import time
+
+from mushroom import util
+from mushroom.db import BaseObject, Database
+from mushroom.world import Config, Player, Room, Thing
+
+
+def scan(db, name="", type=BaseObject):
+    """The previous search: every object, one by one."""
+    return [
+        x
+        for x in db._objects.values()
+        if util.match_name(name, x.name) and isinstance(x, type)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    runs = 0
+    while (elapsed := time.perf_counter() - start) < 0.5 or runs < 3:
+        result = fn(*args)
+        runs += 1
+    return result, elapsed / runs
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db = Database()
+    db.add(Config("config"))
+    for i in range(20):
+        db.add(Player(f"player{i}"))
+    for i in range(objects // 10):
+        db.add(Room(f"room {i}"))
+    for i in range(objects - len(db._objects)):
+        db.add(Thing(f"{('red', 'blue', 'green')[i % 3]} thing {i}"))
+    start = time.perf_counter()
+    db.search("warm up")
+    print(f"{objects} objects, words sorted in {time.perf_counter() - start:.2f}s")
+
+    queries = [
+        ("players", "", Player),
+        ("config", "", Config),
+        ("rooms", "", Room),
+        ("exact name", "thing 123456", Thing),
+        ("word prefix", "playe", BaseObject),
+        ("no match", "dragon", BaseObject),
+    ]
+    for label, name, type in queries:
+        expected, before = timed(scan, db, name, type)
+        found, after = timed(db.search, name, type)
+        assert found == expected
+        print(
+            f"{label:<12} {len(found):>7} found, scan {before * 1000:>8.2f} ms,"
+            f" indexed {after * 1000:>8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Reads from other threads: through the database's RWLock, or from a
+snapshot, alone and while a writer adds and removes objects.
+
+Usage: uv run python benchmarks/bench_snapshot.py [objects] [readers]
+"""
+
+import sys
+import threading
+import time
+
+from mushroom.db import Database
+from mushroom.world import Player, Room, Thing
+
+
+def make_world(objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        thing = db.add(Player(f"player {i}") if i % 1000 == 0 else Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+    return db
+
+
+def locked_reads(db, ids, objects):
+    for obj_id in ids:
+        db.get(obj_id)
+    for obj in objects:
+        db.get_id(obj)
+
+
+def snapshot_reads(db, ids, objects):
+    for obj_id in ids:
+        db.snapshot().get(obj_id)
+    for obj in objects:
+        db.snapshot().get_id(obj)
+
+
+def rate(fn, *args, seconds=1.0):
+    """Calls to fn per second."""
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        fn(*args)
+        calls += 1
+    return calls / elapsed
+
+
+def contended(reads, db, readers, sample):
+    """Reads per second, from `readers` threads, while a writer adds and
+    removes objects."""
+    stop = threading.Event()
+    counts = [0] * readers
+
+    def read(n):
+        while not stop.is_set():
+            reads(db, *sample)
+            counts[n] += 1
+
+    def write():
+        while not stop.is_set():
+            db.remove(db.add(Thing("passing by")))
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    threads.append(threading.Thread(target=write))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) * len(sample[0]) * 2 / (time.perf_counter() - start)
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    db = make_world(objects)
+    ids = list(range(0, objects, objects // 1000))
+    sample = ids, [db.get(obj_id) for obj_id in ids]
+    views = {
+        "rwlock": (locked_reads, lambda: db),
+        "snapshot": (snapshot_reads, db.snapshot),
+    }
+    print(f"{objects} objects, {len(ids)} gets and get_ids a round")
+    for label, (reads, view) in views.items():
+        gets = rate(reads, db, *sample) * len(ids) * 2
+        players = rate(lambda view=view: view().search(type=Player))
+        by_name = rate(lambda view=view: view().search("thing 12345"))
+        threaded = contended(reads, db, readers, sample)
+        print(
+            f"{label:<9} get {gets:>10,.0f}/s, players {players:>7,.0f}/s,"
+            f" by name {by_name:>7,.0f}/s, {readers} readers and a writer"
+            f" {threaded:>10,.0f} gets/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Startup of the pickle and SQLite backends, and their memory use.
+
+Usage: uv run python benchmarks/bench_sqlite.py [objects]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mushroom.db import Database
+from mushroom.sqlitedb import migrate
+from mushroom.world import Room, Thing
+
+
+def make_world(path, objects):
+    db = Database()
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i in range(objects - len(rooms)):
+        thing = db.add(Thing(f"thing {i}"))
+        thing.location = rooms[i % len(rooms)]
+        thing.location.contents.append(thing)
+    db.dump(path)
+
+
+def startup(backend, path):
+    """In a fresh process: load, then look at one room."""
+    if backend == "sqlite":
+        from mushroom.sqlitedb import SqliteDatabase
+
+        db = SqliteDatabase()
+    else:
+        db = Database()
+    start = time.perf_counter()
+    db.load(path)
+    [x.name for x in db.get(1).contents]
+    elapsed = time.perf_counter() - start
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    rss = int(status["VmHWM"].split()[0]) / 1024
+    print(f"{backend:<7} startup {elapsed * 1000:>9.1f} ms, peak RSS {rss:>7.1f} MB")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--startup":
+        startup(sys.argv[2], sys.argv[3])
+        return
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        pickled = os.path.join(tmp, "world.sav")
+        sqlite = os.path.join(tmp, "world.db")
+        make_world(pickled, objects)
+        start = time.perf_counter()
+        migrate(pickled, sqlite)
+        print(f"{objects} objects, migrated in {time.perf_counter() - start:.2f}s")
+        for backend, path in (("pickle", pickled), ("sqlite", sqlite)):
+            subprocess.run(
+                [sys.executable, __file__, "--startup", backend, path], check=True
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Sweeping a large world: how long it takes, and its longest slice, next to
+walking the world in one go.
+
+Usage: uv run python benchmarks/bench_sweep.py [objects] [slice in ms]
+"""
+
+import sys
+import time
+
+from mushroom import util
+from mushroom.game import Game
+from mushroom.sweep import Sweep
+from mushroom.world import Player, Room, Thing
+
+
+def make_world(db, objects):
+    rooms = [db.add(Room(f"room {i}")) for i in range(objects // 10)]
+    for i, room in enumerate(rooms):
+        room.exits.append(rooms[i - 1])
+    for i in range(objects - len(rooms)):
+        thing = db.add(Player(f"player {i}") if i % 1000 == 0 else Thing(f"thing {i}"))
+        util.moveto(thing, rooms[i % len(rooms)])
+        if i % 100 == 0:
+            util.moveto(thing, None)  # lost
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    budget = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    db = Game.get_instance().db
+    make_world(db, objects)
+
+    start = time.perf_counter()
+    sweep = Sweep(db)
+    while not sweep.step(float("inf")):
+        pass
+    print(f"{objects} objects, {len(sweep.unreachable)} unreachable")
+    print(f"in one go      {time.perf_counter() - start:>6.2f}s")
+
+    start = time.perf_counter()
+    sweep = Sweep(db)
+    while not sweep.step(budget):
+        pass
+    print(
+        f"in slices      {time.perf_counter() - start:>6.2f}s, {sweep.slices} slices"
+        f" of at most {sweep.longest * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Insert, cancel and fire rates of Game.schedule timers.
+
+Compares the heap-based timers against the sorted list they replaced.
+
+Usage: uv run python benchmarks/bench_timers.py [timers]
+"""
+
+import asyncio
+import bisect
+import random
+import sys
+import time
+
+from mushroom.game import Game
+
+
+class ListTimers:
+    """The previous timers: a list kept sorted with bisect.insort."""
+
+    def __init__(self):
+        self.timers = []
+
+    def schedule(self, when, event):
+        entry = (time.monotonic() + when, id(event), event)
+        bisect.insort(self.timers, entry)
+        return entry
+
+    def cancel(self, entry):
+        # there was no cancelling, this is what one would have done
+        del self.timers[bisect.bisect_left(self.timers, entry)]
+
+    def fire(self):
+        now = time.monotonic()
+        while self.timers:
+            when, _, evt = self.timers[0]
+            if when > now:
+                return
+            del self.timers[0]
+            evt()
+
+
+class HeapTimers:
+    def __init__(self, game):
+        self.game = game
+
+    def schedule(self, when, event):
+        return self.game.schedule(when, event)
+
+    def cancel(self, timer):
+        timer.cancel()
+
+    def fire(self):
+        self.game._handle_timers()
+
+
+def noop():
+    pass
+
+
+def measure(timers, count):
+    rng = random.Random(42)
+    # all in the past: they fire as soon as we look, in random order
+    delays = [-rng.random() for _ in range(count)]
+    rates = {}
+
+    start = time.perf_counter()
+    handles = [timers.schedule(d, noop) for d in delays]
+    rates["insert"] = count / (time.perf_counter() - start)
+
+    rng.shuffle(handles)
+    start = time.perf_counter()
+    for handle in handles[: count // 2]:
+        timers.cancel(handle)
+    rates["cancel"] = count // 2 / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    timers.fire()
+    rates["fire"] = (count - count // 2) / (time.perf_counter() - start)
+    return rates
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    game = Game()
+    game.attach(asyncio.get_running_loop())
+    for name, timers in (("list", ListTimers()), ("heap", HeapTimers(game))):
+        rates = measure(timers, count)
+        print(
+            f"{name:<5} {count} timers: "
+            + " ".join(f"{k} {v:>12,.0f}/s" for k, v in rates.items())
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -95,6 +95,13 @@ class Client:
         self.player = self.game.db.get(self.player.id)
         self.player._client = self
 
+    def resume(self, player):
+        """Play as `player` again, e.g. after a server restart."""
+        self.player = player
+        self.name = player.name
+        player.play(self, self.game)
+        self.cmds = [c for c in self.cmds if not isinstance(c, PlayCommand)]
+
     def add_cmd(self, command):
         self.cmds.append(command)
 
@@ -107,6 +114,13 @@ class Client:
         except OSError:
             logger.error(f"Could not send to {self.name}")
 
+    def write(self, data):
+        """Send output that was already encoded, e.g. for a broadcast."""
+        try:
+            self.handler.write(data)
+        except OSError:
+            logger.error(f"Could not send to {self.name}")
+
     def broadcast(self, msg):
         self.handler.broadcast(f"{msg}")
 
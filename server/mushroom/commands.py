@@ -6,6 +6,7 @@ import types
 
 from mushroom.db import proxify
 from mushroom.util import ActionFailed, escape
+from mushroom.util.serialize import Serializable, game_ref, serialize
 
 logger = logging.getLogger(__name__)
 DEFAULT_FLAGS = "o"  # (o)wner (p)eer (i)nterior
@@ -58,13 +59,17 @@ class BoundCode:
     def bind(self, owner):
         return self.code.bind(owner)
 
+    def _serialize(self, ref=game_ref):
+        # bound again to the object holding it, when that's loaded
+        return serialize(self.code, ref)
+
     def run(self, caller=None, **kwargs):
         return self.code.run(self.owner, caller=caller, **kwargs)
 
     __call__ = run
 
 
-class Code:
+class Code(Serializable):
     fancy_name = "code"
 
     def __init__(self, code):
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -8,8 +8,31 @@ class Config:
     listen_address: str = ""  # empty means to listen on all addresses
     listen_port: int = 1337
 
+    # processes handling client connections, 0 to handle them in-process
+    frontend_workers: int = 0
+    # unix socket the front-end processes use to reach the world
+    frontend_socket: str = "mushroomd.sock"
+
+    # offer MCCP2 (zlib compression) to telnet clients
+    telnet_mccp: bool = False
+
+    # native WebSocket listener for browser clients
+    websocket_enabled: bool = False
+    websocket_address: str = ""  # empty means to listen on all addresses
+    websocket_port: int = 1338
+
     motd_file: str = "MOTD"
     db_file: str = "world.sav"
+    # "pickle" keeps the whole world in memory, and saves it to db_file.
+    # "sqlite" keeps it in db_file as an SQLite database, loaded as needed.
+    # "indexed" keeps it in db_file as an indexed file, loaded as needed.
+    db_backend: str = "pickle"
+    # objects the sqlite and indexed backends keep loaded, besides those in use
+    db_cache_size: int = 10_000
+    # attributes the pickle backend indexes, for db.query in soft code
+    db_indexes: list[str] = field(
+        default_factory=lambda: ["flags", "location", "parent"]
+    )
 
     op_password: str = "lol"
     op_command_prefix: str = "@"
@@ -19,7 +42,59 @@ class Config:
 
     log_file: str = "server.log"
 
+    # seconds between autosaves, at most
     autosave_period: int = 300
+    # save sooner when that many objects changed since the last save...
+    autosave_changes: int = 1000
+    # ...but never more often than this
+    autosave_min_period: int = 30
+    # "inline" pickles the world in the server process, pausing the game.
+    # "fork" pickles a copy-on-write snapshot in a child process instead.
+    save_mode: str = "inline"
+
+    # append changed objects to a journal next to db_file, every
+    # journal_period seconds, instead of saving the whole world. It's folded
+    # into a full save once it grows past journal_compact_size bytes.
+    journal: bool = False
+    journal_period: float = 5.0
+    journal_compact_size: int = 16 << 20
+
+    # look for objects nothing in the world refers to any more, every
+    # sweep_period seconds (0 for never), sweep_slice seconds at a time in
+    # between the rest. With sweep_reclaim, they're removed from the world.
+    sweep_period: float = 0.0
+    sweep_slice: float = 0.005
+    sweep_reclaim: bool = False
+
+    # copy lists and dicts assigned to world objects into tracked ones, so
+    # that changing them in place counts as a change. The copy is no longer
+    # the list or dict that was assigned. Off, they're kept as they are, but
+    # then only full saves of the pickle backend, without the journal, and
+    # sweeps that don't reclaim are safe.
+    track_containers: bool = True
+
+    # seconds @restart waits for output to flush and the new process to start
+    restart_timeout: float = 30.0
+
+    # bytes of output buffered per client before the overflow policy kicks in
+    output_queue_limit: int = 1 << 20
+    # what to do with a client that can't keep up: "disconnect" or "discard"
+    output_overflow: str = "disconnect"
+    # join all output produced during one loop iteration into a single write
+    coalesce_output: bool = True
+
+    # longer input lines are ignored
+    max_line_length: int = 4096
+    # commands per second allowed for each client (0 for no limit)...
+    input_rate: float = 0.0
+    # ...with bursts of up to this many commands
+    input_burst: int = 30
+    # what to do with commands over the rate: "queue", "drop" or "disconnect"
+    input_overflow: str = "queue"
+    # commands a client can have waiting before we stop reading its input
+    input_queue_limit: int = 50
+    # seconds of commands to run before letting the server do network I/O
+    command_tick_budget: float = 0.05
 
     portal_ip: str = "0.0.0.0"
     portal_port: int = 1339
@@ -1,20 +1,65 @@
+import bisect
+import contextlib
+import gc
+import importlib
+import io
+import itertools
 import os
 import pickle
 import re
+import struct
+import threading
+import time
+import zlib
 
 from mushroom import util
 
+# journal batches: length and CRC32 of the pickled batch
+BATCH_HEADER = struct.Struct("!II")
 
-def compat_fw():
-    # register all classes
 
-    # old _objects have fw.world.* classes
-    import sys
+def class_name(cls):
+    return f"{cls.__module__}:{cls.__qualname__}"
 
-    for module in list(sys.modules):
-        if module.startswith("mushroom"):
-            oldmodule = module.replace("mushroom", "fw")
-            sys.modules[oldmodule] = sys.modules[module]
+
+def resolve_class(name):
+    module, _, qualname = name.partition(":")
+    obj = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+# first thing in a pickled world: the schema of each class it has
+SCHEMA_TAG = "mushroom-schema"
+
+# classes whose saved objects have all the fields of new ones, while loading
+CURRENT_SCHEMA = set()
+
+
+@contextlib.contextmanager
+def _schema_current(schema):
+    """Lets the classes whose fields didn't change since `schema` was
+    saved skip looking for missing fields."""
+    for name, fields in schema.items():
+        # a class that's gone has nothing to load anyway
+        with contextlib.suppress(ImportError, AttributeError):
+            cls = resolve_class(name)
+            if getattr(cls, "_schema", None) is not None and cls._schema() == fields:
+                CURRENT_SCHEMA.add(cls)
+    try:
+        yield
+    finally:
+        CURRENT_SCHEMA.clear()
+
+
+class _WorldUnpickler(pickle.Unpickler):
+    """Also loads worlds saved when mushroom was called fw."""
+
+    def find_class(self, module, name):
+        if module == "fw" or module.startswith("fw."):
+            module = f"mushroom{module[2:]}"
+        return super().find_class(module, name)
 
 
 def proxify(object):
@@ -30,72 +75,926 @@ class BaseObject:
         self.name = name
 
 
+class TrackedList(list):
+    """A list attribute of a world object, that marks it as changed."""
+
+    __slots__ = ("owner",)
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(self),)  # saved files only ever hold plain lists
+
+    def _changed(self):
+        self.owner._touch()
+
+
+class TrackedDict(dict):
+    """A dict attribute of a world object, that marks it as changed."""
+
+    __slots__ = ("owner",)
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(self),)
+
+    def _changed(self):
+        self.owner._touch()
+
+
+def _mutator(cls, name):
+    method = getattr(cls.__mro__[1], name)
+
+    def mutate(self, *args, **kwargs):
+        self._changed()
+        return method(self, *args, **kwargs)
+
+    mutate.__name__ = name
+    setattr(cls, name, mutate)
+
+
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    _mutator(TrackedList, _name)
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__ior__",
+    "pop",
+    "popitem",
+    "clear",
+    "update",
+    "setdefault",
+):
+    _mutator(TrackedDict, _name)
+
+
+_TRACKED = {list: TrackedList, dict: TrackedDict}
+
+
+def track(owner, value):
+    """Returns `value`, made to tell `owner` when it changes, if it can.
+
+    Lists and dicts are copied into a tracked version: changing the one
+    that was passed in doesn't change `owner`, nor mark it as changed.
+    """
+    if (cls := _TRACKED.get(type(value))) is None:
+        return value
+    tracked = cls(value)
+    tracked.owner = owner
+    return tracked
+
+
+_FIELD_NAMES = {}  # one tuple for each set of field names seen
+_PLAIN = {TrackedList: list, TrackedDict: dict}
+
+
+def saved_state(obj):
+    """The public fields of `obj`, as a (names, values) pair of tuples.
+
+    Objects with the same fields share the tuple of names, so a pickle only
+    holds it once, and refers to it for the others. Tracked lists and dicts
+    are saved as plain ones, which is also what they pickle as, only much
+    cheaper than going through their __reduce_ex__.
+    """
+    fields = obj.__dict__
+    names = tuple(k for k in fields if k[0] != "_")
+    names = _FIELD_NAMES.setdefault(names, names)
+    values = [fields[k] for k in names]
+    for i, value in enumerate(values):
+        if (plain := _PLAIN.get(type(value))) is not None:
+            values[i] = plain(value)
+    return names, tuple(values)
+
+
+def state_items(state):
+    """The (name, value) pairs of what saved_state returned, or of the
+    dict that older saves hold instead."""
+    if type(state) is tuple:
+        return zip(*state, strict=True)
+    return state.items()
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Pickling the world allocates a lot and frees nothing, so the garbage
+    collector would spend its time traversing the world for nothing."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_pickled(db_file):
+    """Loads the objects of a pickled world, by id."""
+    with open(db_file, "rb") as f, _gc_paused():
+        objects = _WorldUnpickler(f).load()
+        if type(objects) is tuple and objects[0] == SCHEMA_TAG:
+            with _schema_current(objects[1]):
+                objects = _WorldUnpickler(f).load()
+    return objects
+
+
+def journal_path(db_file):
+    return f"{db_file}.journal"
+
+
+class Journal:
+    """
+    The changes made since the last full save of the world.
+
+    Each batch of changes is appended as a pickled list of (id, state)
+    records, where state is the pickled object, or None if it was removed.
+    References to other objects are pickled as their ids. Replaying a batch
+    twice does no harm, and a batch torn by a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, db, ids):
+        records = []
+        for obj_id in sorted(ids):
+            obj = db.get(obj_id)
+            records.append((obj_id, None if obj is None else db.pickle_object(obj)))
+        data = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.path, "ab") as f:
+            f.write(BATCH_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def batches(self):
+        try:
+            f = open(self.path, "rb")  # noqa: SIM115
+        except FileNotFoundError:
+            return
+        with f:
+            while len(header := f.read(BATCH_HEADER.size)) == BATCH_HEADER.size:
+                size, crc = BATCH_HEADER.unpack(header)
+                data = f.read(size)
+                if len(data) != size or zlib.crc32(data) != crc:
+                    return  # torn by a crash, nothing after it was flushed
+                yield pickle.loads(data)
+
+    def replay(self, db):
+        for records in self.batches():
+            for obj_id, state in records:
+                db.restore_object(obj_id, state)
+
+    def trim(self, offset):
+        """Drops the first `offset` bytes, which a full save made obsolete."""
+        if offset >= self.size:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tempfile = f"{self.path}.tmp"
+        with open(self.path, "rb") as src, open(tempfile, "wb") as dst:
+            src.seek(offset)
+            dst.write(src.read())
+        os.replace(tempfile, self.path)
+
+
+class NameIndex:
+    """
+    The objects of the world by the lowercase words of their names.
+
+    Words are kept sorted, so that the objects with a word starting with a
+    given prefix can be found without looking at the others. New words are
+    merged in on the next lookup.
+    """
+
+    def __init__(self):
+        self._ids = {}  # word -> ids of the objects whose name has it
+        self._names = {}  # id -> its words
+        self._sorted = []  # the words, some of them possibly gone
+        self._new = set()  # words not in _sorted yet
+        self._gone = 0
+
+    @staticmethod
+    def words(name):
+        if not name:
+            return ()
+        words = set(name.lower().split())
+        if not name.isascii():
+            # match_name also lowers words one by one, which can differ
+            words.update(w.lower() for w in name.split())
+        return tuple(words)
+
+    def add(self, obj_id, name):
+        if obj_id in self._names:
+            self.remove(obj_id)
+        if not (words := self.words(name)):
+            return
+        self._names[obj_id] = words
+        for word in words:
+            if (ids := self._ids.get(word)) is None:
+                ids = self._ids[word] = set()
+                self._new.add(word)
+            ids.add(obj_id)
+
+    def remove(self, obj_id):
+        for word in self._names.pop(obj_id, ()):
+            ids = self._ids[word]
+            ids.discard(obj_id)
+            if not ids:
+                del self._ids[word]
+                self._gone += 1
+
+    @property
+    def dirty(self):
+        return bool(self._new) or self._gone > len(self._sorted) // 2
+
+    def refresh(self):
+        """Merges in the new words. Callers hold the write lock."""
+        if self._gone > len(self._sorted) // 2:
+            self._sorted = sorted(self._ids)
+            self._gone = 0
+        elif self._new:
+            self._sorted += sorted(self._new)
+            self._sorted.sort()  # two sorted runs, timsort merges them
+        self._new = set()
+
+    def candidates(self, short):
+        """The ids of the objects whose name `short` may match, or None if
+        it could be any of them."""
+        if not (words := short.lower().split()) or short[0].isspace():
+            return None
+        # util.match_name matches whole words, a prefix of a word, or a prefix
+        # of the whole name: in all three, the name has every word but the
+        # last one, and a word starting with the last one
+        sets = [self._ids.get(word, ()) for word in words[:-1]]
+        sets.append(self._prefixed(words[-1]))
+        sets.sort(key=len)
+        return set(sets[0]).intersection(*sets[1:])
+
+    def _prefixed(self, prefix):
+        found = set()
+        i = bisect.bisect_left(self._sorted, prefix)
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix):
+            if (ids := self._ids.get(self._sorted[i])) is not None:
+                found |= ids
+            i += 1
+        # not merged in yet: only snapshots search without refreshing first
+        for word in self._new:
+            if word.startswith(prefix) and (ids := self._ids.get(word)) is not None:
+                found |= ids
+        return found
+
+
+class AttrIndex:
+    """
+    The objects of the world by the value of one of their own attributes.
+
+    An object with a list of values (like flags) is found under each of
+    them. Values that can't be hashed aren't indexed, the objects that have
+    some are always candidates.
+    """
+
+    def __init__(self, attr):
+        self.attr = attr
+        self._ids = {}  # value -> ids
+        self._keys = {}  # id -> its values
+        self._loose = set()  # ids with values that can't be indexed
+
+    def add(self, obj_id, obj):
+        self.remove(obj_id)
+        if (value := obj.__dict__.get(self.attr, _MISSING)) is _MISSING:
+            return
+        keys = value if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+        indexed = []
+        for key in keys:
+            try:
+                self._ids.setdefault(key, set()).add(obj_id)
+            except TypeError:
+                self._loose.add(obj_id)
+            else:
+                indexed.append(key)
+        self._keys[obj_id] = indexed
+
+    def remove(self, obj_id):
+        self._loose.discard(obj_id)
+        for key in self._keys.pop(obj_id, ()):
+            ids = self._ids[key]
+            ids.discard(obj_id)
+            if not ids:
+                del self._ids[key]
+
+    def candidates(self, value):
+        """The ids of the objects that may have `value`, or None if the index
+        can't tell."""
+        try:
+            return self._ids.get(value, set()) | self._loose
+        except TypeError:
+            return None
+
+
+_MISSING = object()
+
+# query() keywords that stand for another attribute
+QUERY_ALIASES = {"flag": "flags"}
+
+
+def _has(obj, attr, value):
+    """Whether the own attribute `attr` of `obj` is, or holds, `value`."""
+    if (own := obj.__dict__.get(attr, _MISSING)) is _MISSING:
+        return False
+    if isinstance(own, (list, tuple, set, frozenset)):
+        return value in own
+    return own == value
+
+
+def _take_state(obj, loaded):
+    """Moves the attributes of `loaded` over to `obj`."""
+    for attr, value in loaded.__dict__.items():
+        if isinstance(value, (TrackedList, TrackedDict)):
+            value.owner = obj
+        obj.__dict__[attr] = value
+
+
+class _UndoLog:
+    """What Database.transaction needs to put the world back as it was."""
+
+    def __init__(self, changed):
+        self.thread = threading.get_ident()
+        self.changed = changed  # ids changed before the transaction
+        self.entries = []  # (action, id, object, fields), oldest first
+        self.saved = set()  # ids of the objects whose fields are saved
+
+    def added(self, obj_id, obj):
+        self.entries.append(("add", obj_id, obj, None))
+        self.saved.add(obj_id)  # removing it puts things back
+
+    def removed(self, obj_id, obj):
+        self.entries.append(("remove", obj_id, obj, None))
+
+    def touched(self, obj_id, obj):
+        """Saves the fields of `obj`, the first time it changes."""
+        if obj_id in self.saved:
+            return
+        self.saved.add(obj_id)
+        fields = {}
+        for k, v in obj.__dict__.items():
+            if k[0] != "_":
+                # lists and dicts change in place, their contents are saved too
+                plain = _PLAIN.get(type(v))
+                fields[k] = v, None if plain is None else plain(v)
+        self.entries.append(("fields", obj_id, obj, fields))
+
+
+def _restore_fields(obj, fields):
+    """Puts back what _UndoLog.touched saved, as it was."""
+    current = obj.__dict__
+    for k in [k for k in current if k[0] != "_"]:
+        del current[k]
+    for k, (value, contents) in fields.items():
+        if contents is not None:  # not through the tracked methods
+            if type(value) is TrackedList:
+                list.__setitem__(value, slice(None), contents)
+            else:
+                dict.clear(value)
+                dict.update(value, contents)
+        current[k] = value
+
+
+class _ObjectPickler(pickle.Pickler):
+    """Pickles one object, with the other world objects by reference."""
+
+    def __init__(self, file, db, obj):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.ids = db._ids  # not get_id, which takes the lock every time
+        self.obj = obj
+
+    def persistent_id(self, obj):
+        if obj is self.obj or not isinstance(obj, BaseObject):
+            return None
+        if (obj_id := self.ids.get(obj)) is None:
+            return None  # not in the world, save a copy
+        return obj_id, type(obj)
+
+
+class _ObjectUnpickler(_WorldUnpickler):
+    def __init__(self, file, db):
+        super().__init__(file)
+        self.db = db
+
+    def persistent_load(self, pid):
+        return self.db.reference(*pid)
+
+
+class Snapshot:
+    """
+    Which objects the database had, and their ids, as of `version`.
+
+    It never changes, so any thread can read it without locking. Only the
+    ids are frozen: the objects are the live ones, whose attributes the
+    world's executor may be changing.
+    """
+
+    def __init__(self, db, version, objects, ids, types):
+        self.version = version
+        self._db = db
+        self._objects = objects
+        self._ids = ids
+        self._types = types  # class -> frozenset of ids
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, obj_id):
+        return self._objects.get(_as_id(obj_id))
+
+    def get_id(self, obj):
+        return self._ids.get(obj)
+
+    def search(self, name="", type=BaseObject):
+        """Like Database.search. The name index is the database's: once
+        objects were added or removed, names are matched one at a time."""
+        if (ids := self._db._name_candidates(name, self.version)) is None:
+            ids = set().union(
+                *(ids for cls, ids in self._types.items() if issubclass(cls, type))
+            )
+        any_name = not name.split()
+        found = []
+        for obj_id in sorted(ids):
+            if (obj := self._objects.get(obj_id)) is None or not isinstance(obj, type):
+                continue
+            if any_name or util.match_name(name, obj.name):
+                found.append(obj)
+        return found
+
+
+def _as_id(obj_id):
+    """`obj_id`, or the id of a "#123" reference, or None."""
+    if isinstance(obj_id, str) and obj_id.startswith("#"):
+        try:
+            return int(obj_id[1:])
+        except ValueError:
+            return None
+    return obj_id
+
+
 class Database:
     """The database holding the world."""
 
+    # saves only write what changed, no need to journal or fork for them
+    incremental = False
+    # a forked child can save it
+    fork_save = True
+    # has all its objects in memory, for snapshot
+    snapshots = True
+    # lists and dicts assigned to objects are copied into tracked ones, see
+    # track. Without, changing them in place goes unnoticed.
+    track_containers = True
+
     def __init__(self):
         self._objects = {}
         self._ids = {}  # use a reverse map
         self._next_id = 0
         self._lock = util.RWLock()
+        self._changed = set()  # ids of the objects changed since the last save
+        self._types = {}  # class -> ids of its instances, not of subclasses
+        self._names = NameIndex()
+        self._renamed = set()  # ids to index again, their name changed
+        self._names_version = 0  # odd while _names changes, see _name_candidates
+        self._attrs = {}  # attribute -> AttrIndex, see add_index
+        self._stale = set()  # ids to index again in _attrs
+        # odd while objects are added or removed, see snapshot
+        self._version = 0
+        self._snapshot = None
+        self._transaction = None  # undo log of the transaction going on
+        self._marking = None  # ids changed or added while a Sweep marks
+
+    def single_owner(self):
+        """Stop locking: from now on, only one thread uses the database."""
+        self._lock = util.NullLock()
+
+    def snapshot(self):
+        """The objects as of now, in a view any thread can read, without
+        waiting for the world's executor or taking the lock.
+
+        Adding and removing objects only bumps the version, the view is
+        copied the first time it's asked for after that.
+        """
+        if not self.snapshots:
+            raise TypeError(f"{type(self).__name__} has no snapshots")
+        while True:
+            version = self._version
+            if (view := self._snapshot) is not None and view.version == version:
+                return view
+            if version % 2 == 0:
+                # copies of the dicts are made in one go, unlike iterating
+                types = dict(self._types)
+                view = Snapshot(
+                    self,
+                    version,
+                    self._objects.copy(),
+                    self._ids.copy(),
+                    {cls: frozenset(ids) for cls, ids in types.items()},
+                )
+                if self._version == version:  # no writer came in between
+                    self._snapshot = view
+                    return view
+            time.sleep(0)  # let the writer finish
 
     def add(self, obj):
         if not isinstance(obj, BaseObject):
             raise TypeError("Trying to add random trash to the DB!")
         with self._lock.r:
-            self._objects[self._next_id] = obj
-            self._ids[obj] = self._next_id
-            self._next_id += 1
+            self._version += 1
+            try:
+                self._objects[self._next_id] = obj
+                self._ids[obj] = self._next_id
+                self._index(self._next_id, obj)
+                self._changed.add(self._next_id)
+                if self._transaction is not None:
+                    self._transaction.added(self._next_id, obj)
+                if self._marking is not None:
+                    self._marking.add(self._next_id)
+                self._next_id += 1
+            finally:
+                self._version += 1
         return obj
 
     def remove(self, obj):
         with self._lock.w:
             if type(obj) is int:
-                del self._ids[self._objects[obj]]
-                del self._objects[obj]
+                obj_id, obj = obj, self._fetch(obj)
             else:
-                del self._objects[self._ids[obj]]
+                obj_id = self._ids[obj]
+            self._version += 1
+            try:
                 del self._ids[obj]
+                del self._objects[obj_id]
+                self._unindex(obj_id, obj)
+                self._changed.add(obj_id)
+                if self._transaction is not None:
+                    self._transaction.removed(obj_id, obj)
+            finally:
+                self._version += 1
 
-    def get(self, obj_id):
-        if isinstance(obj_id, str) and obj_id.startswith("#"):
+    def touch(self, obj, attr=None):
+        """Marks `obj` as changed, if it's in the database.
+
+        `attr` is the attribute about to be set, if that's what changes.
+        """
+        if (obj_id := self._ids.get(obj)) is not None:
+            if self._transaction is not None:
+                self._transaction.touched(obj_id, obj)
+            if self._marking is not None:
+                self._marking.add(obj_id)
+            self._changed.add(obj_id)
+            self._touched(obj_id, attr)
+
+    # transactions
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Makes the changes of the block happen all together, or not at all.
+
+        If the block raises, the objects it added are removed, the ones it
+        removed are back, and the attributes it changed are as they were.
+        Other threads wait for it to be done, saves too, so that its changes
+        are saved all at once. A transaction within another is part of it.
+        """
+        if (log := self._transaction) is not None and log.thread == (
+            threading.get_ident()
+        ):
+            yield
+            return
+        with self._lock.w:
+            log = self._transaction = _UndoLog(set(self._changed))
             try:
-                obj_id = int(obj_id[1:])
-            except ValueError:
-                return None
+                yield
+            except BaseException:
+                self._transaction = None
+                self._rollback(log)
+                raise
+            self._transaction = None
+            self._reindex()  # once for the whole batch
+
+    def _rollback(self, log):
+        for action, obj_id, obj, fields in reversed(log.entries):
+            if action == "add":
+                self.remove(obj)
+            elif action == "remove":
+                self._unremove(obj_id, obj)
+            else:
+                _restore_fields(obj, fields)
+                if self._ids.get(obj) == obj_id:
+                    self._unindex(obj_id, obj)
+                    self._index(obj_id, obj)
+        self._changed = log.changed
+
+    def _unremove(self, obj_id, obj):
+        """Puts back an object that was removed."""
+        self._put(obj_id, obj)
+
+    # indexes for search and query
+
+    def _touched(self, obj_id, attr):
+        if attr == "name":
+            self._renamed.add(obj_id)  # the new name isn't set yet
+        if self._attrs and (attr is None or attr in self._attrs):
+            self._stale.add(obj_id)  # a list or dict of it may change too
+
+    def add_index(self, attr):
+        """Indexes the objects by their own value of `attr`, for query."""
+        with self._lock.w:
+            if attr in self._attrs:
+                return
+            index = self._attrs[attr] = AttrIndex(attr)
+            for obj_id, obj in self._objects.items():
+                index.add(obj_id, obj)
+
+    def _index(self, obj_id, obj):
+        self._types.setdefault(type(obj), set()).add(obj_id)
+        self._names_version += 1
+        self._names.add(obj_id, obj.__dict__.get("name"))
+        self._names_version += 1
+        for index in self._attrs.values():
+            index.add(obj_id, obj)
+
+    def _unindex(self, obj_id, obj):
+        if ids := self._types.get(type(obj)):
+            ids.discard(obj_id)
+        self._names_version += 1
+        self._names.remove(obj_id)
+        self._names_version += 1
+        self._renamed.discard(obj_id)
+        for index in self._attrs.values():
+            index.remove(obj_id)
+        self._stale.discard(obj_id)
+
+    def _reindex(self):
+        """Brings the indexes up to date. Callers hold the write lock."""
+        self._names_version += 1
+        try:
+            for obj_id in self._renamed:
+                if (obj := self._objects.get(obj_id)) is not None:
+                    self._names.add(obj_id, obj.__dict__.get("name"))
+            self._renamed.clear()
+            self._names.refresh()
+        finally:
+            self._names_version += 1
+        for obj_id in self._stale:
+            if (obj := self._objects.get(obj_id)) is not None:
+                for index in self._attrs.values():
+                    index.add(obj_id, obj)
+        self._stale.clear()
+
+    def _refresh(self):
+        if self._renamed or self._stale or self._names.dirty:
+            with self._lock.w:
+                self._reindex()
+
+    def _name_candidates(self, name, version):
+        """NameIndex.candidates, for a snapshot at `version`, from any thread.
+
+        None if `name` could be any object's, or if objects were added or
+        removed since `version`: the index no longer has the snapshot's.
+        """
+        while self._version == version:
+            names_version = self._names_version
+            if names_version % 2 == 0:
+                try:
+                    ids = self._names.candidates(name)
+                    renamed = set(self._renamed)  # not in the index yet
+                except RuntimeError:
+                    pass  # changed as we read it, the versions tell
+                else:
+                    if (self._names_version, self._version) == (names_version, version):
+                        return None if ids is None else ids | renamed
+            time.sleep(0)  # let the writer finish
+        return None
+
+    def _lookup(self, obj_id):
+        """The object an index has the id of."""
+        return self._objects[obj_id]
+
+    def _with_type(self, type):
+        """The ids of the instances of `type` and its subclasses, by class."""
+        return [ids for cls, ids in self._types.items() if issubclass(cls, type)]
+
+    @property
+    def changes(self):
+        """How many objects changed since the last save."""
+        return len(self._changed)
+
+    def take_changes(self):
+        """Returns the ids of the objects changed, and forgets about them."""
+        with self._lock.w:  # not halfway through a transaction
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def restore_changes(self, ids):
+        """Marks objects as changed again, when saving them failed."""
+        self._changed |= ids
+
+    def pickle_object(self, obj):
+        f = io.BytesIO()
+        _ObjectPickler(f, self, obj).dump(obj)
+        return f.getvalue()
+
+    def restore_object(self, obj_id, state):
+        """Puts a journal record back in the database."""
+        if state is None:
+            if obj_id in self._objects:
+                self.remove(obj_id)
+            return
+        loaded = self.unpickle_object(state)
+        if (obj := self._objects.get(obj_id)) is None:
+            self._put(obj_id, loaded)
+            return
+        # others hold references to it, update it in place
+        self._version += 1  # its class may change
+        try:
+            self._unindex(obj_id, obj)
+            obj.__dict__.clear()  # first, a ghost would load itself otherwise
+            obj.__class__ = loaded.__class__
+            _take_state(obj, loaded)
+            self._index(obj_id, obj)
+        finally:
+            self._version += 1
+
+    def reference(self, obj_id, cls):
+        """Returns the object a pickled reference is about."""
+        if (obj := self._objects.get(obj_id)) is None:
+            # not replayed yet, its own record will fill it in
+            obj = cls.__new__(cls)
+            self._put(obj_id, obj)
+        return obj
+
+    def unpickle_object(self, state):
+        """Loads what pickle_object pickled."""
+        return _ObjectUnpickler(io.BytesIO(state), self).load()
+
+    def _put(self, obj_id, obj):
+        self._version += 1
+        try:
+            self._objects[obj_id] = obj
+            self._ids[obj] = obj_id
+            self._index(obj_id, obj)
+            self._next_id = max(self._next_id, obj_id + 1)
+        finally:
+            self._version += 1
+
+    def get(self, obj_id):
+        if (obj_id := _as_id(obj_id)) is None:
+            return None
         with self._lock.r:
-            return self._objects.get(obj_id, None)
+            return self._fetch(obj_id)
+
+    def _fetch(self, obj_id):
+        return self._objects.get(obj_id, None)
 
     def get_id(self, obj):
         with self._lock.r:
             return self._ids.get(obj, None)
 
     def load(self, db_file):
-        compat_fw()
-        with open(db_file, "rb") as f:
-            self._objects = pickle.load(f)
-            if self._objects:
-                self._next_id = max(self._objects.keys()) + 1
-                self._ids = {v: k for k, v in self._objects.items()}
+        """Loads a full save, then replays the journal next to it."""
+        journal = Journal(journal_path(db_file))
+        try:
+            self._load_file(db_file)
+        except FileNotFoundError:
+            if not journal.size:
+                raise
+            # never saved in full, all in the journal
+        journal.replay(self)
+        self._changed = set()
+        self._refresh()  # ready for snapshots, which don't
+
+    def _load_file(self, db_file):
+        from mushroom import indexeddb
+
+        if indexeddb.is_indexed(db_file):
+            with _gc_paused():
+                for obj_id, state in indexeddb.read_records(db_file):
+                    self.restore_object(obj_id, state)
+            return
+        objects = read_pickled(db_file)
+        self._version += 1
+        try:
+            self._objects = objects
+            if objects:
+                self._next_id = max(objects.keys()) + 1
+                self._ids = {v: k for k, v in objects.items()}
+            with _gc_paused():
+                for obj_id, obj in objects.items():
+                    self._index(obj_id, obj)
+        finally:
+            self._version += 1
+
+    def save(self, db_file):
+        """Saves the world. It's no longer changed, unless that fails."""
+        changed = self.take_changes()
+        try:
+            self.dump(db_file)
+        except BaseException:
+            self.restore_changes(changed)
+            raise
 
     def dump(self, db_file):
         with self._lock.r:
             tempfile = f"{db_file}.tmp"
-            with open(tempfile, "wb") as f:
-                pickle.dump(self._objects, f)
+            with open(tempfile, "wb") as f, _gc_paused():
+                pickle.dump(
+                    (SCHEMA_TAG, self.schema()), f, protocol=pickle.HIGHEST_PROTOCOL
+                )
+                pickle.dump(self._objects, f, protocol=pickle.HIGHEST_PROTOCOL)
             os.replace(tempfile, db_file)
 
+    def schema(self):
+        """The fields of new objects, for each class of the world."""
+        return {
+            class_name(cls): cls._schema()
+            for cls, ids in self._types.items()
+            if ids and getattr(cls, "_schema", None) is not None
+        }
+
     def search(self, name="", type=BaseObject):
+        self._refresh()
         found = []
         with self._lock.r:
-            for thing in self._objects.values():
-                if util.match_name(name, thing.name) and isinstance(thing, type):
+            ids = self._names.candidates(name)
+            by_type = self._with_type(type)
+            if ids is None:
+                ids = set().union(*by_type)
+            elif sum(map(len, by_type)) < len(ids):
+                ids &= set().union(*by_type)
+            any_name = not name.split()
+            for obj_id in sorted(ids):
+                thing = self._lookup(obj_id)
+                if isinstance(thing, type) and (
+                    any_name or util.match_name(name, thing.name)
+                ):
                     found.append(thing)
         return found
 
-    def list_all(self, type=BaseObject):
+    def query(self, type=BaseObject, name="", limit=None, offset=0, **attrs):
+        """Iterates over the objects of `type` whose name matches `name`,
+        and whose own attributes are, or hold, the values given, in id order.
+
+        `flag=x` stands for `flags=x`. Attributes indexed with add_index are
+        looked up, the others checked one object at a time.
+        """
+        attrs = {QUERY_ALIASES.get(k, k): v for k, v in attrs.items()}
+
+        def matches(obj):
+            return (
+                isinstance(obj, type)
+                and (not name.split() or util.match_name(name, obj.name))
+                and all(_has(obj, k, v) for k, v in attrs.items())
+            )
+
+        found = filter(matches, self._query_candidates(type, name, attrs))
+        return itertools.islice(
+            found, offset, None if limit is None else offset + limit
+        )
+
+    def _query_candidates(self, type, name, attrs):
+        self._refresh()
         with self._lock.r:
-            return self.search("", type)
+            candidates = [
+                ids
+                for k, v in attrs.items()
+                if k in self._attrs
+                and (ids := self._attrs[k].candidates(v)) is not None
+            ]
+            if (ids := self._names.candidates(name)) is not None:
+                candidates.append(ids)
+            candidates.sort(key=len)
+            by_type = self._with_type(type)
+            if not candidates or sum(map(len, by_type)) < len(candidates[0]):
+                candidates.insert(0, set().union(*by_type))
+            ids = sorted(candidates[0].intersection(*candidates[1:]))
+        # objects removed while iterating are skipped, changed ones checked
+        # again by the caller
+        for obj_id in ids:
+            if (obj := self._objects.get(obj_id)) is not None:
+                yield obj
+
+    def list_all(self, type=BaseObject):
+        return self.search("", type)
 
     def dbref(self, query):
         if (m := re.match(r"#(\d+)", query)) is None:
@@ -104,8 +1003,10 @@ class Database:
 
 
 def _prox(f):
+    name = f.__name__  # by name, for the overrides of the database's class
+
     def __fun(self, *args, **kwargs):
-        return proxify(f.__get__(self.db)(*args, **kwargs))
+        return proxify(getattr(self.db, name)(*args, **kwargs))
 
     return __fun
 
@@ -130,3 +1031,5 @@ class DbProxy:
     add = _prox(Database.add)
     remove = _prox(Database.remove)
     search = _prox(Database.search)
+    query = _prox(Database.query)
+    transaction = _prox(Database.transaction)
@@ -0,0 +1,502 @@
+"""
+Looks into saved worlds without starting the server.
+
+Saves are read one object at a time, in id order, with the changes of the
+journal next to them folded in. Objects are unpickled on their own, with
+the objects they refer to as `Ref`s, so memory use doesn't grow with the
+world. That's for indexed and SQLite saves: a pickled world is one pickle,
+and a world in JSON lines needs all its objects to resolve its references,
+so they're loaded whole. Convert them to an indexed file first to stream
+them too. Writing streams, but for pickles.
+
+    mushroom-db stats world.idx
+    mushroom-db grep world.idx description 'dragon' --type Room
+    mushroom-db refs world.idx 123
+    mushroom-db diff yesterday.idx world.idx
+    mushroom-db compact world.idx
+    mushroom-db convert world.sav world.idx
+    mushroom-db convert world.idx backup.jsonl
+"""
+
+import argparse
+import contextlib
+import heapq
+import io
+import os
+import re
+import sqlite3
+import sys
+import time
+import typing
+
+from mushroom import indexeddb, jsonl, sqlitedb
+from mushroom.db import (
+    Database,
+    Journal,
+    _gc_paused,
+    _ObjectUnpickler,
+    class_name,
+    journal_path,
+    resolve_class,
+)
+
+FORMATS = ("pickle", "indexed", "sqlite", "jsonl")
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class Record(typing.NamedTuple):
+    """A saved object, still pickled."""
+
+    id: int
+    cls: str  # as in class_name
+    name: str
+    state: bytes
+
+
+class Ref(typing.NamedTuple):
+    """Another object, as the objects of a record refer to it."""
+
+    id: int
+    cls: str
+
+    def __repr__(self):
+        return f"#{self.id}"
+
+
+class _Refs:
+    """Stands in for the database, to unpickle records on their own."""
+
+    def reference(self, obj_id, cls):
+        return Ref(obj_id, class_name(cls))
+
+
+_REFS = _Refs()
+
+
+def decode(state):
+    """The object pickled in a record, referring to others with Refs."""
+    return _ObjectUnpickler(io.BytesIO(state), _REFS).load()
+
+
+def fields(obj):
+    return {k: v for k, v in obj.__dict__.items() if not k.startswith("_")}
+
+
+def short_class(cls):
+    return cls.rpartition(":")[2]
+
+
+def describe(record):
+    return f"#{record.id} {short_class(record.cls)} {record.name!r}"
+
+
+# reading
+
+
+def file_format(path):
+    with open(path, "rb") as f:
+        head = f.read(max(len(SQLITE_MAGIC), len(jsonl.MAGIC)))
+    if head.startswith(indexeddb.MAGIC):
+        return "indexed"
+    if head.startswith(SQLITE_MAGIC):
+        return "sqlite"
+    if head.startswith(jsonl.MAGIC):
+        return "jsonl"
+    return "pickle"
+
+
+def read_journal(path):
+    """The last state of each object in the journal of `path`, None if it
+    was removed."""
+    latest = {}
+    for records in Journal(journal_path(path)).batches():
+        latest.update(records)
+    return latest
+
+
+def _journal_record(obj_id, state):
+    if state is None:
+        return None
+    obj = decode(state)
+    return Record(obj_id, class_name(type(obj)), obj.name, state)
+
+
+def _merged(records, journal):
+    """`records`, in id order, with the changes of `journal`."""
+    pending = sorted(journal.items())
+    i = 0
+    for record in records:
+        while i < len(pending) and pending[i][0] < record.id:
+            if (change := _journal_record(*pending[i])) is not None:
+                yield change
+            i += 1
+        if i < len(pending) and pending[i][0] == record.id:
+            if (change := _journal_record(*pending[i])) is not None:
+                yield change
+            i += 1
+        else:
+            yield record
+    for obj_id, state in pending[i:]:
+        if (change := _journal_record(obj_id, state)) is not None:
+            yield change
+
+
+def _indexed_records(path):
+    world = indexeddb.WorldFile(path)
+    try:
+        names = world.names
+        for i, obj_id in enumerate(world.ids):
+            cls = world.class_names[world.classes[i]]
+            yield Record(obj_id, cls, names[i], world.record(i))
+    finally:
+        world.close()
+
+
+def _sqlite_records(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT id, class, name, state FROM objects ORDER BY id")
+        for row in rows:
+            yield Record(*row)
+    finally:
+        conn.close()
+
+
+def _loaded_records(path, load):
+    db = Database()
+    load(db, path)
+    for obj_id, obj in sorted(db._objects.items()):
+        yield Record(obj_id, class_name(type(obj)), obj.name, db.pickle_object(obj))
+
+
+def read_records(path):
+    """The objects saved in `path`, as Records in id order, as the server
+    would load them."""
+    try:
+        fmt = file_format(path)
+    except FileNotFoundError:
+        if not os.path.exists(journal_path(path)):
+            raise
+        fmt = "pickle"  # never saved in full, all in the journal
+    if fmt == "pickle":
+        return _loaded_records(path, Database.load)  # journal included
+    if fmt == "jsonl":
+        return _loaded_records(path, jsonl.load)
+    records = _indexed_records(path) if fmt == "indexed" else _sqlite_records(path)
+    if journal := read_journal(path):
+        return _merged(records, journal)
+    return records
+
+
+# writing
+
+
+def _write_indexed(path, records):
+    indexeddb.write_world(path, records)
+
+
+def _write_sqlite(path, records):
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(sqlitedb.SCHEMA)
+        with conn:
+            conn.executemany(
+                "INSERT INTO objects VALUES (?, ?, ?, ?)",
+                ((r.id, r.cls, r.name, bytes(r.state)) for r in records),
+            )
+    finally:
+        conn.close()
+
+
+def _write_pickle(path, records):
+    # a pickled world is one pickle, of all the objects
+    db = Database()
+    with _gc_paused():
+        for record in records:
+            db.restore_object(record.id, record.state)
+    db.dump(path)
+
+
+def _write_jsonl(path, records):
+    current = None, None  # id and object being written
+
+    def objects():
+        nonlocal current
+        for record in records:
+            current = record.id, decode(record.state)
+            yield current
+
+    def ref(val):
+        if type(val) is Ref:
+            return val.id
+        return current[0] if val is current[1] else None
+
+    jsonl.write(path, objects(), ref)
+
+
+_WRITERS = {
+    "pickle": _write_pickle,
+    "indexed": _write_indexed,
+    "sqlite": _write_sqlite,
+    "jsonl": _write_jsonl,
+}
+
+
+def rewrite(src, dst, fmt=None):
+    """Writes the world saved in `src` to `dst`, in `fmt`, or the format of
+    `src`, with its journal folded in. Returns the number of objects."""
+    fmt = fmt or file_format(src)
+    count = 0
+
+    def counted(records):
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    tempfile = f"{dst}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tempfile)  # left by an earlier try
+    _WRITERS[fmt](tempfile, counted(read_records(src)))
+    os.replace(tempfile, dst)
+    if os.path.abspath(src) == os.path.abspath(dst):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(journal_path(dst))  # folded in
+    return count
+
+
+def guess_format(path):
+    ext = os.path.splitext(path)[1]
+    formats = {
+        ".idx": "indexed",
+        ".db": "sqlite",
+        ".sqlite": "sqlite",
+        ".jsonl": "jsonl",
+    }
+    return formats.get(ext, "pickle")
+
+
+# looking into it
+
+
+def stats(records, largest=10):
+    """Objects and bytes by class, and the largest records."""
+    by_class = {}
+    count = size = 0
+    top = []
+    for record in records:
+        length = len(record.state)
+        count += 1
+        size += length
+        totals = by_class.setdefault(record.cls, [0, 0])
+        totals[0] += 1
+        totals[1] += length
+        entry = length, record.id, record.cls, record.name
+        if len(top) < largest:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+    lines = [f"{count} objects, {size:,} bytes"]
+    for cls, (n, b) in sorted(by_class.items(), key=lambda item: -item[1][0]):
+        lines.append(f"  {short_class(cls):<20} {n:>9} objects {b:>13,} bytes")
+    if top:
+        lines.append("Largest:")
+        for length, obj_id, cls, name in sorted(top, reverse=True):
+            lines.append(
+                f"  {describe(Record(obj_id, cls, name, b'')):<40} {length:>9,} bytes"
+            )
+    return lines
+
+
+class _ClassFilter:
+    """Whether records are of a world class, or a subclass of it."""
+
+    def __init__(self, name):
+        from mushroom import world
+
+        classes = {k: v for k, v in vars(world).items() if isinstance(v, type)}
+        if (cls := classes.get(name)) is None:
+            raise ValueError(f"No such world class: {name}")
+        self.cls = cls
+        self._matches = {}
+
+    def __call__(self, record):
+        if (match := self._matches.get(record.cls)) is None:
+            match = False  # unless the class is still there
+            with contextlib.suppress(ImportError, AttributeError):
+                match = issubclass(resolve_class(record.cls), self.cls)
+            self._matches[record.cls] = match
+        return match
+
+
+def _show(value, width=70):
+    text = repr(value)
+    return text if len(text) <= width else f"{text[: width - 3]}..."
+
+
+_MISSING = object()
+
+
+def grep(records, attr, pattern=None, type=None):
+    """The objects whose `attr` matches `pattern`, or that have one."""
+    regex = None if pattern is None else re.compile(pattern)
+    wanted = None if type is None else _ClassFilter(type)
+    for record in records:
+        if wanted is not None and not wanted(record):
+            continue
+        if attr == "name":  # no need to unpickle it
+            value = record.name
+        elif (value := fields(decode(record.state)).get(attr, _MISSING)) is _MISSING:
+            continue
+        if regex is None or regex.search(
+            value if isinstance(value, str) else repr(value)
+        ):
+            yield f"{describe(record)}: {attr} = {_show(value)}"
+
+
+def _refers(value, obj_id):
+    values = [value]
+    seen = set()  # objects, which may refer back to the one holding them
+    while values:
+        value = values.pop()
+        if isinstance(value, Ref):
+            if value.id == obj_id:
+                return True
+        elif isinstance(value, dict):
+            values.extend(value.keys())
+            values.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            values.extend(value)
+        elif hasattr(value, "__dict__") and id(value) not in seen:
+            seen.add(id(value))
+            values.extend(fields(value).values())
+    return False
+
+
+def _pickled_int(n):
+    """How pickle writes `n`, as the smallest of its int opcodes."""
+    if n < 0x100:
+        return b"K" + n.to_bytes(1, "little")
+    if n < 0x10000:
+        return b"M" + n.to_bytes(2, "little")
+    if n < 0x80000000:
+        return b"J" + n.to_bytes(4, "little")
+    return b""  # pickled as a long, look everywhere
+
+
+def refs(records, obj_id):
+    """The objects referring to `obj_id`, and in which attributes."""
+    # records referring to it have its id in them, no need to unpickle others
+    needle = _pickled_int(obj_id)
+    for record in records:
+        if needle not in record.state:
+            continue
+        obj = decode(record.state)
+        attrs = [k for k, v in fields(obj).items() if _refers(v, obj_id)]
+        if attrs:
+            yield f"{describe(record)}: {', '.join(attrs)}"
+
+
+def _same(a, b, seen=None):
+    """Whether two decoded values are the same, objects without __eq__ of
+    their own included."""
+    if a == b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(v, b[k], seen) for k, v in a.items())
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y, seen) for x, y in zip(a, b))
+    if hasattr(a, "__dict__"):
+        seen = set() if seen is None else seen
+        if (id(a), id(b)) in seen:
+            return True  # compared already, further up
+        seen.add((id(a), id(b)))
+        return _same(fields(a), fields(b), seen)
+    return False
+
+
+def changed_fields(old, new):
+    """The attributes that differ between two records of an object."""
+    a, b = fields(decode(old.state)), fields(decode(new.state))
+    return sorted(k for k in a.keys() | b.keys() if not _same(a.get(k), b.get(k)))
+
+
+def diff(old_records, new_records):
+    """What was added, removed and changed between two saves."""
+    end = Record(sys.maxsize, "", "", b"")
+    old_records, new_records = iter(old_records), iter(new_records)
+    old, new = next(old_records, end), next(new_records, end)
+    while old is not end or new is not end:
+        if old.id < new.id:
+            yield f"- {describe(old)}"
+            old = next(old_records, end)
+        elif new.id < old.id:
+            yield f"+ {describe(new)}"
+            new = next(new_records, end)
+        else:
+            if old.state != new.state:
+                if old.cls != new.cls:
+                    yield f"~ {describe(new)}: was a {short_class(old.cls)}"
+                elif attrs := changed_fields(old, new):
+                    yield f"~ {describe(new)}: {', '.join(attrs)}"
+            old, new = next(old_records, end), next(new_records, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="mushroom-db", description="Look into saved worlds, offline."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmd = commands.add_parser("stats", help="objects and bytes by class")
+    cmd.add_argument("file")
+    cmd = commands.add_parser("grep", help="objects by attribute")
+    cmd.add_argument("file")
+    cmd.add_argument("attr", help="attribute to look at, e.g. description")
+    cmd.add_argument("pattern", nargs="?", help="regex its value must match")
+    cmd.add_argument("--type", help="world class, e.g. Room")
+    cmd = commands.add_parser("refs", help="objects referring to an object")
+    cmd.add_argument("file")
+    cmd.add_argument("id", type=lambda s: int(s.removeprefix("#")))
+    cmd = commands.add_parser("diff", help="what changed between two saves")
+    cmd.add_argument("old")
+    cmd.add_argument("new")
+    cmd = commands.add_parser("compact", help="fold the journal into the save")
+    cmd.add_argument("file")
+    cmd.add_argument("dst", nargs="?", help="where to write it, file by default")
+    cmd = commands.add_parser("convert", help="save a world in another format")
+    cmd.add_argument("src")
+    cmd.add_argument("dst")
+    cmd.add_argument("--to", choices=FORMATS, help="by default, from dst's extension")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if args.command == "stats":
+            lines = stats(read_records(args.file))
+        elif args.command == "grep":
+            lines = grep(read_records(args.file), args.attr, args.pattern, args.type)
+        elif args.command == "refs":
+            lines = refs(read_records(args.file), args.id)
+        elif args.command == "diff":
+            lines = diff(read_records(args.old), read_records(args.new))
+        elif args.command == "compact":
+            count = rewrite(args.file, args.dst or args.file)
+            lines = [f"Compacted {count} objects in {time.perf_counter() - start:.2f}s"]
+        else:
+            fmt = args.to or guess_format(args.dst)
+            count = rewrite(args.src, args.dst, fmt)
+            lines = [
+                f"Converted {count} objects to {fmt} in {time.perf_counter() - start:.2f}s"
+            ]
+        for line in lines:
+            print(line)
+    except OSError as e:
+        parser.exit(1, f"mushroom-db: {e}\n")
+    except ValueError as e:
+        parser.exit(1, f"mushroom-db: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Front-end processes: connection handling outside of the world process.
+
+With `frontend_workers` set, mushroomd spawns that many worker processes.
+Each one listens on the game port (SO_REUSEPORT, so that the kernel spreads
+connections among them) and does the telnet handling, line framing, flood
+limits and output buffering for its clients. Input lines are forwarded to
+the world process over a unix socket, which runs the commands and sends the
+output back. The world itself stays single-writer.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import struct
+
+from mushroom.server import ClientHandler, limit_input, read_lines
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("!I")
+
+
+class Link:
+    """A message channel between the world and a front-end process."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, *msg):
+        data = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+        self.writer.write(HEADER.pack(len(data)) + data)
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def messages(self):
+        while True:
+            try:
+                (size,) = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                data = await self.reader.readexactly(size)
+            except asyncio.IncompleteReadError:
+                return  # the other end went away
+            except ConnectionError:
+                return
+            yield pickle.loads(data)  # the other end is one of our processes
+
+    def close(self):
+        self.writer.close()
+
+
+# World process side
+
+
+class RemoteHandler(ClientHandler):
+    """A client connected to one of the front-end processes."""
+
+    def __init__(self, server, link, conn_id, ip):
+        self.link = link
+        self.conn_id = conn_id
+        self.remote_ip = ip
+        super().__init__(server, None)
+
+    @property
+    def ip(self):
+        return self.remote_ip
+
+    @property
+    def transport(self):
+        # the connection is in the front-end process, so is what needs it
+        raise RuntimeError(f"{self.name} is connected to a front-end process")
+
+    async def transmit(self, chunks):
+        for data in chunks:
+            self.link.send("write", self.conn_id, data)
+        if not self.closing:
+            await self.link.drain()
+
+    async def close(self):
+        self.link.send("close", self.conn_id)
+
+    def abort(self):
+        self.closing = True
+        self.queue.clear()
+        self.queued_bytes = 0
+        self.link.send("abort", self.conn_id)
+        self.wakeup.set()
+
+
+async def _queued_lines(queue):
+    while (data := await queue.get()) is not None:
+        yield data
+
+
+async def serve_link(server, reader, writer):
+    """Runs the clients of one front-end process on `server`."""
+    link = Link(reader, writer)
+    inputs = {}
+    tasks = set()
+    logger.info("Front-end process connected")
+    async for kind, *args in link.messages():
+        if kind == "connect":
+            conn_id, ip = args
+            inputs[conn_id] = asyncio.Queue()
+            handler = RemoteHandler(server, link, conn_id, ip)
+            task = asyncio.create_task(
+                server.serve_client(handler, _queued_lines(inputs[conn_id]))
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif kind == "input":
+            conn_id, data = args
+            if conn_id in inputs:
+                inputs[conn_id].put_nowait(data)
+        elif kind == "disconnect":
+            (conn_id,) = args
+            if conn_id in inputs:
+                inputs.pop(conn_id).put_nowait(None)
+        elif kind == "count":
+            server.count(*args)
+    logger.warning("Lost a front-end process, dropping its clients")
+    for queue in inputs.values():
+        queue.put_nowait(None)
+    await asyncio.gather(*tasks)
+
+
+async def start_workers(server):
+    """Starts listening for front-end processes, then spawns them.
+
+    Returns the unix server and the worker processes.
+    """
+    path = server.config.frontend_socket
+    if os.path.exists(path):
+        os.unlink(path)
+    unix_server = await asyncio.start_unix_server(
+        lambda r, w: serve_link(server, r, w), path
+    )
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=worker_main,
+            args=(server.config, logging.getLogger().level),
+            daemon=True,
+        )
+        for _ in range(server.config.frontend_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Started {len(workers)} front-end processes")
+    return unix_server, workers
+
+
+# Front-end process side
+
+
+class Frontend:
+    """Accepts clients and relays their input and output to the world."""
+
+    def __init__(self, config):
+        self.config = config
+        self.link = None
+        self.handlers = {}
+        self.ids = itertools.count(1)
+
+    def count(self, event):
+        self.link.send("count", event)
+
+    async def run(self):
+        reader, writer = await asyncio.open_unix_connection(self.config.frontend_socket)
+        self.link = Link(reader, writer)
+        server = await asyncio.start_server(
+            self._on_client_connect,
+            self.config.listen_address,
+            self.config.listen_port,
+            reuse_port=True,  # all the front-end processes listen on it
+        )
+        async with server:
+            async for kind, conn_id, *args in self.link.messages():
+                if (handler := self.handlers.get(conn_id)) is None:
+                    continue
+                if kind == "write":
+                    handler.write(*args)
+                elif kind == "close":
+                    handler.shutdown()
+                elif kind == "abort":
+                    handler.abort()
+        logger.info("Lost the world process, exiting")
+
+    async def _on_client_connect(self, reader, writer):
+        conn_id = next(self.ids)
+        handler = ClientHandler(self, writer)
+        handler.negotiate()
+        self.handlers[conn_id] = handler
+        self.link.send("connect", conn_id, handler.ip)
+        try:
+            lines = read_lines(reader, handler, self.config.max_line_length)
+            async for data in limit_input(lines, handler, self.config, self.count):
+                self.link.send("input", conn_id, data)
+                await self.link.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.link.send("disconnect", conn_id)
+            del self.handlers[conn_id]
+            handler.shutdown()
+
+
+def worker_main(config, log_level):
+    logging.basicConfig(level=log_level)
+    try:
+        asyncio.run(Frontend(config).run())
+    except KeyboardInterrupt:
+        pass
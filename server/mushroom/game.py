@@ -1,4 +1,8 @@
-import bisect
+import collections
+import concurrent.futures
+import functools
+import heapq
+import itertools
 import logging
 import queue
 import threading
@@ -9,15 +13,61 @@ from mushroom.db import Database, DbProxy
 logger = logging.getLogger(__name__)
 
 
+class Timer:
+    """
+    A scheduled event, as returned by `Game.schedule`.
+
+    A repeating timer fires every `interval` seconds until cancelled.
+    """
+
+    def __init__(self, game, event, interval=None):
+        self.game = game
+        self.event = event
+        self.interval = interval
+        self.deadline = None  # time.monotonic() of the next firing
+        self._entry = None  # in the game's heap, None when not pending
+
+    def __repr__(self):
+        return f"<Timer {self.event!r}>"
+
+    @property
+    def active(self):
+        return self._entry is not None
+
+    def cancel(self):
+        self.game._call(self.game._cancel_timer, self)
+
+    def reschedule(self, when):
+        """Fire in <when> seconds instead, even if the timer already fired."""
+        self.game._call(self.game._push_timer, self, time.monotonic() + when)
+
+
 class Game:
+    """
+    The world, and the one executor that is allowed to touch it.
+
+    All world code runs on the executor: the asyncio loop the game was
+    attached to (see `attach`), or else a thread of its own. Code running
+    elsewhere, like the portals, hands work over with `submit`.
+    """
+
     _instance = None
+    # seconds of due timers to run at once on the owner loop, before letting
+    # commands and I/O in
+    timer_budget = 0.01
 
     def __init__(self) -> None:
-        self._timers = []  # ordered by increasing expiration time
+        self._timers = []  # heap of [deadline, seq, timer or None if cancelled]
+        self._timer_seq = itertools.count()
+        self._cancelled = 0  # cancelled entries still in the heap
         self._event_queue = queue.SimpleQueue()
-        self._loop_thread = threading.Thread(target=self._loop)
-        self._loop_thread.daemon = True
-        self._loop_thread.start()
+        self._posted = collections.deque()  # for the owner loop, from elsewhere
+        self._drain_scheduled = False
+        self._loop_thread = None
+        self._owner = None  # asyncio loop running the world
+        self._owner_thread = None
+        self._wakeup = None  # owner loop handle for the next timer
+        self._wakeup_at = None
         self._db = Database()
 
     def __reduce__(self):
@@ -62,22 +112,150 @@ class Game:
 
         return self._db.search(type=Player)
 
+    def use_database(self, db):
+        """Replaces the database, before the world is loaded."""
+        if self._owner is not None:
+            db.single_owner()
+        self._db = db
+
     def load_db(self, file):
         self._db.load(file)
 
     def dump_db(self, file):
-        self._db.dump(file)
+        self._db.save(file)
+
+    def attach(self, loop):
+        """Makes `loop` the executor of the world.
+
+        Must be called from the loop, before anything else runs world code.
+        Since nothing else may touch the database then, it stops locking.
+        """
+        if self._loop_thread is not None:
+            raise RuntimeError("The game already runs in its own thread")
+        self._owner = loop
+        self._owner_thread = threading.get_ident()
+        self._db.single_owner()
+        self._arm()
+
+    def submit(self, fn, *args, **kwargs):
+        """Runs `fn` on the world's executor. Can be called from any thread.
+
+        Returns a concurrent.futures.Future for the result.
+        """
+        future = concurrent.futures.Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.warning(f"exception in submitted call: {fn!r}", exc_info=e)
+                future.set_exception(e)
+
+        self._post(run)
+        return future
+
+    def _post(self, event):
+        if self._owner is not None:
+            if threading.get_ident() == self._owner_thread:
+                self._owner.call_soon(self._run_event, event)
+                return
+            self._posted.append(event)
+            if not self._drain_scheduled:
+                # one wakeup of the loop for everything posted until it runs
+                self._drain_scheduled = True
+                self._owner.call_soon_threadsafe(self._drain)
+            return
+        if self._loop_thread is None:
+            self._loop_thread = threading.Thread(target=self._loop, daemon=True)
+            self._loop_thread.start()
+        self._event_queue.put(event)
+
+    def _drain(self):
+        self._drain_scheduled = False
+        # what is posted from now on schedules another drain
+        for _ in range(len(self._posted)):
+            self._run_event(self._posted.popleft())
+
+    def _on_executor(self):
+        if self._owner is not None:
+            return threading.get_ident() == self._owner_thread
+        thread = self._loop_thread
+        return thread is not None and threading.get_ident() == thread.ident
+
+    def _call(self, fn, *args):
+        """Runs `fn` now if on the executor, or posts it there."""
+        if self._on_executor():
+            fn(*args)
+        else:
+            self._post(functools.partial(fn, *args))
+
+    def schedule(self, when, event, repeat=None):
+        """Schedules an event to happen in <when> seconds.
+
+        With `repeat`, the event then happens again every <repeat> seconds.
+        Returns a Timer, to cancel or reschedule the event.
+        """
+        if repeat is not None and repeat <= 0:
+            raise ValueError("Repeating timers need a positive interval")
+        timer = Timer(self, event, repeat)
+        self._call(self._push_timer, timer, time.monotonic() + when)
+        return timer
+
+    def _push_timer(self, timer, deadline):
+        self._drop_timer(timer)
+        timer.deadline = deadline
+        timer._entry = [deadline, next(self._timer_seq), timer]
+        heapq.heappush(self._timers, timer._entry)
+        self._arm()
+
+    def _drop_timer(self, timer):
+        if timer._entry is not None:
+            timer._entry[2] = None
+            timer._entry = None
+            self._cancelled += 1
+
+    def _cancel_timer(self, timer):
+        self._drop_timer(timer)
+        if self._cancelled > 64 and self._cancelled > len(self._timers) // 2:
+            # mostly tombstones, rebuild the heap
+            self._timers = [e for e in self._timers if e[2] is not None]
+            heapq.heapify(self._timers)
+            self._cancelled = 0
+        self._arm()
+
+    def _next_deadline(self):
+        while self._timers and self._timers[0][2] is None:
+            heapq.heappop(self._timers)
+            self._cancelled -= 1
+        return self._timers[0][0] if self._timers else None
+
+    def _arm(self):
+        """Wakes the owner loop up when the next timer is due."""
+        if self._owner is None:
+            return  # the thread checks the timers after every event
+        deadline = self._next_deadline()
+        if deadline == self._wakeup_at:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        self._wakeup_at = deadline
+        if deadline is not None:
+            delay = max(deadline - time.monotonic(), 0)
+            self._wakeup = self._owner.call_later(delay, self._on_wakeup)
 
-    def schedule(self, when, event):
-        """Schedules an event to happen in <when> seconds."""
-        bisect.insort(self._timers, (time.time() + when, event))
-        self._event_queue.put(None)  # wake up
+    def _on_wakeup(self):
+        self._wakeup = self._wakeup_at = None
+        self._handle_timers(self.timer_budget)
+        self._arm()  # right away if some are still due
 
     def _next_timeout(self):
-        # wake up the thread every second, just, you know, for fun.
-        if not self._timers:
-            return 1.0
-        return min(self._timers[0][0] - time.time(), 1.0)
+        # no timers, no wakeups: sleep until an event comes in
+        if (deadline := self._next_deadline()) is None:
+            return None
+        return max(deadline - time.monotonic(), 0)
 
     def _loop(self):
         while True:
@@ -99,14 +277,23 @@ class Game:
                     "exception in event callback: %s", repr(event), exc_info=e
                 )
 
-    def _handle_timers(self):
-        now = time.time()
-        while self._timers:
-            when, evt = self._timers[0]
-            if when > now:
+    def _handle_timers(self, budget=None):
+        """Fires the timers that are due, or those it can in `budget` seconds."""
+        now = time.monotonic()
+        end = None if budget is None else now + budget
+        while (deadline := self._next_deadline()) is not None and deadline <= now:
+            timer = heapq.heappop(self._timers)[2]
+            timer._entry = None
+            if timer.interval:
+                # re-arm first, so that the event can cancel it. Late timers
+                # skip the beats they missed rather than firing in a burst.
+                later = deadline + timer.interval
+                if later <= now:
+                    later = now + timer.interval
+                self._push_timer(timer, later)
+            self._run_event(timer.event)
+            if end is not None and time.monotonic() > end:
                 return
-            del self._timers[0]
-            self._run_event(evt)
 
     def exec_env(self):
         import itertools
@@ -0,0 +1,89 @@
+"""
+Hand the listening sockets and client connections of mushroomd over to a
+new server process, so that it can restart without disconnecting players.
+
+The old process spawns the new one with one end of a unix socket pair and
+sends it the file descriptors, along with what it needs to know about each
+connection. The new process answers once it has taken over.
+"""
+
+import json
+import socket
+import subprocess
+import sys
+
+BATCH = 200  # descriptors per message, the kernel caps them at 253
+MAX_MESSAGE = 1 << 20
+
+
+def spawn(args):
+    """Starts a new server process that will take over from this one.
+
+    Returns the socket to talk to it, and the process.
+    """
+    ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "mushroom.server",
+            *args,
+            "--handoff-fd",
+            str(theirs.fileno()),
+        ],
+        pass_fds=[theirs.fileno()],
+    )
+    theirs.close()
+    return ours, process
+
+
+def _send(sock, msg, fds=()):
+    socket.send_fds(sock, [json.dumps(msg).encode("utf8")], list(fds))
+
+
+def _recv(sock):
+    data, fds, _flags, _addr = socket.recv_fds(sock, MAX_MESSAGE, BATCH)
+    if not data:
+        raise ConnectionError("handoff socket closed")
+    return json.loads(data), fds
+
+
+def send(sock, started, listeners, clients):
+    """Sends the listening sockets and clients over `sock`.
+
+    `listeners` is a list of (kind, socket) pairs, with `kind` telling what
+    the socket listens for, e.g. "telnet". `clients` is a list of (state,
+    socket) pairs, with `state` a dict that can be serialized to JSON.
+    """
+    _send(
+        sock,
+        {"started": started, "listeners": [kind for kind, _ in listeners]},
+        [s.fileno() for _, s in listeners],
+    )
+    for i in range(0, len(clients), BATCH):
+        batch = clients[i : i + BATCH]
+        _send(
+            sock,
+            {"clients": [state for state, _ in batch]},
+            [s.fileno() for _, s in batch],
+        )
+    _send(sock, {"done": True})
+
+
+def receive(sock):
+    """Receives what `send` sent.
+
+    Returns the time the restart started at, a list of (kind, socket) pairs
+    for the listening sockets and a list of (state, socket) pairs.
+    """
+    msg, fds = _recv(sock)
+    started = msg["started"]
+    listeners = [
+        (kind, socket.socket(fileno=fd))
+        for kind, fd in zip(msg["listeners"], fds, strict=True)
+    ]
+    clients = []
+    while "done" not in (msg := _recv(sock))[0]:
+        states, fds = msg[0]["clients"], msg[1]
+        clients += [(s, socket.socket(fileno=fd)) for s, fd in zip(states, fds)]
+    return started, listeners, clients
@@ -0,0 +1,389 @@
+"""
+An indexed world file, that the server maps in memory and loads as needed.
+
+The file starts with a header pointing at an index, written after the
+records. Each record is one object, pickled by Database.pickle_object. The
+index holds, for each object in id order, the offset, length and CRC32 of
+its record, its class and its name: enough to search the world without
+loading it.
+
+    header   magic, index offset, index size, index CRC32
+    records  one pickled object after the other
+    index    count, length of the class names, then arrays of ids,
+             offsets, lengths, CRCs and class numbers, then the pickled
+             class names and the pickled object names
+
+To convert a pickled world, and to check a file:
+
+    python -m mushroom.indexeddb convert world.sav world.idx
+    python -m mushroom.indexeddb verify world.idx
+"""
+
+import argparse
+import array
+import bisect
+import io
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+import zlib
+from functools import cached_property
+
+from mushroom.db import (
+    BaseObject,
+    Database,
+    _gc_paused,
+    _ObjectUnpickler,
+    class_name,
+    read_pickled,
+    resolve_class,
+)
+from mushroom.lazydb import LazyDatabase
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MUSHIDX1"
+HEADER = struct.Struct("<8sQQI")
+COUNTS = struct.Struct("<QQ")
+# typecode of each array in the index, all little-endian on disk
+ARRAYS = ("ids", "q"), ("offsets", "q"), ("lengths", "I"), ("crcs", "I")
+CLASSES = "H"
+
+
+def is_indexed(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _array(typecode, data):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _array_bytes(values):
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class WorldFile:
+    """An indexed world file, mapped in memory."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _read_index(self):
+        if len(self._mm) < HEADER.size:
+            raise ValueError("Not an indexed world file: too short")
+        magic, offset, size, crc = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError("Not an indexed world file")
+        self.index_offset = offset
+        index = memoryview(self._mm)[offset : offset + size]
+        try:
+            if len(index) != size or zlib.crc32(index) != crc:
+                raise ValueError("The index of the world file is corrupt")
+            count, classes_size = COUNTS.unpack_from(index)
+            pos = COUNTS.size
+            for attr, typecode in (*ARRAYS, ("classes", CLASSES)):
+                end = pos + count * array.array(typecode).itemsize
+                setattr(self, attr, _array(typecode, index[pos:end]))
+                pos = end
+            self.class_names = pickle.loads(index[pos : pos + classes_size])
+            self._names_data = bytes(index[pos + classes_size :])
+        finally:
+            index.release()
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @cached_property
+    def names(self):
+        """The names of the objects, only unpickled when first needed."""
+        names = pickle.loads(self._names_data)
+        del self._names_data
+        return names
+
+    def position(self, obj_id):
+        """Where `obj_id` is in the index, or None."""
+        i = bisect.bisect_left(self.ids, obj_id)
+        if i < len(self.ids) and self.ids[i] == obj_id:
+            return i
+        return None
+
+    def record(self, i):
+        offset = self.offsets[i]
+        return self._mm[offset : offset + self.lengths[i]]
+
+    def state(self, obj_id):
+        if (i := self.position(obj_id)) is None:
+            return None
+        return self.record(i)
+
+    def records(self):
+        """All the (id, state) pairs, in id order."""
+        for i, obj_id in enumerate(self.ids):
+            yield obj_id, self.record(i)
+
+
+def write_world(path, records):
+    """Writes an indexed world file.
+
+    `records` are (id, class name, name, state) tuples, in id order.
+    """
+    index = {attr: array.array(typecode) for attr, typecode in ARRAYS}
+    classes = array.array(CLASSES)
+    class_names, class_numbers, names = [], {}, []
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        for obj_id, cls, name, state in records:
+            if (number := class_numbers.get(cls)) is None:
+                number = class_numbers[cls] = len(class_names)
+                class_names.append(cls)
+            f.write(state)
+            index["ids"].append(obj_id)
+            index["offsets"].append(offset)
+            index["lengths"].append(len(state))
+            index["crcs"].append(zlib.crc32(state))
+            classes.append(number)
+            names.append(name)
+            offset += len(state)
+        pickled_classes = pickle.dumps(class_names, protocol=pickle.HIGHEST_PROTOCOL)
+        data = b"".join(
+            [
+                COUNTS.pack(len(names), len(pickled_classes)),
+                *(_array_bytes(index[attr]) for attr, _ in ARRAYS),
+                _array_bytes(classes),
+                pickled_classes,
+                pickle.dumps(names, protocol=pickle.HIGHEST_PROTOCOL),
+            ]
+        )
+        f.write(data)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, offset, len(data), zlib.crc32(data)))
+
+
+def read_records(path):
+    """The (id, state) pairs of an indexed world file, in id order."""
+    world = WorldFile(path)
+    try:
+        yield from world.records()
+    finally:
+        world.close()
+
+
+class IndexedDatabase(LazyDatabase):
+    """
+    The database holding the world, in an indexed world file.
+
+    Starting up only reads the index. Searching by class or name only needs
+    the index too, the objects are loaded when something looks into them.
+    Saving writes a new file, with the records of the objects that were
+    never loaded copied over as they are.
+    """
+
+    def __init__(self, cache_size=10_000):
+        super().__init__(cache_size)
+        self.file = None
+        self._classes = []  # class of each class number of the file
+        # whether the objects of the file are in the search indexes
+        self._types_indexed = False
+        self._names_indexed = False
+
+    def _load_file(self, db_file):
+        if not is_indexed(db_file):
+            logger.info(f"{db_file} is pickled, it will be saved indexed")
+            for obj_id, obj in read_pickled(db_file).items():
+                self._put(obj_id, obj)
+                self._pinned[obj_id] = obj
+            return
+        self._open(db_file)
+
+    def _open(self, db_file):
+        world = WorldFile(db_file)
+        if self.file is not None:
+            self.file.close()
+        self.file = world
+        self._classes = [resolve_class(name) for name in world.class_names]
+        if len(world):
+            self._next_id = max(self._next_id, world.ids[-1] + 1)
+
+    def _state(self, obj_id):
+        return None if self.file is None else self.file.state(obj_id)
+
+    # searching, with the index of the file
+
+    def _index(self, obj_id, obj):
+        if "_ghost" not in obj.__dict__:
+            super()._index(obj_id, obj)  # ghosts are as in the file
+
+    def search(self, name="", type=BaseObject):
+        names = bool(name.split())
+        indexed = self._names_indexed if names else self._types_indexed
+        if self.file is not None and not indexed:
+            with self._lock.w:
+                self._index_file(names)
+        return super().search(name, type)
+
+    def _index_file(self, names):
+        """Indexes the objects of the file by class, and by name if `names`.
+        Callers hold the write lock."""
+        world = self.file
+        skip = self._pinned.keys() | self._removed  # indexed as they are now
+        with _gc_paused():
+            if not self._types_indexed:
+                for i, obj_id in enumerate(world.ids):
+                    if obj_id not in skip:
+                        cls = self._classes[world.classes[i]]
+                        self._types.setdefault(cls, set()).add(obj_id)
+                self._types_indexed = True
+            if names and not self._names_indexed:
+                for obj_id, name in zip(world.ids, world.names, strict=True):
+                    if obj_id not in skip:
+                        self._names.add(obj_id, name)
+                self._names_indexed = True
+
+    def _lookup(self, obj_id):
+        if (obj := self._objects.get(obj_id)) is not None:
+            return obj
+        i = self.file.position(obj_id)
+        cls = self._classes[self.file.classes[i]]
+        return self.reference(obj_id, cls, self.file.names[i])
+
+    # saving
+
+    def dump(self, db_file):
+        tempfile = f"{db_file}.tmp"
+        with self._lock.r:
+            write_world(tempfile, self._records())
+            os.replace(tempfile, db_file)
+            self._open(db_file)
+            self._pinned.clear()
+            self._removed.clear()
+
+    def _records(self):
+        ids = set(self._pinned)
+        if self.file is not None:
+            ids.update(self.file.ids)
+        for obj_id in sorted(ids - self._removed):
+            obj = self._objects.get(obj_id)
+            if obj is not None and "_ghost" not in obj.__dict__:
+                state = self.pickle_object(obj)
+                yield obj_id, class_name(type(obj)), obj.name, state
+            else:
+                # never loaded, so unchanged
+                i = self.file.position(obj_id)
+                cls = self.file.class_names[self.file.classes[i]]
+                yield obj_id, cls, self.file.names[i], self.file.record(i)
+
+
+def convert(src, dst):
+    """Writes a world, pickled or indexed, as an indexed world file."""
+    db = Database()
+    db.load(src)
+    tempfile = f"{dst}.tmp"
+    write_world(
+        tempfile,
+        (
+            (obj_id, class_name(type(obj)), obj.name, db.pickle_object(obj))
+            for obj_id, obj in sorted(db._objects.items())
+        ),
+    )
+    os.replace(tempfile, dst)
+    return len(db._objects)
+
+
+class _Checker:
+    """Stands in for the database, to unpickle records on their own."""
+
+    def __init__(self, world):
+        self.world = world
+        self.dangling = set()
+
+    def reference(self, obj_id, cls):
+        if self.world.position(obj_id) is None:
+            self.dangling.add(obj_id)
+        return cls.__new__(cls)
+
+
+def verify(path, deep=False):
+    """Checks an indexed world file. Returns a list of the problems found.
+
+    With `deep`, records are also unpickled, and their references checked.
+    """
+    try:
+        world = WorldFile(path)
+    except ValueError as e:
+        return [str(e)]
+    except OSError as e:
+        return [str(e)]
+    problems = []
+    try:
+        checker = _Checker(world)
+        for i, obj_id in enumerate(world.ids):
+            if i and obj_id <= world.ids[i - 1]:
+                problems.append(f"#{obj_id}: out of order")
+            offset, length = world.offsets[i], world.lengths[i]
+            if offset < HEADER.size or offset + length > world.index_offset:
+                problems.append(f"#{obj_id}: record out of bounds")
+                continue
+            record = world.record(i)
+            if zlib.crc32(record) != world.crcs[i]:
+                problems.append(f"#{obj_id}: bad checksum")
+                continue
+            if not deep:
+                continue
+            try:
+                _ObjectUnpickler(io.BytesIO(record), checker).load()
+            except Exception as e:  # noqa: BLE001
+                problems.append(f"#{obj_id}: can't be loaded: {e!r}")
+            for ref in sorted(checker.dangling):
+                problems.append(f"#{obj_id}: refers to #{ref}, which is missing")
+            checker.dangling.clear()
+    finally:
+        world.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed world files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmd = commands.add_parser("convert", help="convert a pickled world")
+    cmd.add_argument("src", help="world to convert, e.g. world.sav")
+    cmd.add_argument("dst", help="indexed world file to write")
+    cmd = commands.add_parser("verify", help="check an indexed world file")
+    cmd.add_argument("file")
+    cmd.add_argument("--deep", action="store_true", help="load every object too")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "convert":
+        count = convert(args.src, args.dst)
+        print(f"Converted {count} objects in {time.perf_counter() - start:.2f}s")
+        return
+    problems = verify(args.file, deep=args.deep)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} problems found in {time.perf_counter() - start:.2f}s")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Worlds as JSON lines: a backup format quick to write, easy to diff and to
+edit by hand, and that loads without unpickling anything.
+
+The first line says what the file is. Then each object of the world is on a
+line of its own, in id order, as util.serialize writes it, with its id:
+
+    {"kind":"mushroom-jsonl","spec":{"version":1}}
+    {"id":0,"kind":"mushroom.world.room:Room","spec":{"name":"hall",...}}
+    {"id":1,"kind":"mushroom.world.objects:Thing","spec":{"location":{"kind"...
+
+Objects refer to the others with DbRefs. Loading, a DbRef to an object
+further down the file is an empty placeholder until that object's line is
+read, then it gets its class and its fields in place, as when replaying the
+journal. A file referring to objects it doesn't have isn't loaded at all.
+
+To convert a world, pickled or not, to JSON lines and back:
+
+    mushroom-db convert world.sav world.jsonl
+    mushroom-db convert world.jsonl world.sav
+"""
+
+import json
+import os
+
+from mushroom.db import BaseObject, _gc_paused
+from mushroom.util.serialize import restore, serializable_class
+
+VERSION = 1
+HEADER = {"kind": "mushroom-jsonl", "spec": {"version": VERSION}}
+
+# what the files start with
+MAGIC = b'{"kind":"mushroom-jsonl"'
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def is_jsonl(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def lines(objects, ref):
+    """The lines of a file of `objects`, (id, object) pairs in id order.
+    `ref` tells the ids of the objects they refer to, as in serialize."""
+    yield _encode(HEADER) + "\n"
+    for obj_id, obj in objects:
+        yield _encode({"id": obj_id, **obj._serialize(ref)}) + "\n"
+
+
+def write(path, objects, ref):
+    tempfile = f"{path}.tmp"
+    with open(tempfile, "w", encoding="utf-8") as f:
+        f.writelines(lines(objects, ref))
+    os.replace(tempfile, path)
+
+
+def dump(db, path):
+    """Writes the world of `db`, which must have all its objects in memory."""
+    if not db.snapshots:
+        raise TypeError(f"{type(db).__name__} doesn't have all its objects")
+    ids = db._ids  # not get_id, which takes the lock every time
+
+    def ref(val):
+        return ids.get(val) if isinstance(val, BaseObject) else None
+
+    with db._lock.r:
+        objects = db._objects
+        write(path, ((obj_id, objects[obj_id]) for obj_id in sorted(objects)), ref)
+
+
+def load(db, path):
+    """Adds the objects of a JSON lines file to `db`: all of them or, if
+    some refer to objects neither in the file nor in `db`, none."""
+    placeholders = {}  # objects referred to, their lines not read yet
+    loaded = {}
+    objects = db._objects
+
+    def ref(obj_id):
+        if (obj := loaded.get(obj_id)) is not None:
+            return obj
+        if (obj := objects.get(obj_id)) is not None:
+            return obj
+        if (obj := placeholders.get(obj_id)) is None:
+            obj = placeholders[obj_id] = BaseObject.__new__(BaseObject)
+        return obj
+
+    with open(path, encoding="utf-8") as f, _gc_paused():
+        header = f.readline()
+        if not header.encode().startswith(MAGIC):
+            raise ValueError(f"{path} is not a world in JSON lines")
+        if json.loads(header)["spec"]["version"] > VERSION:
+            raise ValueError(f"{path} is from a newer mushroom")
+        for lineno, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                _load_line(loaded, json.loads(line), placeholders, ref)
+            except KeyError as e:
+                raise ValueError(f"{path}:{lineno}: missing {e}") from e
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from e
+        if placeholders:
+            missing = sorted(placeholders)
+            ids = ", ".join(f"#{i}" for i in missing[:20])
+            more = f" and {len(missing) - 20} more" if len(missing) > 20 else ""
+            raise ValueError(f"{path} refers to objects not in it: {ids}{more}")
+        for obj_id, obj in loaded.items():
+            db._put(obj_id, obj)
+
+
+def _load_line(loaded, manifest, placeholders, ref):
+    obj_id = manifest["id"]
+    if not issubclass(cls := serializable_class(manifest["kind"]), BaseObject):
+        raise ValueError(f"A {cls.__name__} isn't a world object")  # noqa: TRY004
+    if (obj := placeholders.pop(obj_id, None)) is None:
+        obj = cls.__new__(cls)
+    else:
+        obj.__class__ = cls  # others refer to it already
+    loaded[obj_id] = obj  # before its fields, which may refer to it
+    restore(obj, manifest["spec"], ref)
@@ -0,0 +1,130 @@
+"""
+Databases that load objects from disk as they are used.
+
+Objects are pickled one by one, with the other world objects they refer to
+pickled as their ids. Those come back as ghosts: empty objects of the right
+class that load their state from the database on first use. Objects that
+nothing refers to any more are dropped from memory, unless they have
+unsaved changes, so only the part of the world in use stays loaded.
+"""
+
+import abc
+import collections
+import logging
+import weakref
+
+from mushroom.db import Database, _take_state
+
+logger = logging.getLogger(__name__)
+
+
+class LazyDatabase(Database, abc.ABC):
+    """
+    A database that only keeps the objects in use in memory.
+
+    Besides the objects with unsaved changes, the `cache_size` objects used
+    last are kept in memory even if nothing refers to them. Subclasses say
+    where the others are with `_state`.
+    """
+
+    # unsaved objects stay in memory until the database saves itself
+    fork_save = False
+    # only some objects are in memory
+    snapshots = False
+
+    def __init__(self, cache_size=10_000):
+        super().__init__()
+        self._objects = weakref.WeakValueDictionary()
+        self._ids = weakref.WeakKeyDictionary()
+        self._pinned = {}  # objects with unsaved changes, kept in memory
+        self._recent = collections.OrderedDict()  # id -> object, by last use
+        self._removed = set()  # ids removed, and not saved yet
+        self.cache_size = cache_size
+
+    @abc.abstractmethod
+    def _state(self, obj_id):
+        """The pickled object, as saved, or None."""
+
+    # keep objects with unsaved changes from being garbage collected
+
+    def add(self, obj):
+        super().add(obj)
+        self._pinned[self._ids[obj]] = obj
+        return obj
+
+    def touch(self, obj, attr=None):
+        if (obj_id := self._ids.get(obj)) is not None:
+            super().touch(obj, attr)
+            self._pinned[obj_id] = obj
+
+    def remove(self, obj):
+        obj_id = obj if type(obj) is int else self._ids[obj]
+        super().remove(obj)
+        self._removed.add(obj_id)
+        self._pinned.pop(obj_id, None)
+        self._recent.pop(obj_id, None)
+
+    def _unremove(self, obj_id, obj):
+        super()._unremove(obj_id, obj)
+        self._removed.discard(obj_id)
+        self._pinned[obj_id] = obj
+
+    def restore_object(self, obj_id, state):
+        if state is None:
+            if self._fetch(obj_id) is not None:
+                self.remove(obj_id)
+            return
+        super().restore_object(obj_id, state)
+        self._pinned[obj_id] = self._objects[obj_id]  # newer than the saved one
+
+    # loading
+
+    def _used(self, obj_id, obj):
+        self._recent[obj_id] = obj
+        self._recent.move_to_end(obj_id)
+        if len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    def _fetch(self, obj_id):
+        if (obj := self._objects.get(obj_id)) is not None:
+            return obj
+        if obj_id in self._removed or not isinstance(obj_id, int):
+            return None
+        if (state := self._state(obj_id)) is None:
+            return None
+        obj = self.unpickle_object(state)
+        self._put(obj_id, obj)
+        self._used(obj_id, obj)
+        return obj
+
+    def reference(self, obj_id, cls, name=None):
+        """Returns the object, as a ghost if it isn't loaded."""
+        if (obj := self._objects.get(obj_id)) is not None:
+            return obj
+        obj = cls.__new__(cls)
+        obj.__dict__["_ghost"] = self
+        if name is not None:
+            obj.__dict__["name"] = name  # enough for listings
+        self._put(obj_id, obj)
+        return obj
+
+    def materialize(self, obj):
+        """Loads the state of a ghost."""
+        obj_id = self._ids[obj]
+        del obj.__dict__["_ghost"]
+        if (state := self._state(obj_id)) is None:
+            logger.warning(f"Object #{obj_id} is referenced, but was removed")
+            return
+        _take_state(obj, self.unpickle_object(state))
+        self._used(obj_id, obj)
+
+    # querying, without loading every object to index its attributes
+
+    def add_index(self, attr):
+        pass
+
+    def _query_candidates(self, type, name, attrs):
+        for obj in self.search(name, type):
+            if "_ghost" in obj.__dict__:
+                self.materialize(obj)  # to check its attributes
+            yield obj
@@ -7,6 +7,8 @@ import websockets.server
 
 # might be useful to remove those and provide a mushroom-agnostic interface
 import mushroom.client
+from mushroom.db import BaseObject
+from mushroom.game import Game
 from mushroom.util import ActionFailed
 
 DEFAULT_IP = "0.0.0.0"
@@ -17,32 +19,51 @@ portals = {}
 
 
 class Server:
-    def __init__(self, ip=None, port=None):
+    def __init__(self, ip=None, port=None, sock=None):
         self.ip = ip or DEFAULT_IP
         self.port = port or DEFAULT_PORT
+        self.sock = sock  # already listening, e.g. taken over in a restart
         self.loop = asyncio.new_event_loop()
         self.thread = threading.Thread(target=self.listen, daemon=True)
+        self.server = None
+        self.listening = threading.Event()
+
+    @property
+    def sockets(self):
+        self.listening.wait()
+        return self.server.sockets if self.server is not None else ()
 
     def start(self):
         if self.thread.is_alive():
             return
         self.thread.start()
 
+    def close(self):
+        """Stop listening, from any thread."""
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
     def listen(self):
         asyncio.set_event_loop(self.loop)
         # will run until websocket server crashes
-        self.loop.run_until_complete(self.serve())
+        try:
+            self.loop.run_until_complete(self.serve())
+        finally:
+            self.listening.set()
 
     async def new_client(self, websocket):
-        from mushroom.db import db
-
-        handler = Handler(db, websocket)
+        handler = Handler(Game.get_instance(), websocket)
         # returns when connection with client closes
         await handler.process()
 
     async def serve(self):
-        async with websockets.server.serve(self.new_client, self.ip, self.port):
-            await asyncio.Future()  # run forever
+        if self.sock is not None:
+            serving = websockets.server.serve(self.new_client, sock=self.sock)
+        else:
+            serving = websockets.server.serve(self.new_client, self.ip, self.port)
+        async with serving as self.server:
+            self.listening.set()
+            await self.server.wait_closed()
 
 
 class PortalClient(mushroom.client.Client):
@@ -60,19 +81,29 @@ class PortalClient(mushroom.client.Client):
         )
 
 
-def portalify(obj):
+def portalify(obj, get_id):
+    """The fields of `obj`, with world objects as the ids `get_id` tells.
+
+    Each dict and list is copied before it's read, in one go, so that the
+    world's executor can go on changing them meanwhile.
+    """
+
     def _field(o):
         if isinstance(o, (int, float, str)):
             return o
         if isinstance(o, list):
-            return [_field(x) for x in o]
+            return [_field(x) for x in o.copy()]
         if isinstance(o, dict):
-            return {k: _field(v) for k, v in o.items()}
-        if hasattr(o, "__dict__") and hasattr(o, "id"):
-            return _field({"id": o.id})
+            return {k: _field(v) for k, v in o.copy().items()}
+        if isinstance(o, BaseObject):
+            return {"id": get_id(o)}
+        if isinstance(o, set):
+            return repr(o.copy())
         return repr(o)
 
-    return {k: _field(getattr(obj, k)) for k in dir(obj)}
+    if obj is None:
+        return None
+    return _field({k: v for k, v in obj.__dict__.copy().items() if k[0] != "_"})
 
 
 class Portal:
@@ -104,14 +135,15 @@ class Portal:
     def open(self, uri):
         if self.connected:
             raise ActionFailed("Portal is already open.")
-        from mushroom.db import db
 
         async def _connection():
             ws = await websockets.connect(uri)
-            self.handler = Handler(db, ws, portal=self)
+            self.handler = Handler(Game.get_instance(), ws, portal=self)
             await self.handler.send("hello", name=self.name)
             if self.world_object is not None:
-                self.world_object.dispatch("portal-connect", portal=self)
+                self.handler.game.submit(
+                    self.world_object.dispatch, "portal-connect", portal=self
+                )
             await self.handler.process()  # loop forever
 
         self.client_thread = threading.Thread(
@@ -142,14 +174,14 @@ class Portal:
         self.object_requests[object_id] = cb
         self.handler.call_soon(self.handler.send("object-get", object_id=object_id))
 
-    # from handler
+    # from handler, the world is left to the game's executor
     async def object_info(self, object_id, obj):
         if not object_id in self.object_requests:
             await self.handler.error(
                 f"received spurious object data for object #{object_id}"
             )
             return
-        self.object_requests.pop(object_id)(obj)
+        self.handler.game.submit(self.object_requests.pop(object_id), obj)
 
     async def player_output(self, player_id, text):
         if not player_id in self.local_players:
@@ -157,12 +189,14 @@ class Portal:
                 f"received spurious player output for player #{player_id}"
             )
             return
-        self.local_players[player_id].send(text)
+        self.handler.game.submit(self.local_players[player_id].send, text)
 
     async def remote_connect(self, handler):
         self.handler = handler
         if self.world_object is not None:
-            self.world_object.dispatch("portal-connect", portal=self)
+            handler.game.submit(
+                self.world_object.dispatch, "portal-connect", portal=self
+            )
 
     async def remote_enter(self, player_id):
         if player_id in self.remote_players:
@@ -171,41 +205,53 @@ class Portal:
         client = PortalClient(player_id, self.handler)
         self.remote_players[player_id] = client
         if self.world_object is not None:
-            self.world_object.dispatch("portal-visitor", portal=self, visitor=client)
+            self.handler.game.submit(
+                self.world_object.dispatch,
+                "portal-visitor",
+                portal=self,
+                visitor=client,
+            )
 
     async def remote_leave(self, player_id):
         if player_id not in self.remote_players:
             await self.handler.error(f"player #{player_id} left but was unknown")
             return
-        if self.remote_players[player_id].player is not None:
-            self.remote_players[player_id].player.dispatch("portal-leave")
-        del self.remote_players[player_id]
+        client = self.remote_players.pop(player_id)
+        self.handler.game.submit(self._visitor_left, client)
 
     async def remote_input(self, player_id, text):
         if player_id not in self.remote_players:
             await self.handler.error(f"player #{player_id} input but was unknown")
             return
         client = self.remote_players[player_id]
-        client.handle_input(text)
+        self.handler.game.submit(client.handle_input, text)
 
     def error(self, message):
         logger.error(f"error from portal {self.name}: {message}")
 
     def on_close(self):
+        visitors = list(self.remote_players.values())
+        self.remote_players = {}
+        self.object_requests = {}
+        self.handler.game.submit(self._closed, visitors)
+
+    # on the game's executor
+    def _visitor_left(self, client):
+        if client.player is not None:
+            client.player.dispatch("portal-leave")
+
+    def _closed(self, visitors):
         if self.world_object is not None:
             self.world_object.dispatch("portal-disconnect", portal=self)
             for player in self.local_players.values():
                 self.world_object.dispatch("portal-return", player=player)
-        for remote_player in self.remote_players.values():
-            if remote_player.player is not None:
-                remote_player.player.dispatch("portal-leave")
-        self.remote_players = {}
-        self.object_requests = {}
+        for client in visitors:
+            self._visitor_left(client)
 
 
 class Handler:
-    def __init__(self, db, websocket, portal=None):
-        self.db = db
+    def __init__(self, game, websocket, portal=None):
+        self.game = game
         self.websocket = websocket
         self.portal = portal
         self.loop = asyncio.get_running_loop()
@@ -296,11 +342,18 @@ class Handler:
         await self.portal.remote_enter(msg["player_id"])
 
     async def handle_object_get(self, msg):
-        await self.send(
-            "object-info",
-            object_id=msg["object_id"],
-            info=portalify(self.db.get(msg["object_id"])),
-        )
+        db = self.game.db
+
+        def get_info():
+            return portalify(db.get(msg["object_id"]), db.get_id)
+
+        if db.snapshots:
+            # read from this thread, without waiting for the world's executor
+            snapshot = db.snapshot()
+            info = portalify(snapshot.get(msg["object_id"]), snapshot.get_id)
+        else:
+            info = await asyncio.wrap_future(self.game.submit(get_info))
+        await self.send("object-info", object_id=msg["object_id"], info=info)
 
     async def handle_object_info(self, msg):
         await self.portal.object_info(msg["object_id"], msg["info"])
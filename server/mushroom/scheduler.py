@@ -0,0 +1,83 @@
+import asyncio
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CommandScheduler:
+    """
+    Runs the commands of all clients, fairly.
+
+    Each client has its own queue of pending commands. Clients take turns:
+    one command per client per round, so a client that pasted a long script
+    does not delay everyone else. After `tick_budget` seconds of work, the
+    scheduler yields to the event loop so that I/O keeps flowing.
+
+    Commands are callables. A command returning False drops the rest of
+    its client's queue.
+    """
+
+    def __init__(self, tick_budget=0.05, queue_limit=50):
+        self.tick_budget = tick_budget
+        self.queue_limit = queue_limit
+        self.queues = {}
+        self.ready = collections.deque()  # clients with pending commands
+        self.scheduled = set()  # the clients in `ready`
+        self.wakeup = asyncio.Event()
+        self.progress = asyncio.Event()  # set whenever a command was taken
+
+    def pending(self, client):
+        return len(self.queues.get(client, ()))
+
+    async def submit(self, client, command):
+        """Queue a command. Waits while the client has too many queued."""
+        while self.pending(client) >= self.queue_limit:
+            self.progress.clear()
+            await self.progress.wait()
+        self.queues.setdefault(client, collections.deque()).append(command)
+        if client not in self.scheduled:
+            # may still be in line after a discard, with an empty queue
+            self.scheduled.add(client)
+            self.ready.append(client)
+        self.wakeup.set()
+
+    async def finish(self, client):
+        """Wait for the client's pending commands to run, then forget it."""
+        while self.pending(client):
+            self.progress.clear()
+            await self.progress.wait()
+        self.queues.pop(client, None)
+
+    def discard(self, client):
+        """Drop the client's pending commands."""
+        if client in self.queues:
+            self.queues[client].clear()
+            self.progress.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            deadline = loop.time() + self.tick_budget
+            while self.ready:
+                client = self.ready.popleft()
+                queue = self.queues.get(client)
+                if not queue:
+                    self.scheduled.discard(client)
+                    continue  # discarded
+                command = queue.popleft()
+                if queue:
+                    self.ready.append(client)  # back of the line
+                else:
+                    self.scheduled.discard(client)
+                self.progress.set()
+                try:
+                    if command() is False:
+                        self.discard(client)
+                except Exception:
+                    logger.exception("Uncaught exception in command")
+                if loop.time() > deadline:
+                    await asyncio.sleep(0)
+                    deadline = loop.time() + self.tick_budget
@@ -1,21 +1,40 @@
 import argparse
 import asyncio
+import collections
+import contextlib
+import functools
 import logging
+import os
+import socket
 import socketserver
+import sys
 import time
 import traceback
+import zlib
 from typing import Any
 
 import frozendict
 import tomli
+import websockets.asyncio.server
+from websockets.exceptions import ConnectionClosed
 
+from mushroom import handoff, telnet, util
 from mushroom.client import Client
 from mushroom.config import Config
+from mushroom.db import Journal, journal_path
 from mushroom.game import Game
 from mushroom.portal import Server as PortalServer
+from mushroom.scheduler import CommandScheduler
+from mushroom.sweep import Sweep
 
 logger = logging.getLogger(__name__)
 
+# autosaves leave at least this many times a save's duration between them
+SAVE_DUTY_FACTOR = 20
+
+# largest WebSocket message taken, in bytes, at least
+WEBSOCKET_MAX_SIZE = 2**20
+
 
 class LogFile:
     def __init__(self, log_file) -> None:
@@ -28,57 +47,92 @@ class LogFile:
 
 class ClientRegister:
     """
-    Nothing more than a list of clients, with
-    some sugar added
+    The set of connected clients, indexed by id and handler.
+
+    `idmap` maps clients to their id in connection order, so iterating
+    over the register is stable.
     """
 
     def __init__(self):
-        self.clients = []
         self.idmap = {}
+        self.by_id = {}
+        self.by_handler = {}
         self.lastid = 0
 
+    @property
+    def clients(self):
+        return self.idmap.keys()
+
+    def __len__(self):
+        return len(self.idmap)
+
+    @staticmethod
+    def encode(msg):
+        # same framing as Client.send, done once for every recipient
+        return f"{msg}\n".encode()
+
     def broadcast(self, msg):
+        data = self.encode(msg)
         for c in self.clients:
-            c.send(msg)
+            c.write(data)
 
     def find_client(self, handler):
-        for client in self.clients:
-            if client.handler is handler:
-                return client
-        raise RuntimeError("Could not find a client for handler")
+        try:
+            return self.by_handler[handler]
+        except KeyError:
+            raise RuntimeError("Could not find a client for handler") from None
 
     def broadcast_except(self, client, msg):
         if isinstance(client, ClientHandler):
             client = self.find_client(handler=client)
+        data = self.encode(msg)
         for c in self.clients:
             if c is not client:
-                c.send(msg)
+                c.write(data)
 
     def get_uid(self):
         self.lastid += 1
         return self.lastid
 
     def get_client(self, cid):
-        for c, i in self.idmap.items():
-            if i == cid:
-                return c
-        return None
+        return self.by_id.get(cid)
 
-    def add(self, client):
-        self.clients.append(client)
-        self.idmap[client] = self.get_uid()
+    def add(self, client, cid=None):
+        if cid is None:
+            cid = self.get_uid()
+        self.lastid = max(self.lastid, cid)
+        self.idmap[client] = cid
+        self.by_id[cid] = client
+        self.by_handler[client.handler] = client
 
     def delete(self, client):
-        del self.idmap[client]
-        self.clients.remove(client)
+        cid = self.idmap.pop(client)
+        del self.by_id[cid]
+        del self.by_handler[client.handler]
 
 
 class ClientHandler:
+    """
+    Owns the writing end of a client connection.
+
+    Output is queued and written out by a dedicated task that waits for
+    the transport to drain, so a slow client only ever costs us
+    `output_queue_limit` bytes of memory.
+    """
+
     def __init__(self, server, writer):
         self.server = server
         self.writer = writer
         self.name = self.ip
         self.op = False
+        self.queue = collections.deque()
+        self.queued_bytes = 0
+        self.closing = False
+        self.telnet = telnet.Parser(self.on_telnet_negotiation)
+        self.compressor = None
+        self.uncompressed = 0  # queued chunks that predate compression
+        self.wakeup = asyncio.Event()
+        self.writer_task = asyncio.create_task(self._write_loop())
 
     @property
     def ip(self):
@@ -91,12 +145,167 @@ class ClientHandler:
         self.server.broadcast_except(self, msg)
 
     def send(self, msg):
-        self.writer.write(msg.encode("utf8"))
+        self.write(msg.encode("utf8"))
+
+    def write(self, data):
+        if self.closing:
+            return
+        limit = self.server.config.output_queue_limit
+        if self.queued_bytes + len(data) > limit:
+            self.on_overflow(data)
+            return
+        self.queue.append(data)
+        self.queued_bytes += len(data)
+        self.wakeup.set()
+
+    def negotiate(self):
+        """Offer our telnet options to the client."""
+        if self.server.config.telnet_mccp:
+            self.write(telnet.command(telnet.WILL, telnet.COMPRESS2))
+
+    def on_telnet_negotiation(self, cmd, option):
+        if cmd == telnet.DO:
+            if option == telnet.COMPRESS2 and self.server.config.telnet_mccp:
+                if self.compressor is None:
+                    self.start_compression()
+            else:
+                self.write(telnet.command(telnet.WONT, option))
+        elif cmd == telnet.WILL:
+            self.write(telnet.command(telnet.DONT, option))
+
+    def start_compression(self):
+        """Compress everything sent after the MCCP2 start sequence."""
+        logger.debug(f"Starting MCCP2 compression for {self.name}")
+        self.write(telnet.subnegotiation(telnet.COMPRESS2))
+        self.uncompressed = len(self.queue)
+        self.compressor = zlib.compressobj()
+
+    def on_overflow(self, data):
+        if self.server.config.output_overflow == "discard":
+            logger.debug(f"Output queue full for {self.name}, discarding output")
+            return
+        logger.warning(f"Output queue full for {self.name}, dropping client")
+        self.abort()
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                if self.queue:
+                    await self.transmit(self._take_output())
+                if self.closing:
+                    break
+        except OSError:
+            logger.info(f"Could not write to {self.name}")
+        finally:
+            self.queue.clear()
+            self.queued_bytes = 0
+        await self.close()
+
+    def _take_output(self):
+        chunks = list(self.queue)
+        self.queue.clear()
+        self.queued_bytes = 0
+        raw, chunks = chunks[: self.uncompressed], chunks[self.uncompressed :]
+        self.uncompressed = 0
+        if self.server.config.coalesce_output:
+            # everything sent since we last ran goes out in one write
+            raw = [b"".join(raw)] if raw else []
+            chunks = [b"".join(chunks)] if chunks else []
+        if self.compressor is not None:
+            # flush each write so that the client can display it right away
+            chunks = [
+                self.compressor.compress(data)
+                + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+                for data in chunks
+            ]
+        return raw + chunks
+
+    @property
+    def transport(self):
+        return self.writer.transport
+
+    async def transmit(self, chunks):
+        for data in chunks:
+            self.writer.write(data)
+        if not self.closing:
+            await self.writer.drain()
+
+    async def close(self):
+        if self.compressor is not None and not self.transport.is_closing():
+            self.writer.write(self.compressor.flush())
+        self.writer.close()
 
-    #        asyncio.create_task(self.writer.drain())
+    async def suspend(self, timeout):
+        """Stop reading and flush all output, before a handoff.
+
+        Gives up on flushing after `timeout` seconds.
+        """
+        self.transport.pause_reading()
+        try:
+            async with asyncio.timeout(timeout):
+                while self.queue or self.queued_bytes:
+                    await asyncio.sleep(0.01)
+                if self.compressor is not None:
+                    # end the compressed stream, the next process may start another
+                    self.writer.write(self.compressor.flush())
+                    self.compressor = None
+                while self.transport.get_write_buffer_size():
+                    await asyncio.sleep(0.01)
+        except TimeoutError:
+            logger.warning(f"Could not flush output of {self.name} before handoff")
+        self.closing = True
+        self.writer_task.cancel()
+
+    def resume(self):
+        """Undo `suspend`, if the handoff failed."""
+        self.closing = False
+        self.writer_task = asyncio.create_task(self._write_loop())
+        self.transport.resume_reading()
 
     def shutdown(self):
-        self.writer.close()
+        """Close the connection once the pending output was handed over."""
+        self.closing = True
+        self.wakeup.set()
+
+    def abort(self):
+        """Close the connection right away, dropping pending output."""
+        self.closing = True
+        self.queue.clear()
+        self.queued_bytes = 0
+        self.transport.abort()
+        self.wakeup.set()
+
+
+class WebSocketHandler(ClientHandler):
+    """
+    A client connected over a WebSocket, e.g. from the HTML client.
+
+    Output is sent as binary messages, one per write.
+    """
+
+    def __init__(self, server, websocket):
+        self.websocket = websocket
+        super().__init__(server, None)
+
+    @property
+    def ip(self):
+        return self.websocket.remote_address[0]
+
+    @property
+    def transport(self):
+        return self.websocket.transport
+
+    async def transmit(self, chunks):
+        try:
+            for data in chunks:
+                await self.websocket.send(data)
+        except ConnectionClosed:
+            self.closing = True
+
+    async def close(self):
+        await self.websocket.close()
 
 
 class ServerCommandHandler:
@@ -109,14 +318,33 @@ class ServerCommandHandler:
             "save": "scmd_save",
             "shutdown": "scmd_shutdown",
             "load": "scmd_load",
+            "stats": "scmd_stats",
+            "restart": "scmd_restart",
+            "sweep": "scmd_sweep",
         }
     )
-    op_scmds = ("users", "kick", "save", "load", "shutdown")
+    op_scmds = (
+        "users",
+        "kick",
+        "save",
+        "load",
+        "shutdown",
+        "stats",
+        "restart",
+        "sweep",
+    )
 
     def __init__(self, server, client):
         self.server = server
         self.client = client
-        self.op = False
+
+    @property
+    def op(self):
+        return self.client.handler.op
+
+    @op.setter
+    def op(self, value):
+        self.client.handler.op = value
 
     def handle_input(self, data):
         op_command_prefix = self.server.config.op_command_prefix
@@ -154,10 +382,14 @@ class ServerCommandHandler:
         self.server.server.close()
         return True
 
+    def scmd_restart(self, rest):
+        logger.info(f"Restart request by {self.client.name}")
+        self.server.restart_task = asyncio.create_task(self.server.hot_restart())
+        return True
+
     def scmd_users(self, rest):
         self.client.send("Users listing:\n")
-        for c in self.server.client_register.clients:
-            cid = self.server.client_register.idmap[c]
+        for c, cid in self.server.client_register.idmap.items():
             try:
                 self.client.send(f"{cid}\t{c.name}\t{c.handler.ip}\n")
             except OSError:
@@ -165,9 +397,33 @@ class ServerCommandHandler:
                 self.client.send(f"{cid}\t{c.name}\tSOCK_ERR\n")
         return True
 
+    def scmd_stats(self, rest):
+        self.client.send("Server counters:\n")
+        for name, count in sorted(self.server.stats.items()):
+            self.client.send(f"{name}\t{count}\n")
+        return True
+
     def scmd_save(self, rest):
-        self.server.save_db()
-        self.client.send("Database saved\n")
+        if self.server.config.save_mode == "fork":
+            self.server.save_task = asyncio.create_task(self.server.save_world())
+            self.client.send("Saving database in the background\n")
+        else:
+            self.server.save_db()
+            self.client.send("Database saved\n")
+        return True
+
+    def scmd_sweep(self, rest):
+        if not self.server.game.db.snapshots:
+            self.client.send("This database can't be swept.\n")
+        elif self.server.sweep is not None:
+            self.client.send("A sweep is already going on.\n")
+        elif rest == "reclaim" and not self.server.game.db.track_containers:
+            self.client.send("Reclaiming needs track_containers.\n")
+        else:
+            self.server.sweep_task = asyncio.create_task(
+                self.server.run_sweep(reclaim=rest == "reclaim", client=self.client)
+            )
+            self.client.send("Sweeping the world in the background\n")
         return True
 
     def scmd_load(self, rest):
@@ -201,23 +457,176 @@ class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
 
 
+async def read_lines(reader, handler, limit):
+    """Yields the lines received on a telnet connection.
+
+    Lines longer than `limit` are cut short and yielded once, for the
+    caller to reject them.
+    """
+    buffer = bytearray()
+    discarding = False  # skipping the rest of an overlong line
+    while chunk := await reader.read(4096):
+        buffer += handler.telnet.feed(chunk)
+        start = 0
+        while (end := buffer.find(b"\n", start)) >= 0:
+            if not discarding:
+                yield bytes(buffer[start : end + 1])
+            discarding = False
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > limit and not discarding:
+            yield bytes(buffer)
+            discarding = True
+        if discarding:
+            buffer.clear()
+    if buffer and not discarding:
+        yield bytes(buffer)
+
+
+async def read_messages(websocket, limit):
+    """Yields the lines received on a WebSocket connection.
+
+    Lines longer than `limit` are cut short, as by read_lines.
+    """
+    try:
+        async for message in websocket:
+            if isinstance(message, str):
+                message = message.encode("utf8")
+            for data in message.splitlines(keepends=True):
+                yield data if len(data) <= limit else data[: limit + 1]
+    except ConnectionClosed:
+        return
+
+
+async def limit_input(lines, handler, config, count):
+    """Applies the flood limits of `config` to a client's input.
+
+    Yields the lines that may be run. Stops if the client should be
+    disconnected. `count(event)` is called for every limit hit.
+    """
+    bucket = util.TokenBucket(config.input_rate, config.input_burst)
+    async for data in lines:
+        if len(data) > config.max_line_length:
+            count("input_line_too_long")
+            handler.send("Line too long, ignored.\n")
+            continue
+        if not bucket.take():
+            policy = config.input_overflow
+            count(f"input_rate_{policy}")
+            if policy == "drop":
+                handler.send("Slow down! Command ignored.\n")
+                continue
+            if policy == "disconnect":
+                logger.warning(f"Input flood from {handler.name}, disconnecting")
+                handler.send("Too many commands, bye.\n")
+                return
+            while not bucket.take():
+                await asyncio.sleep(bucket.delay())
+        yield data
+
+
 class Server:
     def __init__(self, config, game):
         self.config = config
         self.game = game
         self.client_register = ClientRegister()
         self.log = LogFile(self.config.log_file)
-        self.dirty = False
+        self.journal = Journal(journal_path(self.config.db_file))
+        self.last_save = time.monotonic()
+        self.save_duration = 0.0  # of the last save, in seconds
+        self.save_child = None  # pid of a fork-mode save in progress
         self.running = False
+        self.websocket_server = None
+        self.portal = None
+        self.frontends = []
+        self.listeners = []  # extra servers for sockets taken over in a restart
+        self.restarting = False
+        self.handed_off = False
+        self.restored = set()  # tasks of the clients taken over
+        self.restart_time = None
+        self.stats = collections.Counter()
+        self.sweep = None  # going on, if any
+        self.scheduler = CommandScheduler(
+            tick_budget=self.config.command_tick_budget,
+            queue_limit=self.config.input_queue_limit,
+        )
+        if self.config.db_backend == "sqlite":
+            from mushroom.sqlitedb import SqliteDatabase
+
+            game.use_database(SqliteDatabase(self.config.db_cache_size))
+        elif self.config.db_backend == "indexed":
+            from mushroom.indexeddb import IndexedDatabase
+
+            game.use_database(IndexedDatabase(self.config.db_cache_size))
+        for attr in self.config.db_indexes:
+            game.db.add_index(attr)
+        if not self.config.track_containers:
+            if self.config.journal or self.config.sweep_reclaim or game.db.incremental:
+                raise ValueError(
+                    "track_containers = false needs full saves, without the"
+                    " journal, and sweeps that don't reclaim"
+                )
+            game.db.track_containers = False
         self.load_db()
 
-    async def start(self):
+    async def start(self, handoff_fd=None):
         self.running = True
-        self.server = await asyncio.start_server(
-            self._on_client_connect, self.config.listen_address, self.config.listen_port
-        )
+        # commands run on this loop, so it's the one that gets to touch the world
+        self.game.attach(asyncio.get_running_loop())
+        self.scheduler_task = asyncio.create_task(self.scheduler.run())
+        if handoff_fd is not None:
+            await self.take_over(handoff_fd)
+        elif self.config.frontend_workers:
+            from mushroom import frontend
+
+            self.server, self.frontends = await frontend.start_workers(self)
+        else:
+            self.server = await asyncio.start_server(
+                self._on_client_connect,
+                self.config.listen_address,
+                self.config.listen_port,
+            )
+        if self.config.websocket_enabled and self.websocket_server is None:
+            await self.serve_websocket()
+        if self.config.portal_enabled and self.portal is None:
+            self.start_portal()
         logger.info("Server started and ready to accept connections.")
 
+    async def serve_websocket(self, sock=None):
+        """Listens for WebSocket clients, on `sock` if it is given."""
+        if sock is None:
+            host, port = self.config.websocket_address, self.config.websocket_port
+        else:
+            host, port = None, None
+        self.websocket_server = await websockets.asyncio.server.serve(
+            self._on_websocket_connect,
+            host,
+            port,
+            sock=sock,
+            compression="deflate",
+            # a message may hold several lines, overlong ones are cut
+            max_size=max(WEBSOCKET_MAX_SIZE, 4 * self.config.max_line_length),
+        )
+        logger.info(f"Accepting WebSocket clients on port {self.config.websocket_port}")
+
+    def start_portal(self, sock=None):
+        logger.info("Starting portal server")
+        self.portal = PortalServer(
+            ip=self.config.portal_ip, port=self.config.portal_port, sock=sock
+        )
+        self.portal.start()
+
+    def listening_sockets(self):
+        """What this process listens on, as (kind, socket) pairs."""
+        sockets = [("telnet", s) for s in self.server.sockets]
+        for listener in self.listeners:
+            sockets += [("telnet", s) for s in listener.sockets]
+        if self.websocket_server is not None:
+            sockets += [("websocket", s) for s in self.websocket_server.sockets]
+        if self.portal is not None:
+            sockets += [("portal", s) for s in self.portal.sockets]
+        return sockets
+
     def greet_client(self, client):
         try:
             with open(self.config.motd_file, "r") as f:
@@ -225,34 +634,59 @@ class Server:
         except OSError:
             client.send("Welcome!\n")
 
+    def count(self, event):
+        self.stats[event] += 1
+
     async def _on_client_connect(self, reader, writer):
         handler = ClientHandler(self, writer)
+        handler.negotiate()
+        lines = read_lines(reader, handler, self.config.max_line_length)
+        await self.serve_client(
+            handler, limit_input(lines, handler, self.config, self.count)
+        )
+
+    async def _on_websocket_connect(self, websocket):
+        handler = WebSocketHandler(self, websocket)
+        lines = read_messages(websocket, self.config.max_line_length)
+        await self.serve_client(
+            handler, limit_input(lines, handler, self.config, self.count)
+        )
+
+    async def serve_client(self, handler, lines, state=None):
+        """Runs a client until it disconnects.
+
+        `state` is set for a client taken over from a previous process.
+        """
         client = Client(handler, handler.name, self.game)
         scommand_handler = ServerCommandHandler(self, client)
-        self.client_register.add(client)
-
-        logger.info(f"New client: {client.name}")
-        self.greet_client(client)
+        if state is None:
+            if self.restarting:
+                handler.send("The server is restarting, please reconnect.\n")
+                handler.shutdown()
+                return
+            self.client_register.add(client)
+            logger.info(f"New client: {client.name}")
+            self.greet_client(client)
+        else:
+            self.client_register.add(client, cid=state["id"])
+            handler.op = state["op"]
+            player = self.game.db.get(state["player"])
+            if player is not None:
+                client.resume(player)
+            else:
+                client.name = state["name"]
+            client.send(f"Server restarted in {self.restart_time:.2f}s.")
 
-        while self.running:
-            data = await reader.readline()
-            if not data:
-                break
-            self.dirty = True
-            try:
-                data = data.decode("utf8")
-                self.dirty = True
-                if self.config.debug:
-                    self.log(f"data from {client.name}: {data!r}")
-                if not scommand_handler.handle_input(data):
-                    client.handle_input(data)
-            except Exception as e:  # noqa: BLE001
-                traceback.print_exc()
-                if self.config.debug:
-                    client.send(f"{e!r}\n")
-                    continue
-                client.send("An error occured. Please reconnect...\n")
+        async for data in lines:
+            if not self.running:
                 break
+            await self.scheduler.submit(
+                client,
+                functools.partial(self._run_command, client, scommand_handler, data),
+            )
+        await self.scheduler.finish(client)
+        if self.handed_off:
+            return  # still connected, to the new process
 
         logger.info(f"Client disconnected: {client.name}")
         client.on_disconnect()
@@ -260,6 +694,131 @@ class Server:
         self.client_register.delete(client)
         self.client_register.broadcast(client.name + " has quit.")
 
+    def _run_command(self, client, scommand_handler, data):
+        """Returns False if the client can't go on."""
+        try:
+            data = data.decode("utf8")
+            if self.config.debug:
+                self.log(f"data from {client.name}: {data!r}")
+            if not scommand_handler.handle_input(data):
+                client.handle_input(data)
+        except Exception as e:  # noqa: BLE001
+            traceback.print_exc()
+            if self.config.debug:
+                client.send(f"{e!r}\n")
+                return True
+            client.send("An error occured. Please reconnect...\n")
+            client.handler.shutdown()
+            return False
+        return True
+
+    async def hot_restart(self):
+        """Save the world, and hand everything over to a new process."""
+        if self.config.frontend_workers:
+            self.broadcast("Restart is not available with front-end processes.")
+            return
+        started = time.time()
+        self.restarting = True
+        self.broadcast("Restarting the server, hold on...")
+        self.save_db()
+
+        clients = []
+        for client in list(self.client_register.clients):
+            if type(client.handler) is ClientHandler:
+                clients.append(client)
+            else:
+                # there's no taking over a WebSocket session
+                client.send("The server is restarting, please reconnect.")
+                client.handler.shutdown()
+        timeout = self.config.restart_timeout
+        await asyncio.gather(*(c.handler.suspend(timeout) for c in clients))
+
+        sock, process = handoff.spawn(sys.argv[1:])
+        try:
+            handoff.send(
+                sock,
+                started,
+                self.listening_sockets(),
+                [
+                    (
+                        self.handoff_state(c),
+                        c.handler.transport.get_extra_info("socket"),
+                    )
+                    for c in clients
+                ],
+            )
+            sock.setblocking(False)
+            async with asyncio.timeout(timeout):
+                ack = await asyncio.get_running_loop().sock_recv(sock, 16)
+            if ack != b"ready":
+                raise ConnectionError("the new process did not take over")
+        except (OSError, TimeoutError) as e:
+            logger.error(f"Restart failed: {e!r}")
+            process.kill()
+            self.restarting = False
+            for client in clients:
+                client.handler.resume()
+            self.broadcast("Restart failed, carrying on.")
+            return
+        finally:
+            sock.close()
+
+        logger.info(f"Handed over to process {process.pid}")
+        self.handed_off = True
+        self.running = False
+        for client in clients:
+            # only closes our descriptor, the new process has its own
+            client.handler.transport.abort()
+        self.server.close()
+
+    def handoff_state(self, client):
+        return {
+            "id": self.client_register.idmap[client],
+            "name": client.name,
+            "player": client.player.id if client.player is not None else None,
+            "op": client.handler.op,
+        }
+
+    async def take_over(self, fd):
+        """Adopt the sockets of the process that is restarting."""
+        sock = socket.socket(fileno=fd)
+        started, listeners, clients = handoff.receive(sock)
+        servers = []
+        for kind, listener in listeners:
+            if kind == "telnet":
+                servers.append(
+                    await asyncio.start_server(self._on_client_connect, sock=listener)
+                )
+            elif kind == "websocket" and self.config.websocket_enabled:
+                await self.serve_websocket(listener)
+            elif kind == "portal" and self.config.portal_enabled:
+                self.start_portal(listener)
+            else:
+                listener.close()  # turned off in the configuration since
+        self.server, *self.listeners = servers
+        handlers = []
+        for state, client_sock in clients:
+            reader, writer = await asyncio.open_connection(sock=client_sock)
+            handlers.append((state, reader, ClientHandler(self, writer)))
+        sock.send(b"ready")
+        sock.close()
+        self.restart_time = time.time() - started
+        logger.info(
+            f"Took over {len(clients)} clients, restart took {self.restart_time:.2f}s"
+        )
+        for state, reader, handler in handlers:
+            handler.negotiate()
+            lines = read_lines(reader, handler, self.config.max_line_length)
+            task = asyncio.create_task(
+                self.serve_client(
+                    handler,
+                    limit_input(lines, handler, self.config, self.count),
+                    state=state,
+                )
+            )
+            self.restored.add(task)
+            task.add_done_callback(self.restored.discard)
+
     def load_db(self):
         try:
             self.game.load_db(self.config.db_file)
@@ -268,17 +827,159 @@ class Server:
             logger.info("Database not found, starting fresh.")
 
     def save_db(self):
+        """Saves the world right away, blocking everything else."""
+        if self.save_child is not None:
+            # don't race it for the temporary file
+            with contextlib.suppress(ChildProcessError):
+                os.waitpid(self.save_child, 0)
+            self.save_child = None
         logger.info("Saving database.")
+        start = time.monotonic()
         self.game.dump_db(self.config.db_file)
+        self.saved(start, self.journal.size)
+
+    def saved(self, start, journal_offset):
+        """Bookkeeping after a full save, that started with the journal at
+        `journal_offset` bytes."""
+        self.journal.trim(journal_offset)
+        self.last_save = time.monotonic()
+        self.save_duration = self.last_save - start
+        logger.info(f"Database saved in {self.save_duration:.2f}s.")
+
+    def flush_journal(self):
+        """Appends the objects changed since the last flush to the journal."""
+        if not (changed := self.game.db.take_changes()):
+            return
+        try:
+            self.journal.append(self.game.db, changed)
+        except OSError as e:
+            logger.error(f"Could not write the journal: {e}")
+            self.game.db.restore_changes(changed)
+
+    async def save_world(self):
+        """Saves the world according to `save_mode`.
+
+        Forking copies only the thread that forks, the one running the world.
+        Other threads (the portal's, asyncio.to_thread's) may be running, as
+        long as they don't change the world: the child sees it as of the
+        fork, and must not wait on a lock one of them held then.
+        """
+        if (
+            self.config.save_mode != "fork"
+            or not hasattr(os, "fork")
+            or self.game.db.incremental
+            or not self.game.db.fork_save
+        ):
+            self.save_db()
+            return
+        if self.save_child is not None:
+            return  # already on it
+        logger.info("Saving database in a child process.")
+        start = time.monotonic()
+        changed = self.game.db.take_changes()
+        journal_offset = self.journal.size
+        pid = os.fork()
+        if pid == 0:
+            self._save_in_child()
+        self.save_child = pid
+        try:
+            _, status = await asyncio.to_thread(os.waitpid, pid, 0)
+        except ChildProcessError:
+            return  # save_db reaped it
+        if self.save_child != pid:
+            return  # save_db took over
+        self.save_child = None
+        if (code := os.waitstatus_to_exitcode(status)) != 0:
+            logger.error(f"Saving the database failed in the child ({code}).")
+            self.game.db.restore_changes(changed)
+            return
+        self.saved(start, journal_offset)
+
+    def _save_in_child(self):
+        # The child shares the parent's memory copy-on-write, so this is a
+        # snapshot of the world as of the fork. It never returns: exiting
+        # through the event loop would tear down the parent's state.
+        # The other threads are gone: the database lock goes, and errors are
+        # written straight to fd 2, since sys.stderr has a lock too. logging
+        # resets its own locks in forked children.
+        code = 1
+        try:
+            # let go of the client sockets, so that they close with the parent
+            os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+            self.game.db.single_owner()
+            self.game.dump_db(self.config.db_file)
+            code = 0
+        except BaseException:  # noqa: BLE001
+            os.write(2, traceback.format_exc().encode("utf8", "replace"))
+        finally:
+            os._exit(code)
+
+    def autosave_delay(self):
+        """Seconds until the next autosave is due.
+
+        Saves come sooner when the world changes fast, and later when a
+        save takes long.
+        """
+        config = self.config
+        since = time.monotonic() - self.last_save
+        interval = config.autosave_period
+        if changes := self.game.db.changes:
+            rate = changes / max(since, 1.0)
+            interval = min(interval, config.autosave_changes / rate)
+        interval = max(
+            interval,
+            config.autosave_min_period,
+            self.save_duration * SAVE_DUTY_FACTOR,
+        )
+        return interval - since
 
     async def autosave(self):
+        if self.config.journal and not self.game.db.incremental:
+            await self.journal_loop()
+            return
         while self.running:
-            await asyncio.sleep(self.config.autosave_period)
-            if not self.dirty:
+            delay = self.autosave_delay()
+            if delay > 0 or not self.game.db.changes:
+                # check back regularly, the rate of change may pick up
+                await asyncio.sleep(
+                    min(max(delay, 1.0), self.config.autosave_min_period)
+                )
                 continue
-            self.save_db()
+            await self.save_world()
             self.client_register.broadcast("Saving the world...")
 
+    async def journal_loop(self):
+        """Flushes changes to the journal, and compacts it once in a while."""
+        while self.running:
+            await asyncio.sleep(self.config.journal_period)
+            if not self.running:
+                break  # the journal may belong to a new process by now
+            self.flush_journal()
+            if self.journal.size > self.config.journal_compact_size:
+                await self.save_world()
+
+    async def sweep_loop(self):
+        """Sweeps the world every sweep_period seconds."""
+        while self.running:
+            await asyncio.sleep(self.config.sweep_period)
+            if self.sweep is None:
+                await self.run_sweep(self.config.sweep_reclaim)
+
+    async def run_sweep(self, reclaim=False, client=None):
+        """Looks for objects nothing refers to, a slice at a time, and logs
+        what it found, or sends it to `client`."""
+        sweep = self.sweep = Sweep(self.game.db, reclaim=reclaim)
+        try:
+            while not sweep.step(self.config.sweep_slice):
+                await asyncio.sleep(0)  # let the game go on
+        finally:
+            sweep.cancel()
+            self.sweep = None
+        for line in sweep.report():
+            logger.info(f"Sweep: {line}")
+            if client is not None:
+                client.send(f"{line}\n")
+
     def broadcast(self, msg):
         self.client_register.broadcast(msg)
 
@@ -287,11 +988,22 @@ class Server:
 
     async def serve_forever(self):
         asyncio.create_task(self.autosave())
+        if self.config.sweep_period > 0 and self.game.db.snapshots:
+            asyncio.create_task(self.sweep_loop())
         try:
             await self.server.serve_forever()
         finally:
-            self.client_register.broadcast("Shutting down...")
-            self.save_db()
+            for listener in self.listeners:
+                listener.close()
+            if self.websocket_server is not None:
+                self.websocket_server.close()
+            if self.portal is not None:
+                self.portal.close()
+            if not self.handed_off:
+                self.client_register.broadcast("Shutting down...")
+                self.save_db()
+            for frontend in self.frontends:
+                frontend.terminate()
 
 
 def parse_args():
@@ -300,6 +1012,8 @@ def parse_args():
     parser.add_argument(
         "--verbose", "-v", action="store_true", help="enable verbose logging"
     )
+    # used by @restart to hand over connections to the new process
+    parser.add_argument("--handoff-fd", type=int, help=argparse.SUPPRESS)
     return parser.parse_args()
 
 
@@ -319,14 +1033,10 @@ async def amain():
             cfg_override = tomli.load(file)
     config = Config(**cfg_override)
 
-    if config.portal_enabled:
-        logger.info("Starting portal server")
-        portal_server = PortalServer(ip=config.portal_ip, port=config.portal_port)
-        await portal_server.start()
-
-    logger.info(f"Starting server on {config.listen_address}:{config.listen_port}")
+    if args.handoff_fd is None:
+        logger.info(f"Starting server on {config.listen_address}:{config.listen_port}")
     server = Server(config, game)
-    await server.start()
+    await server.start(handoff_fd=args.handoff_fd)
 
     try:
         await server.serve_forever()
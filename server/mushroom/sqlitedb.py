@@ -0,0 +1,152 @@
+"""
+A Database kept in SQLite, one row per object, loaded as needed.
+
+To migrate a pickled world:
+
+    python -m mushroom.sqlitedb world.sav world.db
+"""
+
+import argparse
+import sqlite3
+import time
+
+from mushroom import util
+from mushroom.db import BaseObject, Database, class_name, resolve_class
+from mushroom.lazydb import LazyDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    class TEXT NOT NULL,
+    name TEXT,
+    state BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_class ON objects (class);
+"""
+
+
+class SqliteDatabase(LazyDatabase):
+    """The database holding the world, in SQLite."""
+
+    incremental = True
+
+    def __init__(self, cache_size=10_000):
+        super().__init__(cache_size)
+        self._classes = {}  # class name -> class
+        self.conn = None
+
+    def load(self, db_file):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript(SCHEMA)
+        (last_id,) = self.conn.execute("SELECT max(id) FROM objects").fetchone()
+        self._next_id = 0 if last_id is None else last_id + 1
+
+    def _class(self, name):
+        if (cls := self._classes.get(name)) is None:
+            cls = self._classes[name] = resolve_class(name)
+        return cls
+
+    # searched in SQL, no need for the in-memory indexes
+
+    def _index(self, obj_id, obj):
+        pass
+
+    def _unindex(self, obj_id, obj):
+        pass
+
+    def _touched(self, obj_id, attr):
+        pass
+
+    def _state(self, obj_id):
+        row = self.conn.execute(
+            "SELECT state FROM objects WHERE id = ?", (obj_id,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    # saving
+
+    def save(self, db_file):
+        """Writes the objects changed since the last save, in a transaction."""
+        changed = self.take_changes()
+        try:
+            self.write(changed)
+        except BaseException:
+            self.restore_changes(changed)
+            raise
+        for obj_id in changed:
+            self._pinned.pop(obj_id, None)
+        self._removed -= changed
+
+    def write(self, ids):
+        rows, removed = [], []
+        for obj_id in ids:
+            if (obj := self._objects.get(obj_id)) is None:
+                removed.append((obj_id,))
+                continue
+            if "_ghost" in obj.__dict__:
+                continue  # never loaded, so unchanged
+            state = self.pickle_object(obj)
+            rows.append((obj_id, class_name(type(obj)), obj.name, state))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.executemany("DELETE FROM objects WHERE id = ?", removed)
+
+    def dump(self, db_file):
+        self.save(db_file)
+
+    def import_objects(self, objects):
+        """Writes a whole world, as loaded by another Database."""
+        for obj_id, obj in objects.items():
+            self._put(obj_id, obj)
+        self.write(list(objects))
+
+    # searching
+
+    def search(self, name="", type=BaseObject):
+        classes = [
+            n
+            for (n,) in self.conn.execute("SELECT DISTINCT class FROM objects")
+            if issubclass(self._class(n), type)
+        ]
+        found = {}
+        query = "SELECT id, class, name FROM objects WHERE class IN ({})".format(
+            ", ".join("?" * len(classes))
+        )
+        for obj_id, cls, obj_name in self.conn.execute(query, classes):
+            if obj_id in self._changed:
+                continue  # checked below, as it is now
+            if util.match_name(name, obj_name):
+                found[obj_id] = self.reference(obj_id, self._class(cls), obj_name)
+        for obj_id in self._changed:
+            obj = self._objects.get(obj_id)
+            if obj is None or not isinstance(obj, type):
+                continue
+            if util.match_name(name, obj.name):
+                found[obj_id] = obj
+        return [found[k] for k in sorted(found)]
+
+
+def migrate(src, dst):
+    """Copies a pickled world into a new SQLite database."""
+    db = Database()
+    db.load(src)
+    target = SqliteDatabase()
+    target.load(dst)
+    target.import_objects(dict(db._objects))
+    return len(db._objects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a world.sav to SQLite.")
+    parser.add_argument("src", help="pickled world, e.g. world.sav")
+    parser.add_argument("dst", help="SQLite database to create, e.g. world.db")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = migrate(args.src, args.dst)
+    print(f"Migrated {count} objects in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Finds the objects nothing in the world refers to any more, a little at a
+time.
+
+A sweep marks every object it can reach from the roots, the world config,
+the rooms and the players, following what their attributes refer to, in
+lists, dicts, tuples and sets too. What's left is unreachable: it can't be
+seen or used in the game, only found by id. References to objects that are
+no longer in the database are dangling, and reported too.
+
+The sweep runs in slices, between which the world goes on. Objects changed
+or added meanwhile are marked and looked at again before it's done, so that
+moving something from a place the sweep hasn't seen yet to one it has
+doesn't make it look unreachable. Lists and dicts within lists and dicts
+don't say when they change, that the sweep can't catch.
+"""
+
+import time
+
+from mushroom.db import BaseObject
+from mushroom.world import Config, Player, Room
+
+ROOTS = (Config, Room, Player)
+
+# objects looked at between two looks at the clock
+_BATCH = 64
+
+_CONTAINERS = (list, tuple, set, frozenset)
+
+
+class Sweep:
+    """
+    A sweep of `db`, which must have all its objects in memory (snapshots).
+    Call `step` until it returns True, from the world's executor. With
+    `reclaim`, unreachable objects are then removed from the database.
+    """
+
+    def __init__(self, db, reclaim=False, roots=ROOTS):
+        if not db.snapshots:
+            raise TypeError(f"{type(db).__name__} can't be swept")
+        if db._marking is not None:
+            raise RuntimeError("A sweep is already going on")
+        self.db = db
+        self.reclaim = reclaim
+        self.roots = roots
+        self.unreachable = []  # ids, in order
+        self.dangling = []  # (id of the referrer, attribute, object)
+        self.reclaimed = 0
+        self.slices = 0
+        self.longest = 0.0  # seconds, of the longest slice
+        self._marked = set()
+        self._gray = []  # marked objects, their attributes not looked at yet
+        # ids are never reused, newer objects are in db._marking
+        self._end = db._next_id
+        self._ids = iter(range(self._end))
+        self._phase = self._find_roots
+        db._marking = set()  # ids of the objects changed from now on
+
+    @property
+    def done(self):
+        return self._phase is None
+
+    def step(self, budget=0.005):
+        """Works for about `budget` seconds. Returns True once done."""
+        start = time.perf_counter()
+        self._catch_up()
+        going = self._phase is not None
+        while going and time.perf_counter() - start < budget:
+            for _ in range(_BATCH):
+                if not (going := self._phase()):
+                    break
+        self.slices += 1
+        self.longest = max(self.longest, time.perf_counter() - start)
+        return self._phase is None
+
+    def cancel(self):
+        """Stops the sweep, if it isn't done."""
+        if self._phase is not None:
+            self._phase = None
+            self.db._marking = None
+
+    # marking
+
+    def _mark(self, obj):
+        # not get_id, which takes the lock every time
+        if (obj_id := self.db._ids.get(obj)) is not None and obj_id not in self._marked:
+            self._marked.add(obj_id)
+            self._gray.append((obj_id, obj))
+
+    def _catch_up(self):
+        """Marks the objects changed or added since the last slice, so that
+        what they refer to now gets marked too."""
+        db = self.db
+        if self._phase is None or not db._marking:
+            return
+        changed, db._marking = db._marking, set()
+        self.dangling = [d for d in self.dangling if d[0] not in changed]
+        for obj_id in changed:
+            if (obj := db._fetch(obj_id)) is not None:
+                self._marked.discard(obj_id)  # to look at its attributes again
+                self._mark(obj)
+
+    def _scan(self, obj_id, obj):
+        """Marks what the attributes of `obj` refer to."""
+        for attr, value in list(obj.__dict__.items()):
+            if attr[0] == "_":
+                continue
+            values = [value]
+            while values:
+                value = values.pop()
+                if isinstance(value, BaseObject):
+                    if value not in self.db._ids:
+                        self.dangling.append((obj_id, attr, value))
+                    else:
+                        self._mark(value)
+                elif isinstance(value, dict):
+                    values.extend(value.keys())
+                    values.extend(value.values())
+                elif isinstance(value, _CONTAINERS):
+                    values.extend(value)
+
+    # phases, that do one thing at a time: they return False to end the slice
+
+    def _find_roots(self):
+        if self._gray:
+            self._scan(*self._gray.pop())
+        elif (obj_id := next(self._ids, None)) is None:
+            self._phase = self._finish_marking
+        elif isinstance(obj := self.db._fetch(obj_id), self.roots):
+            self._mark(obj)
+        return True
+
+    def _finish_marking(self):
+        if self._gray:
+            self._scan(*self._gray.pop())
+            return True
+        if self.db._marking:
+            return False  # the next slice catches up first
+        self._ids = iter(range(self._end))
+        self._phase = self._find_unreachable
+        return True
+
+    def _find_unreachable(self):
+        if self._gray:  # changed since, and referring to others maybe
+            self._scan(*self._gray.pop())
+            return True
+        if (obj_id := next(self._ids, None)) is None:
+            if self.db._marking:
+                return False  # nothing is unreachable before it's caught up
+            if not self.reclaim:
+                return self._finish()
+            self._ids = iter(list(self.unreachable))
+            self._phase = self._reclaim
+            return True
+        if obj_id not in self._marked and self.db._fetch(obj_id) is not None:
+            self.unreachable.append(obj_id)
+        return True
+
+    def _reclaim(self):
+        if self._gray:  # changed since, and referring to others maybe
+            self._scan(*self._gray.pop())
+        elif (obj_id := next(self._ids, None)) is None:
+            return self._finish()
+        elif obj_id not in self._marked and self.db._fetch(obj_id) is not None:
+            # still unreachable, as of the last catch up
+            self.db.remove(obj_id)
+            self.reclaimed += 1
+        return True
+
+    def _finish(self):
+        self.unreachable = [i for i in self.unreachable if i not in self._marked]
+        self._phase = None
+        self.db._marking = None
+        return False
+
+    def report(self):
+        """What the sweep found, in a few lines."""
+        lines = [
+            f"{len(self._marked)} objects reachable,"
+            f" {len(self.unreachable)} unreachable"
+            + (f", {self.reclaimed} reclaimed" if self.reclaim else "")
+            + f", in {self.slices} slices of at most"
+            f" {self.longest * 1000:.1f} ms",
+        ]
+        if self.unreachable:
+            ids = ", ".join(f"#{i}" for i in self.unreachable[:20])
+            more = len(self.unreachable) - 20
+            lines.append(
+                f"Unreachable: {ids}" + (f" and {more} more" if more > 0 else "")
+            )
+        for obj_id, attr, obj in self.dangling[:20]:
+            lines.append(
+                f"#{obj_id}.{attr} refers to {obj.name!r}, not in the database"
+            )
+        if len(self.dangling) > 20:
+            lines.append(f"... and {len(self.dangling) - 20} more dangling references")
+        return lines
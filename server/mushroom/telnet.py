@@ -0,0 +1,70 @@
+"""
+Just enough of the telnet protocol to negotiate options with clients.
+"""
+
+SE = 240
+SB = 250
+WILL = 251
+WONT = 252
+DO = 253
+DONT = 254
+IAC = 255
+
+COMPRESS2 = 86  # MCCP2
+
+# parser states
+DATA, COMMAND, OPTION, SUBNEG, SUBNEG_IAC = range(5)
+
+
+def command(cmd, option):
+    return bytes((IAC, cmd, option))
+
+
+def subnegotiation(option, payload=b""):
+    return bytes((IAC, SB, option)) + payload + bytes((IAC, SE))
+
+
+class Parser:
+    """
+    Separates telnet commands from the data in a client's input stream.
+
+    `on_negotiation(cmd, option)` is called for every WILL/WONT/DO/DONT
+    received. Subnegotiations and other commands are dropped.
+    """
+
+    def __init__(self, on_negotiation):
+        self.on_negotiation = on_negotiation
+        self.state = DATA
+        self.cmd = None
+
+    def feed(self, data):
+        """Returns the application data found in `data`."""
+        if self.state == DATA and IAC not in data:
+            return data
+        out = bytearray()
+        for byte in data:
+            if self.state == DATA:
+                if byte == IAC:
+                    self.state = COMMAND
+                else:
+                    out.append(byte)
+            elif self.state == COMMAND:
+                if byte == IAC:
+                    out.append(IAC)  # escaped 0xff
+                    self.state = DATA
+                elif byte in (WILL, WONT, DO, DONT):
+                    self.cmd = byte
+                    self.state = OPTION
+                elif byte == SB:
+                    self.state = SUBNEG
+                else:
+                    self.state = DATA
+            elif self.state == OPTION:
+                self.state = DATA
+                self.on_negotiation(self.cmd, byte)
+            elif self.state == SUBNEG:
+                if byte == IAC:
+                    self.state = SUBNEG_IAC
+            elif self.state == SUBNEG_IAC:
+                self.state = DATA if byte == SE else SUBNEG
+        return bytes(out)
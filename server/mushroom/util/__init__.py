@@ -4,10 +4,13 @@ from mushroom.util import template
 from mushroom.util.cipher import cipher, decipher
 from mushroom.util.format import format
 from mushroom.util.format import format_object as pretty_format
-from mushroom.util.rwlock import RWLock
+from mushroom.util.ratelimit import TokenBucket
+from mushroom.util.rwlock import NullLock, RWLock
 
 __all__ = [
+    "NullLock",
     "RWLock",
+    "TokenBucket",
     "cipher",
     "decipher",
     "format",
@@ -0,0 +1,44 @@
+import time
+
+
+class TokenBucket:
+    """
+    A token bucket rate limiter.
+    Tokens are added at `rate` per second, up to `burst` tokens.
+
+    Example use:
+        bucket = TokenBucket(rate=10, burst=20)
+
+        if bucket.take():
+            do_stuff()
+        else:
+            time.sleep(bucket.delay())
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self):
+        """Take a token if one is available. Returns True on success."""
+        if self.rate <= 0:
+            return True  # no limit
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def delay(self):
+        """Seconds until the next token is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
@@ -6,6 +6,7 @@ class RWLock:
     A read-write lock.
     Will allow concurrent reads but serialize all writes.
     Write operations have a higher priority.
+    The thread holding the write lock may take it, or the read lock, again.
 
     Example use:
         lock = RWLock()
@@ -37,6 +38,8 @@ class RWLock:
         self.w_cv = threading.Condition(self.lock)
         self.readers = 0
         self.writers = 0
+        self.owner = None  # thread holding the write lock
+        self.depth = 0  # times it took a lock again
 
         # 'public' members
         self.r = RWLock.Selector(self, write=False)
@@ -44,25 +47,52 @@ class RWLock:
 
     def acquire_r(self):
         with self.lock:
+            if self.owner == threading.get_ident():
+                self.depth += 1
+                return
             while self.readers < 0 or self.writers:
                 self.r_cv.wait()
             self.readers += 1
 
     def acquire_w(self):
         with self.lock:
+            if self.owner == (me := threading.get_ident()):
+                self.depth += 1
+                return
             while self.readers != 0:
                 self.writers += 1
                 self.w_cv.wait()
                 self.writers -= 1
             self.readers = -1
+            self.owner = me
 
     def release(self):
         with self.lock:
+            if self.depth:
+                self.depth -= 1
+                return
             if self.readers < 0:
                 self.readers = 0
+                self.owner = None
             else:
                 self.readers -= 1
             if self.writers and self.readers == 0:
                 self.w_cv.notify()
             elif self.writers == 0:
                 self.r_cv.notify_all()
+
+
+class NullLock:
+    """
+    Stands in for an RWLock where there is only ever one thread.
+    """
+
+    class Selector:
+        def __enter__(self):
+            pass
+
+        def __exit__(self, exc_t, exc_v, trace):
+            pass
+
+    def __init__(self):
+        self.r = self.w = NullLock.Selector()
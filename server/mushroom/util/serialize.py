@@ -1,35 +1,149 @@
-def serialize(val):
+"""
+Values as JSON: {"kind": ..., "spec": ...} manifests for what JSON doesn't
+have, world objects in the database as DbRefs.
+
+`ref` tells which values are references to world objects, by returning
+their id, and `deserialize` calls it with the id to get the object back.
+Both default to the game's database.
+"""
+
+import functools
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def game_ref(val):
     from mushroom.db import BaseObject
 
     if isinstance(val, BaseObject):
-        return {"kind": "DbRef", "spec": val.id}
-    elif hasattr(val, "_serialize"):
-        return val._serialize()
-    elif val is None or isinstance(val, (str, int, float, bool)):
+        return val.id
+    return None
+
+
+def game_object(obj_id):
+    from mushroom.game import Game
+
+    return Game.get_instance().db.get(obj_id)
+
+
+_SCALARS = frozenset({str, int, float, bool, type(None)})
+
+
+def serialize(val, ref=game_ref):
+    # most common first, this runs for every value of the world
+    if type(val) in _SCALARS:
         return val
+    elif (obj_id := ref(val)) is not None:
+        return {"kind": "DbRef", "spec": obj_id}
     elif isinstance(val, list):
-        return [serialize(x) for x in val]
+        return [x if type(x) in _SCALARS else serialize(x, ref) for x in val]
     elif isinstance(val, dict):
-        return {k: serialize(v) for k, v in val.items()}
+        if "kind" not in val and all(type(k) is str for k in val):
+            return {
+                k: v if type(v) in _SCALARS else serialize(v, ref)
+                for k, v in val.items()
+            }
+        # or it could pass for a manifest, or have keys JSON doesn't
+        items = [[serialize(k, ref), serialize(v, ref)] for k, v in val.items()]
+        return {"kind": "dict", "spec": items}
+    elif hasattr(val, "_serialize"):
+        return val._serialize(ref)
+    elif isinstance(val, (str, int, float, bool)):
+        return val
+    elif isinstance(val, (tuple, set, frozenset)):
+        kind = next(t for t in (tuple, frozenset, set) if isinstance(val, t))
+        return {"kind": kind.__name__, "spec": [serialize(x, ref) for x in val]}
+    elif isinstance(val, re.Pattern):
+        return {"kind": "Pattern", "spec": [val.pattern, val.flags]}
     return {"kind": "OpaqueObject", "spec": repr(val)}
 
 
+_CONTAINERS = {"tuple": tuple, "set": set, "frozenset": frozenset}
+_JSON_CONTAINERS = frozenset({list, dict})
+
+
+def deserialize(val, ref=game_object):
+    if type(val) is list:
+        return [deserialize(x, ref) if type(x) in _JSON_CONTAINERS else x for x in val]
+    if type(val) is not dict:
+        return val
+    if (kind := val.get("kind")) is None:
+        return {
+            k: deserialize(v, ref) if type(v) in _JSON_CONTAINERS else v
+            for k, v in val.items()
+        }
+    spec = val.get("spec")
+    if kind == "DbRef":
+        return ref(spec)
+    if kind == "dict":
+        return {deserialize(k, ref): deserialize(v, ref) for k, v in spec}
+    if (container := _CONTAINERS.get(kind)) is not None:
+        return container(deserialize(x, ref) for x in spec)
+    if kind == "Pattern":
+        return re.compile(*spec)
+    if kind == "OpaqueObject":
+        logger.warning(f"{spec} can't be deserialized, kept as a string")
+        return spec
+    return serializable_class(kind)._deserialize(val, ref)
+
+
+@functools.cache
+def serializable_class(kind):
+    """The Serializable class a manifest is about. Only mushroom's modules
+    are imported to find it, files can't make others run."""
+    from mushroom.db import resolve_class
+
+    module = kind.partition(":")[0]
+    if module != "mushroom" and not module.startswith("mushroom."):
+        raise ValueError(f"Can't deserialize a {kind}")
+    try:
+        cls = resolve_class(kind)
+    except ImportError:
+        cls = None
+    except AttributeError:
+        cls = None
+    if isinstance(cls, type) and issubclass(cls, Serializable):
+        return cls
+    raise ValueError(f"Can't deserialize a {kind}")
+
+
+def restore(obj, spec, ref=game_object):
+    """Gives `obj` the fields of a manifest's spec."""
+    fields = {
+        k: deserialize(v, ref) if type(v) in _JSON_CONTAINERS else v
+        for k, v in spec.items()
+    }
+    if (setstate := getattr(type(obj), "__setstate__", None)) is not None:
+        setstate(obj, fields)
+    else:
+        obj.__dict__.update(fields)
+
+
 class Serializable:
-    def _serialize(self):
+    def _serialize(self, ref=game_ref):
+        from mushroom.db import class_name
+
+        names = self.__dir__()  # in their order, dir() would sort them
+        fields = self.__dict__
         return {
-            "kind": self.__class__.__name__,
-            "spec": {k: serialize(getattr(self, k)) for k in dir(self)},
+            "kind": class_name(type(self)),
+            "spec": {
+                k: v if type(v := fields[k]) in _SCALARS else serialize(v, ref)
+                for k in names
+            },
         }
 
     @classmethod
-    def _deserialize(cls, manifest):
+    def _deserialize(cls, manifest, ref=game_object):
+        from mushroom.db import class_name
+
         kind = manifest.get("kind", None)
-        if cls.__name__ != kind:
+        if class_name(cls) != kind:
             raise AttributeError(
                 f"Wrong object type for class [{cls.__name__}]: [{kind}]"
             )
-        spec = manifest.get("spec", {})
-        name = spec.pop("name", None)
-        obj = cls(name)
-        obj.__dict__.update(spec)
+        obj = cls.__new__(cls)
+        restore(obj, manifest.get("spec", {}), ref)
         return obj
@@ -1,3 +1,5 @@
+import copy
+import copyreg
 import logging
 from functools import cached_property
 
@@ -5,13 +7,14 @@ import frozendict
 
 from mushroom import util
 from mushroom.commands import BoundCode, Code, Lambda, WrapperCommand
-from mushroom.db import BaseObject
+from mushroom.db import CURRENT_SCHEMA, BaseObject, saved_state, state_items, track
 from mushroom.game import Game
+from mushroom.util.serialize import Serializable
 
 logger = logging.getLogger(__name__)
 
 
-class Object(BaseObject):
+class Object(BaseObject, Serializable):
     """
     Base database object.
     """
@@ -69,6 +72,8 @@ class Object(BaseObject):
         return [WrapperCommand(k, getattr(self, v)) for k, v in self.fw_cmds.items()]
 
     def __dir__(self):
+        if "_ghost" in self.__dict__:
+            self._ghost.materialize(self)
         return [k for k in self.__dict__ if not k.startswith("_")]
 
     def __repr__(self):
@@ -78,19 +83,56 @@ class Object(BaseObject):
         return self.name
 
     def __getattr__(self, attr):
+        if "_ghost" in self.__dict__:
+            # not loaded from the database yet
+            self._ghost.materialize(self)
+            return getattr(self, attr)
         if attr.startswith("_"):
             return object.__getattribute__(self, attr)
         if self.parent is None or not hasattr(self.parent, attr):
             return object.__getattribute__(self, attr)
         return getattr(self.parent, attr)
 
+    def __setattr__(self, attr, value):
+        if "_ghost" in self.__dict__:
+            self._ghost.materialize(self)
+        if attr[0] != "_":
+            db = Game.get_instance().db
+            if db.track_containers:
+                # lists and dicts get to tell us about changes too
+                value = track(self, value)
+            db.touch(self, attr)
+        object.__setattr__(self, attr, value)
+
+    def __delattr__(self, attr):
+        if "_ghost" in self.__dict__:
+            self._ghost.materialize(self)
+        if not attr.startswith("_"):
+            self._touch()
+        object.__delattr__(self, attr)
+
+    def _touch(self):
+        """Marks the object as changed, for the next save."""
+        Game.get_instance().db.touch(self)
+
+    def __reduce_ex__(self, protocol):
+        return copyreg.__newobj__, (type(self),), self.__getstate__()
+
     def __getstate__(self):
-        return {k: getattr(self, k) for k in dir(self)}
+        if "_ghost" in self.__dict__:
+            self._ghost.materialize(self)
+        return saved_state(self)
 
-    def __setstate__(self, odict):
-        self.__dict__.update(odict)
-        self._add_missing_fields()
-        self._bind_all_lambdas()
+    def __setstate__(self, state):
+        fields = self.__dict__
+        for k, v in state_items(state):
+            if isinstance(v, Lambda):
+                v = v.bind(self)
+            fields[k] = track(self, v)
+        saved, private = self._field_defaults()
+        if type(self) not in CURRENT_SCHEMA:
+            self._add_missing_fields(saved)
+        self._add_missing_fields(private)
 
     def clone(self):
         obj = self.__class__(self.name)
@@ -116,16 +158,33 @@ class Object(BaseObject):
     def _get_dummy(cls):
         return cls(None)
 
-    def _add_missing_fields(self):
-        dummy = self._get_dummy()
-        for d in dummy.__dict__:
-            if d not in self.__dict__:
-                setattr(self, d, getattr(dummy, d))
+    @classmethod
+    def _field_defaults(cls):
+        """The fields of a new instance, saved and private ones apart.
 
-    def _bind_all_lambdas(self):
-        for k, v in self.__dict__.items():
-            if isinstance(v, Lambda):
-                setattr(self, k, v.bind(self))
+        Made from a dummy instance, once per class.
+        """
+        if (defaults := cls.__dict__.get("_defaults")) is None:
+            dummy = cls._get_dummy()
+            saved, private = {}, {}
+            for k, v in dummy.__dict__.items():
+                (private if k.startswith("_") else saved)[k] = v
+            defaults = cls._defaults = saved, private
+        return defaults
+
+    @classmethod
+    def _schema(cls):
+        """The fields every saved instance has."""
+        return tuple(sorted(cls._field_defaults()[0]))
+
+    def _add_missing_fields(self, defaults):
+        fields = self.__dict__
+        for k, v in defaults.items():
+            if k not in fields:
+                v = copy.copy(v)  # not shared with the other objects
+                if isinstance(v, Lambda):
+                    v = v.bind(self)
+                fields[k] = v if k.startswith("_") else track(self, v)
 
     @property
     def id(self):
@@ -1,3 +1,4 @@
+import copyreg
 import logging
 import re
 from functools import cached_property
@@ -12,16 +13,17 @@ from mushroom.commands import (
     RegexpAction,
     WrapperCommand,
 )
-from mushroom.db import proxify
+from mushroom.db import proxify, saved_state, state_items
 from mushroom.game import Game
 from mushroom.util import ActionFailed, regexp_command
+from mushroom.util.serialize import Serializable
 from mushroom.world.objects import Thing
 from mushroom.world.room import Room
 
 logger = logging.getLogger(__name__)
 
 
-class Power:
+class Power(Serializable):
     fw_cmds = frozendict.frozendict({})
     flags = frozenset()
 
@@ -34,13 +36,16 @@ class Power:
     def __repr__(self):
         return f"<power {self.name}>"
 
+    def __reduce_ex__(self, protocol):
+        return copyreg.__newobj__, (type(self),), self.__getstate__()
+
     def __getstate__(self):
-        return {k: getattr(self, k) for k in dir(self)}
+        return saved_state(self)
 
-    def __setstate__(self, odict):
-        if not "name" in odict:
-            odict["name"] = self.__class__.__name__
-        self.__dict__.update(odict)
+    def __setstate__(self, state):
+        self.__dict__.update(state_items(state))
+        if "name" not in self.__dict__:
+            self.name = self.__class__.__name__
 
     @cached_property
     def _fwcmds(self):
@@ -230,10 +235,12 @@ class Demolisher(Power):
             room.emit(f"{caller.name} blew up the place!")
             room.emit(f"The explosion blows you towards {caller.location.name}")
             caller.location.emit(f"{caller.name} demolished {room.name}!")
-            caller.location.exits.remove(room)
-            for o in room.contents:
-                util.moveto(o, caller.location)
-            Game.get_instance().db.remove(room)
+            db = Game.get_instance().db
+            with db.transaction():  # not half demolished if something fails
+                caller.location.exits.remove(room)
+                for o in list(room.contents):
+                    util.moveto(o, caller.location)
+                db.remove(room)
 
         if caller.location is None or not hasattr(caller.location, "exits"):
             raise ActionFailed("There are no rooms to demolish around here.")
@@ -21,6 +21,32 @@ def game():
     return Game.get_instance()
 
 
+@pytest.fixture
+def new_game():
+    """A game of its own, the instance while the test runs, so that objects
+    report their changes to its database."""
+    game = Game()
+    Game._instance, instance = game, Game._instance
+    yield game
+    Game._instance = instance
+
+
+@pytest.fixture
+def make_world():
+    """Fills a database with a hall and three things in it."""
+
+    def make_world(db):
+        room = db.add(Room("hall"))
+        room.description = "A draughty hall."
+        for name in ("red ball", "blue ball", "chair"):
+            thing = db.add(Thing(name))
+            thing.location = room
+            room.contents.append(thing)
+        return room
+
+    return make_world
+
+
 @pytest.fixture
 def client(game):
     return FakeClient(game)
@@ -0,0 +1,270 @@
+import pickle
+import threading
+
+import pytest
+
+from mushroom import util
+from mushroom.db import (
+    SCHEMA_TAG,
+    Database,
+    DbProxy,
+    Journal,
+    TrackedList,
+    class_name,
+    journal_path,
+    read_pickled,
+    saved_state,
+)
+from mushroom.world import Examiner, Player, Room, Thing
+
+
+@pytest.fixture
+def db(game):
+    db = game.db
+    db.take_changes()
+    return db
+
+
+def test_changes_are_tracked(db, room, thing):
+    db.take_changes()
+    thing.description = "shiny"
+    room.flags.append("dark")
+    assert db.take_changes() == {db.get_id(thing), db.get_id(room)}
+
+    room.exits = []
+    assert isinstance(room.exits, TrackedList)
+    room.exits.append(room)
+    room.exits.remove(room)
+    assert db.take_changes() == {db.get_id(room)}
+
+    room.emit("nothing changes")
+    assert db.changes == 0
+
+
+def test_assigned_containers_are_copied(db, room, monkeypatch):
+    exits = []
+    room.exits = exits
+    exits.append(room)  # the copy doesn't follow, and nothing changed
+    assert room.exits == [] and room.exits is not exits
+    db.take_changes()
+
+    monkeypatch.setattr(db, "track_containers", False)
+    room.exits = exits
+    assert room.exits is exits
+    assert db.take_changes() == {db.get_id(room)}
+    exits.clear()
+    assert db.changes == 0  # unnoticed
+
+
+def test_journal_replay(db, room, thing, tmp_path):
+    db_file = tmp_path / "world.sav"
+    db.dump(db_file)
+    journal = Journal(journal_path(db_file))
+
+    cellar = db.add(Room("cellar"))
+    room.exits.append(cellar)
+    thing.name = "shiny bobo"
+    journal.append(db, db.take_changes())
+    thing_id = db.get_id(thing)
+    db.remove(thing)
+    journal.append(db, db.take_changes())
+    with open(journal.path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00torn")  # a crash while appending
+
+    loaded = type(db)()
+    loaded.load(db_file)
+    loaded_room = loaded.get(db.get_id(room))
+    assert [x.name for x in loaded_room.exits] == ["cellar"]
+    assert loaded_room.exits[0] is loaded.get(db.get_id(cellar))
+    assert loaded.get(db.get_id(cellar)).name == "cellar"
+    assert loaded.get(thing_id) is None
+    assert loaded.changes == 0
+
+
+def test_journal_trim(db, room, tmp_path):
+    journal = Journal(tmp_path / "world.sav.journal")
+    journal.append(db, {db.get_id(room)})
+    offset = journal.size
+    room.name = "renamed"
+    journal.append(db, {db.get_id(room)})
+
+    journal.trim(offset)
+    ((records),) = journal.batches()
+    assert records[0][0] == db.get_id(room)
+    journal.trim(journal.size)
+    assert journal.size == 0
+
+
+def test_search_indexes(db, room, thing):
+    def scan(name="", type=object):
+        return [
+            x
+            for x in db._objects.values()
+            if util.match_name(name, x.name) and isinstance(x, type)
+        ]
+
+    hall = db.add(Room("Great Hall of Mirrors"))
+    ball = db.add(Thing("red ball"))
+    eve = db.add(Player("eve"))
+    ball.name = "blue Ball"
+    db.remove(hall)
+    queries = ["", "bobo", "ball", "BALL BLUE", "bl", "blue b", "red", "hall", "e"]
+    for name in queries:
+        for type in (object, Room, Thing, Player):
+            assert db.search(name, type) == scan(name, type), (name, type)
+    assert db.search("ball") == [ball]
+    assert eve in db.search(type=Player)
+
+
+def test_query(db, room, thing):
+    db.add_index("flags")
+    db.add_index("location")
+    cellar = db.add(Room("cellar"))
+    things = [db.add(Thing(f"rat {i}")) for i in range(5)]
+    for rat in things:
+        rat.location = cellar
+    things[1].flags.append("dead")
+    things[3].flags = ["dead", "smelly"]
+    thing.flags.append("dead")
+    db.remove(things[4])
+
+    assert list(db.query(location=cellar)) == things[:4]
+    assert list(db.query(type=Thing, location=cellar, flag="dead")) == [
+        things[1],
+        things[3],
+    ]
+    assert list(db.query(flag="dead", limit=1, offset=1)) == [things[1]]
+    assert list(db.query(name="rat", flags="smelly", description=None)) == []
+    assert list(db.query(name="rat 3", description=things[3].description)) == [
+        things[3]
+    ]
+    things[3].flags.remove("dead")
+    assert list(db.query(location=cellar, flag="dead")) == [things[1]]
+
+
+def test_schema_migration(game, tmp_path):
+    path = tmp_path / "world.sav"
+    db = Database()
+    room = db.add(Room("old"))
+    del room.__dict__["exits"]  # as saved before rooms had exits
+    room_id = db.get_id(room)
+
+    db.dump(path)  # exits is in the schema, nothing to migrate
+    assert "exits" not in read_pickled(path)[room_id].__dict__
+
+    schema = db.schema()
+    schema[class_name(Room)] = ("contents", "description")
+    with open(path, "wb") as f:
+        pickle.dump((SCHEMA_TAG, schema), f)
+        pickle.dump(db._objects, f)
+    loaded = read_pickled(path)[room_id]
+    assert loaded.exits == [] and loaded.exits.owner is loaded
+    assert loaded._defaults is Room._defaults
+
+    # the oldest saves have no schema, and fw for mushroom
+    data = pickle.dumps(db._objects, protocol=0).replace(b"cmushroom.", b"cfw.")
+    path.write_bytes(data)
+    assert read_pickled(path)[room_id].exits == []
+
+
+def test_pickled_state(game):
+    db = Database()
+    room = db.add(Room("hall"))
+    ball, box = db.add(Thing("ball")), db.add(Thing("box"))
+    for thing in (ball, box):
+        thing.location = room
+        room.contents.append(thing)
+    ball.powers = box.powers = [Examiner()]
+
+    assert saved_state(ball)[0] is saved_state(box)[0]  # pickled once
+    objects = pickle.loads(pickle.dumps(db._objects, protocol=5))
+    hall = objects[db.get_id(room)]
+    assert [x.name for x in hall.contents] == ["ball", "box"]
+    assert hall.contents[0].location is hall
+    assert hall.contents[0].powers[0] is hall.contents[1].powers[0]
+    assert hall.contents[0].powers[0].name == "Examiner"
+
+    # older saves pickled a dict of the fields
+    old = Thing.__new__(Thing)
+    old.__setstate__({"name": "old", "location": None})
+    assert old.name == "old" and old.contents == []
+
+
+def test_snapshot(game):
+    db = Database()
+    room = db.add(Room("hall"))
+    snapshot = db.snapshot()
+    assert db.snapshot() is snapshot
+    ball = db.add(Thing("red ball"))
+    assert db.snapshot() is not snapshot
+    assert snapshot.get_id(ball) is None and len(snapshot) == 1
+
+    snapshot = db.snapshot()
+    assert snapshot.get(f"#{db.get_id(ball)}") is ball
+    assert snapshot.search("ball") == [ball]
+    assert snapshot.search(type=Room) == [room]
+    room.name = "great hall"  # objects are shared, only ids are frozen
+    assert db.snapshot() is snapshot
+    db.remove(ball)
+    assert snapshot.get_id(ball) is not None
+    assert db.snapshot().search("ball") == []
+
+
+def test_snapshot_search_by_name(new_game):
+    db = new_game.db
+    room, ball = db.add(Room("hall")), db.add(Thing("red ball"))
+    snapshot = db.snapshot()
+    room.name = "great hall"
+    assert snapshot.search("great") == [room]  # not indexed again yet
+    assert db.search("great") == snapshot.search("great") == [room]
+    db.remove(ball)
+    assert snapshot.search("red") == [ball]  # no longer through the index
+    assert db.snapshot().search("red") == []
+
+
+def test_snapshot_while_writing(game):
+    db = Database()
+    done = threading.Event()
+
+    def write():
+        things = [db.add(Thing(f"thing {i}")) for i in range(2000)]
+        for thing in things[::2]:
+            db.remove(thing)
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not done.is_set():
+        snapshot = db.snapshot()
+        for thing in snapshot.search(type=Thing):
+            assert snapshot.get(snapshot.get_id(thing)) is thing
+    writer.join()
+    assert len(db.snapshot()) == 1000
+
+
+def test_transaction(db, room, thing):
+    db.take_changes()
+    with db.transaction():
+        ball = db.add(Thing("ball"))
+        util.moveto(ball, room)
+    assert db.take_changes() == {db.get_id(ball), db.get_id(room)}
+
+    contents = room.contents
+    before = list(contents)
+    box = db.add(Thing("box"))
+    box_id = db.get_id(box)
+    db.take_changes()
+    with pytest.raises(util.ActionFailed), DbProxy(db).transaction():
+        chair = db.add(Thing("chair"))
+        util.moveto(chair, room)
+        ball.name = "red ball"
+        util.moveto(ball, None)
+        db.remove(box)
+        with db.transaction():
+            room.flags.append("wrecked")
+        raise util.ActionFailed("the chair won't fit")
+    assert room.contents is contents and contents == before
+    assert ball.location is room and room.flags == []
+    assert db.get_id(chair) is None and db.get(box_id) is box
+    assert ball not in db.search("red ball") and ball in db.search("ball")
+    assert db.changes == 0
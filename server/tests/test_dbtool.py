@@ -0,0 +1,84 @@
+import pytest
+
+from mushroom import dbtool
+from mushroom.db import Journal, class_name, journal_path
+from mushroom.world import Thing
+
+
+@pytest.fixture
+def world(new_game, make_world, tmp_path):
+    make_world(new_game.db)
+    new_game.db.dump(tmp_path / "world.sav")
+    return new_game.db, tmp_path
+
+
+@pytest.mark.parametrize("fmt", dbtool.FORMATS)
+def test_convert(world, fmt):
+    _, tmp_path = world
+    path = tmp_path / f"world.{fmt}"
+    assert dbtool.rewrite(tmp_path / "world.sav", path, fmt) == 4
+    assert dbtool.file_format(path) == fmt
+    records = list(dbtool.read_records(path))
+    assert [(r.id, r.name) for r in records] == [
+        (0, "hall"),
+        (1, "red ball"),
+        (2, "blue ball"),
+        (3, "chair"),
+    ]
+    hall = dbtool.decode(records[0].state)
+    assert hall.contents == [dbtool.Ref(i, class_name(Thing)) for i in (1, 2, 3)]
+    assert (
+        dbtool.stats(records)[0]
+        == f"4 objects, {sum(len(r.state) for r in records):,} bytes"
+    )
+
+
+def test_journal(world):
+    db, tmp_path = world
+    path = tmp_path / "world.idx"
+    dbtool.rewrite(tmp_path / "world.sav", path, "indexed")
+    db.take_changes()
+    hall = db.get(0)
+    chair = hall.contents.pop()
+    db.remove(chair)
+    hall.name = "great hall"
+    db.add(Thing("lamp"))
+    Journal(journal_path(path)).append(db, db.take_changes())
+
+    names = [r.name for r in dbtool.read_records(path)]
+    assert names == ["great hall", "red ball", "blue ball", "lamp"]
+    assert dbtool.rewrite(path, path) == 4
+    assert not (tmp_path / "world.idx.journal").exists()
+    assert [r.name for r in dbtool.read_records(path)] == names
+
+
+def test_grep_and_refs(world):
+    _, tmp_path = world
+    records = list(dbtool.read_records(tmp_path / "world.sav"))
+    assert list(dbtool.grep(records, "description", "draughty")) == [
+        "#0 Room 'hall': description = 'A draughty hall.'"
+    ]
+    assert len(list(dbtool.grep(records, "name", "ball", type="Thing"))) == 2
+    assert list(dbtool.grep(records, "name", "ball", type="Room")) == []
+    assert list(dbtool.refs(records, 2)) == ["#0 Room 'hall': contents"]
+    assert list(dbtool.refs(records, 0)) == [
+        f"#{i} Thing {name!r}: location"
+        for i, name in ((1, "red ball"), (2, "blue ball"), (3, "chair"))
+    ]
+
+
+def test_diff(world):
+    db, tmp_path = world
+    db.get(0).contents.pop()
+    db.remove(3)
+    db.get(1).name = "green ball"
+    db.add(Thing("lamp"))
+    db.dump(tmp_path / "new.sav")
+    old = dbtool.read_records(tmp_path / "world.sav")
+    new = dbtool.read_records(tmp_path / "new.sav")
+    assert list(dbtool.diff(old, new)) == [
+        "~ #0 Room 'hall': contents",
+        "~ #1 Thing 'green ball': name",
+        "- #3 Thing 'chair'",
+        "+ #4 Thing 'lamp'",
+    ]
@@ -0,0 +1,72 @@
+import asyncio
+import socket
+
+from mushroom.config import Config
+from mushroom.frontend import Link
+from mushroom.game import Game
+from mushroom.server import Server
+
+
+def test_link_round_trip():
+    async def run():
+        left, right = socket.socketpair()
+        a = Link(*await asyncio.open_connection(sock=left))
+        b = Link(*await asyncio.open_connection(sock=right))
+        a.send("input", 1, b"look\n")
+        a.send("disconnect", 1)
+        await a.drain()
+        a.close()
+        return [msg async for msg in b.messages()]
+
+    assert asyncio.run(run()) == [("input", 1, b"look\n"), ("disconnect", 1)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def connect(port, timeout=10):
+    """Connects once the front-end process listens on `port`."""
+    async with asyncio.timeout(timeout):
+        while True:
+            try:
+                return await asyncio.open_connection("127.0.0.1", port)
+            except ConnectionRefusedError:
+                await asyncio.sleep(0.05)
+
+
+def test_line_through_a_worker(tmp_path):
+    port = free_port()
+    config = Config(
+        listen_address="127.0.0.1",
+        listen_port=port,
+        frontend_workers=1,
+        frontend_socket=str(tmp_path / "mushroomd.sock"),
+        db_file=str(tmp_path / "world.sav"),
+        log_file=str(tmp_path / "server.log"),
+        motd_file=str(tmp_path / "MOTD"),
+        telnet_mccp=False,
+    )
+    server = Server(config, Game())
+
+    async def run():
+        await server.start()
+        try:
+            reader, writer = await connect(port)
+            async with asyncio.timeout(10):
+                await reader.readuntil(b"Welcome!\n")
+                writer.write(b"xyzzy\n")
+                await reader.readuntil(b"Huh?\n")
+                writer.close()
+                while server.client_register:  # the world saw it leave
+                    await asyncio.sleep(0.01)
+        finally:
+            for worker in server.frontends:
+                worker.terminate()
+                worker.join()
+            server.server.close()
+            server.scheduler_task.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+from mushroom.game import Game
+
+
+def test_attached_game_runs_everything_on_the_loop():
+    async def run():
+        game = Game()
+        game.attach(asyncio.get_running_loop())
+        ran = []
+        done = asyncio.Event()
+        game.schedule(0.01, lambda: (ran.append(threading.get_ident()), done.set()))
+        # submitted from another thread, like the portals do
+        future = await asyncio.to_thread(game.submit, threading.get_ident)
+        ident = await asyncio.wrap_future(future)
+        await done.wait()
+        return ran + [ident]
+
+    assert asyncio.run(run()) == [threading.get_ident()] * 2
+
+
+def test_submit_without_a_loop():
+    game = Game()
+    assert game.submit(lambda x: x + 1, 41).result(timeout=1) == 42
+
+
+def test_timers():
+    async def run():
+        game = Game()
+        game.attach(asyncio.get_running_loop())
+        fired = []
+        cancelled = game.schedule(0.01, lambda: fired.append("cancelled"))
+        late = game.schedule(0.01, lambda: fired.append("late"))
+        ticks = game.schedule(0.005, lambda: fired.append("tick"), repeat=0.01)
+        cancelled.cancel()
+        late.reschedule(0.032)
+        await asyncio.sleep(0.05)
+        ticks.cancel()
+        return fired, [t.active for t in (cancelled, late, ticks)]
+
+    fired, active = asyncio.run(run())
+    assert "cancelled" not in fired
+    assert fired.count("late") == 1
+    assert fired[0] == "tick"  # "late" no longer fires first
+    assert fired.count("tick") >= 2
+    assert active == [False, False, False]
+
+
+def test_due_timers_take_turns_with_the_loop():
+    async def run():
+        loop = asyncio.get_running_loop()
+        game = Game()
+        game.timer_budget = 0  # one timer at a time
+        game.attach(loop)
+        fired = []
+        game.schedule(0, lambda: (fired.append(0), loop.call_soon(fired.append, "io")))
+        for i in (1, 2):
+            game.schedule(0, lambda i=i: fired.append(i))
+        await asyncio.sleep(0.01)
+        return fired
+
+    assert asyncio.run(run()) == [0, "io", 1, 2]
+
+
+def test_posts_from_other_threads_are_drained_in_order():
+    async def run():
+        game = Game()
+        game.attach(asyncio.get_running_loop())
+        ran = []
+
+        def post():
+            return [game.submit(ran.append, i) for i in range(100)]
+
+        futures = await asyncio.to_thread(post)
+        await asyncio.wrap_future(futures[-1])
+        return ran
+
+    assert asyncio.run(run()) == list(range(100))
@@ -0,0 +1,21 @@
+import socket
+
+from mushroom import handoff
+
+
+def test_send_receive():
+    ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    listener = socket.socket()
+    pairs = [socket.socketpair() for _ in range(handoff.BATCH + 1)]
+    clients = [({"id": i}, a) for i, (a, _) in enumerate(pairs)]
+
+    handoff.send(ours, 12.5, [("telnet", listener)], clients)
+    started, listeners, received = handoff.receive(theirs)
+
+    assert started == 12.5
+    [(kind, received_listener)] = listeners
+    assert kind == "telnet"
+    assert received_listener.getsockname() == listener.getsockname()
+    assert [state["id"] for state, _ in received] == list(range(len(pairs)))
+    received[-1][1].sendall(b"hello")
+    assert pairs[-1][1].recv(5) == b"hello"
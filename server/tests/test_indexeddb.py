@@ -0,0 +1,100 @@
+import gc
+
+from mushroom.db import Database, DbProxy
+from mushroom.indexeddb import IndexedDatabase, convert, verify
+from mushroom.world import Room, Thing
+
+
+def test_lazy_loading(new_game, make_world, tmp_path):
+    db = Database()
+    room_id = db.get_id(make_world(db))
+    db.dump(tmp_path / "world.sav")
+    assert convert(tmp_path / "world.sav", tmp_path / "world.idx") == 4
+    assert verify(tmp_path / "world.idx", deep=True) == []
+
+    db = IndexedDatabase(cache_size=0)
+    new_game.use_database(db)
+    db.load(tmp_path / "world.idx")
+    assert len(db._objects) == 0
+
+    balls = db.search("ball", type=Thing)
+    assert [b.name for b in balls] == ["red ball", "blue ball"]
+    assert "_ghost" in balls[0].__dict__
+    room = balls[0].location
+    assert db.get_id(room) == room_id
+    assert room.contents[0] is balls[0]
+
+    room.name = "great hall"
+    chair = room.contents.pop()
+    db.remove(chair)
+    cellar = db.add(Room("cellar"))
+    del room, balls, chair
+    db.save(tmp_path / "world.idx")
+    gc.collect()
+    assert list(db._objects) == [db.get_id(cellar)]
+    assert verify(tmp_path / "world.idx", deep=True) == []
+
+    reloaded = Database()  # reads indexed files too
+    reloaded.load(tmp_path / "world.idx")
+    hall = reloaded.get(room_id)
+    assert hall.name == "great hall"
+    assert [x.name for x in hall.contents] == ["red ball", "blue ball"]
+    assert hall.contents[0].location is hall
+    assert [x.name for x in reloaded.search(type=Room)] == ["great hall", "cellar"]
+
+
+def test_soft_code_database(new_game, make_world, tmp_path):
+    db = Database()
+    room_id = db.get_id(make_world(db))
+    db.dump(tmp_path / "world.sav")
+    convert(tmp_path / "world.sav", tmp_path / "world.idx")
+
+    db = IndexedDatabase(cache_size=0)
+    new_game.use_database(db)
+    db.load(tmp_path / "world.idx")
+    proxy = DbProxy(db)
+    assert [x.name for x in proxy.search("ball")] == ["red ball", "blue ball"]
+    assert [x.name for x in proxy.search(type=Room)] == ["hall"]
+
+    box_id = db.get_id(proxy.add(Thing("box")))
+    chair = proxy.search("chair")[0]
+    chair_id = db.get_id(chair)
+    chair.location.contents.remove(chair)
+    proxy.remove(chair)
+    del chair
+    gc.collect()
+    assert db.get(box_id).name == "box"
+    assert db.get(chair_id) is None
+    db.save(tmp_path / "world.idx")
+
+    reloaded = Database()
+    reloaded.load(tmp_path / "world.idx")
+    assert reloaded.get(box_id).name == "box"
+    assert reloaded.get(chair_id) is None
+    assert [x.name for x in reloaded.get(room_id).contents] == ["red ball", "blue ball"]
+
+
+def test_pickled_world(new_game, make_world, tmp_path):
+    db = Database()
+    room_id = db.get_id(make_world(db))
+    db.dump(tmp_path / "world.sav")
+
+    db = IndexedDatabase()
+    new_game.use_database(db)
+    db.load(tmp_path / "world.sav")
+    assert db.get(room_id).name == "hall"
+    db.save(tmp_path / "world.sav")
+    assert verify(tmp_path / "world.sav") == []
+
+
+def test_verify(make_world, tmp_path):
+    db = Database()
+    make_world(db)
+    db.dump(tmp_path / "world.sav")
+    path = tmp_path / "world.idx"
+    convert(tmp_path / "world.sav", path)
+    data = bytearray(path.read_bytes())
+    data[40] ^= 0xFF
+    path.write_bytes(data)
+    assert verify(path) == ["#0: bad checksum"]
+    assert verify(tmp_path / "world.sav") == ["Not an indexed world file"]
@@ -0,0 +1,78 @@
+import json
+import re
+import sys
+
+import pytest
+
+from mushroom import dbtool, jsonl
+from mushroom.commands import BoundCode, CustomCommand, Lambda, RegexpAction
+from mushroom.db import Database, TrackedList
+from mushroom.world import Examiner, Player, Room, Thing
+
+
+@pytest.fixture
+def db(new_game):
+    return new_game.db
+
+
+def test_round_trip(db, tmp_path):
+    hall = db.add(Room("hall"))
+    player = db.add(Player("bob"))
+    player.powers.append(Examiner())
+    player.location = hall
+    cellar = db.add(Room("cellar"))
+    hall.contents.append(player)
+    hall.exits.append(cellar)  # further down the file
+    cellar.exits.append(cellar)
+    hall.custom_cmds["jump"] = CustomCommand("jump", "send('boing')")
+    hall.custom_cmds["hi"] = RegexpAction(r"hi (\w+)", "send(groups[0])")
+    hall.greeting = Lambda("'hi'").bind(hall)
+    hall.misc = {"kind": "not a manifest", 1: (2, 3), "tags": {"a"}}
+    hall.copy = Thing("not in the database")
+
+    jsonl.dump(db, tmp_path / "world.jsonl")
+    lines = (tmp_path / "world.jsonl").read_text().splitlines()
+    assert lines[0] == '{"kind":"mushroom-jsonl","spec":{"version":1}}'
+    assert json.loads(lines[2])["spec"]["location"] == {"kind": "DbRef", "spec": 0}
+
+    loaded = Database()
+    jsonl.load(loaded, tmp_path / "world.jsonl")
+    hall = loaded.get(0)
+    player, cellar = loaded.get(1), loaded.get(2)
+    assert type(hall) is Room and type(cellar) is Room
+    assert hall.contents == [player] and type(hall.contents) is TrackedList
+    assert hall.exits[0] is cellar and cellar.exits[0] is cellar
+    assert player.location is hall
+    assert player.powers[0].name == "Examiner"
+    assert hall.custom_cmds["jump"].code == "send('boing')"
+    assert hall.custom_cmds["hi"].regexp == re.compile(r"hi (\w+)", re.IGNORECASE)
+    assert type(hall.greeting) is BoundCode and hall.greeting.owner is hall
+    assert hall.misc == {"kind": "not a manifest", 1: (2, 3), "tags": {"a"}}
+    assert hall.copy.name == "not in the database"
+    assert loaded.get_id(hall.copy) is None
+    assert hall.description == Room.default_description
+    assert [x.name for x in loaded.search(type=Room)] == ["hall", "cellar"]
+
+
+def test_load_errors(db, tmp_path):
+    path = tmp_path / "world.jsonl"
+    path.write_text(
+        '{"kind":"mushroom-jsonl","spec":{"version":1}}\n'
+        '{"id":0,"kind":"mushroom.world.room:Room","spec":{"name":"hall",'
+        '"exits":[{"kind":"DbRef","spec":7}]}}\n'
+    )
+    loaded = Database()
+    with pytest.raises(ValueError, match="refers to objects not in it: #7$"):
+        jsonl.load(loaded, path)
+    assert loaded.search() == []
+    with pytest.raises(ValueError, match="refers to objects not in it: #7$"):
+        list(dbtool.read_records(path))
+
+    with path.open("a") as f:
+        f.write('{"id":1,"kind":"this:s","spec":{}}\n')
+    with pytest.raises(ValueError, match="world.jsonl:3: Can't deserialize a this:s"):
+        jsonl.load(Database(), path)
+    assert "this" not in sys.modules  # not even imported
+    path.write_text("not json\n")
+    with pytest.raises(ValueError, match="not a world in JSON lines"):
+        jsonl.load(Database(), path)
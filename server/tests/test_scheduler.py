@@ -0,0 +1,59 @@
+import asyncio
+
+from mushroom.scheduler import CommandScheduler
+
+
+def test_clients_take_turns():
+    ran = []
+
+    async def run():
+        scheduler = CommandScheduler()
+        for i in range(4):
+            await scheduler.submit("builder", lambda i=i: ran.append(("builder", i)))
+        await scheduler.submit("player", lambda: ran.append(("player", 0)))
+        task = asyncio.create_task(scheduler.run())
+        await scheduler.finish("builder")
+        task.cancel()
+
+    asyncio.run(run())
+    assert ran == [
+        ("builder", 0),
+        ("player", 0),
+        ("builder", 1),
+        ("builder", 2),
+        ("builder", 3),
+    ]
+
+
+def test_failed_command_drops_queue():
+    ran = []
+
+    async def run():
+        scheduler = CommandScheduler()
+        await scheduler.submit("c", lambda: False)
+        await scheduler.submit("c", lambda: ran.append("not run"))
+        task = asyncio.create_task(scheduler.run())
+        await scheduler.finish("c")
+        task.cancel()
+
+    asyncio.run(run())
+    assert ran == []
+
+
+def test_resubmit_after_discard_runs_once_per_turn():
+    ran = []
+
+    async def run():
+        scheduler = CommandScheduler()
+        await scheduler.submit("c", lambda: ran.append(0))
+        scheduler.discard("c")
+        await scheduler.submit("c", lambda: ran.append(1))
+        await scheduler.submit("c", lambda: ran.append(2))
+        assert list(scheduler.ready) == ["c"]
+        task = asyncio.create_task(scheduler.run())
+        await scheduler.finish("c")
+        task.cancel()
+        assert not scheduler.ready and not scheduler.scheduled
+
+    asyncio.run(run())
+    assert ran == [1, 2]
@@ -0,0 +1,368 @@
+import asyncio
+import socket
+import types
+import zlib
+
+import pytest
+import websockets.asyncio.client
+
+from mushroom import handoff, telnet
+from mushroom.client import Client
+from mushroom.config import Config
+from mushroom.db import Database
+from mushroom.game import Game
+from mushroom.server import (
+    ClientHandler,
+    ClientRegister,
+    Server,
+    limit_input,
+    read_lines,
+)
+from mushroom.world import Thing
+
+
+class FakeTransport:
+    def __init__(self):
+        self.aborted = False
+
+    def abort(self):
+        self.aborted = True
+
+    def is_closing(self):
+        return False
+
+
+class FakeWriter:
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+        self.transport = FakeTransport()
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 4242)
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_handler(**config):
+    server = types.SimpleNamespace(config=Config(**config))
+    return ClientHandler(server, FakeWriter())
+
+
+def test_output_is_written_and_flushed_on_shutdown():
+    async def run():
+        handler = make_handler()
+        handler.send("hello\n")
+        handler.send("world\n")
+        handler.shutdown()
+        await handler.writer_task
+        return handler.writer
+
+    writer = asyncio.run(run())
+    assert b"".join(writer.writes) == b"hello\nworld\n"
+    assert writer.closed
+
+
+def test_output_overflow_disconnects():
+    async def run():
+        handler = make_handler(output_queue_limit=8)
+        handler.send("12345")
+        handler.send("67890")
+        await handler.writer_task
+        return handler.writer
+
+    writer = asyncio.run(run())
+    assert writer.transport.aborted
+    assert writer.writes == []
+
+
+def test_output_overflow_discards():
+    async def run():
+        handler = make_handler(output_queue_limit=8, output_overflow="discard")
+        handler.send("12345")
+        handler.send("67890")
+        handler.send("123")
+        handler.shutdown()
+        await handler.writer_task
+        return handler.writer
+
+    writer = asyncio.run(run())
+    assert not writer.transport.aborted
+    assert b"".join(writer.writes) == b"12345123"
+
+
+def test_output_is_coalesced():
+    async def run(coalesce):
+        handler = make_handler(coalesce_output=coalesce)
+        handler.send("a\n")
+        handler.send("b\n")
+        handler.shutdown()
+        await handler.writer_task
+        return handler.writer.writes
+
+    assert asyncio.run(run(True)) == [b"a\nb\n"]
+    assert asyncio.run(run(False)) == [b"a\n", b"b\n"]
+
+
+class FakeClient:
+    def __init__(self):
+        self.handler = object()
+
+
+def test_client_register_indexes():
+    register = ClientRegister()
+    clients = [FakeClient() for _ in range(3)]
+    for c in clients:
+        register.add(c)
+    register.delete(clients[1])
+
+    assert list(register.clients) == [clients[0], clients[2]]
+    assert register.get_client(3) is clients[2]
+    assert register.get_client(2) is None
+    assert register.find_client(clients[0].handler) is clients[0]
+
+
+def test_broadcast_encodes_once():
+    class Handler:
+        def __init__(self):
+            self.data = []
+
+        def write(self, data):
+            self.data.append(data)
+
+    register = ClientRegister()
+    clients = [Client(Handler(), "c", None) for _ in range(3)]
+    for c in clients:
+        register.add(c)
+    register.broadcast_except(clients[0], "héllo")
+
+    assert clients[0].handler.data == []
+    assert clients[1].handler.data == ["héllo\n".encode()]
+    assert clients[1].handler.data[0] is clients[2].handler.data[0]
+
+
+def test_mccp_compresses_output_after_negotiation():
+    async def run():
+        handler = make_handler(telnet_mccp=True)
+        handler.negotiate()
+        handler.send("plain\n")
+        handler.telnet.feed(telnet.command(telnet.DO, telnet.COMPRESS2))
+        handler.send("compressed\n")
+        await asyncio.sleep(0)
+        handler.send("again\n")
+        handler.shutdown()
+        await handler.writer_task
+        return b"".join(handler.writer.writes)
+
+    data = asyncio.run(run())
+    start = telnet.subnegotiation(telnet.COMPRESS2)
+    head, _, tail = data.partition(start)
+    assert head == telnet.command(telnet.WILL, telnet.COMPRESS2) + b"plain\n"
+    assert zlib.decompress(tail) == b"compressed\nagain\n"
+
+
+def test_overlong_lines_are_cut():
+    class Reader:
+        def __init__(self, chunks):
+            self.chunks = list(chunks)
+
+        async def read(self, n):
+            return self.chunks.pop(0) if self.chunks else b""
+
+    async def run():
+        handler = make_handler(max_line_length=8)
+        reader = Reader([b"ok\nxxxxxx", b"xxxx", b"xx\nfine\n"])
+        lines = read_lines(reader, handler, 8)
+        return [line async for line in lines]
+
+    assert asyncio.run(run()) == [b"ok\n", b"xxxxxxxxxx", b"fine\n"]
+
+
+def test_queued_input_waits_for_tokens(monkeypatch):
+    sleep = asyncio.sleep
+
+    async def early(delay):
+        await sleep(0)  # wakes up before the bucket has a token
+
+    monkeypatch.setattr(asyncio, "sleep", early)
+
+    async def lines():
+        for _ in range(5):
+            yield b"look\n"
+
+    async def run():
+        config = Config(input_rate=100, input_burst=1, input_overflow="queue")
+        handler = make_handler()
+        start = asyncio.get_running_loop().time()
+        async for _ in limit_input(lines(), handler, config, lambda event: None):
+            pass
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(run()) >= 0.04
+
+
+def test_overlong_websocket_lines_are_cut(tmp_path):
+    config = Config(
+        websocket_enabled=True,
+        websocket_address="127.0.0.1",
+        websocket_port=free_port(),
+        listen_port=free_port(),
+        max_line_length=8,
+        db_file=str(tmp_path / "world.sav"),
+        log_file=str(tmp_path / "server.log"),
+        motd_file=str(tmp_path / "MOTD"),
+    )
+
+    async def run():
+        server = Server(config, Game())
+        await server.start()
+        running = asyncio.create_task(server.serve_forever())
+        uri = f"ws://127.0.0.1:{config.websocket_port}"
+        async with (
+            asyncio.timeout(10),
+            websockets.asyncio.client.connect(uri) as websocket,
+        ):
+            received = b""
+            while b"Welcome!" not in received:
+                received += await websocket.recv()
+            await websocket.send(b"x" * 1000 + b"\nxyzzy\n")
+            while b"Huh?" not in received:
+                received += await websocket.recv()
+        running.cancel()
+        await asyncio.wait([running])
+        return received
+
+    assert b"Line too long, ignored." in asyncio.run(run())
+
+
+def test_fork_save(tmp_path):
+    db_file = tmp_path / "world.sav"
+    config = Config(
+        db_file=str(db_file), log_file=str(tmp_path / "server.log"), save_mode="fork"
+    )
+    server = Server(config, Game())
+    server.game.db.add(Thing("souvenir"))
+    asyncio.run(server.save_world())
+
+    assert server.game.db.changes == 0
+    assert server.save_child is None
+    db = Database()
+    db.load(db_file)
+    assert [x.name for x in db.list_all()] == ["souvenir"]
+
+
+def test_autosave_adapts(tmp_path):
+    config = Config(
+        db_file=str(tmp_path / "world.sav"),
+        log_file=str(tmp_path / "server.log"),
+        autosave_period=300,
+        autosave_changes=1000,
+        autosave_min_period=30,
+    )
+    server = Server(config, Game())
+    server.last_save -= 10
+    assert 289 < server.autosave_delay() <= 290
+
+    server.game.db._changed = set(range(500))  # 1000 changes in 20s
+    assert 19 < server.autosave_delay() <= 20
+
+    server.game.db._changed = set(range(5000))
+    assert 19 < server.autosave_delay() <= 20  # 30s minimum
+
+    server.save_duration = 30.0  # slow saves get spaced out
+    assert server.autosave_delay() > 500
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeProcess:
+    pid = 0
+
+    def kill(self):
+        pass
+
+
+def test_hot_restart_hands_everything_over(tmp_path, monkeypatch):
+    config = Config(
+        listen_address="localhost",
+        listen_port=free_port(),
+        websocket_enabled=True,
+        websocket_address="127.0.0.1",
+        websocket_port=free_port(),
+        portal_enabled=True,
+        portal_ip="127.0.0.1",
+        portal_port=free_port(),
+        db_file=str(tmp_path / "world.sav"),
+        log_file=str(tmp_path / "server.log"),
+        motd_file=str(tmp_path / "MOTD"),
+        restart_timeout=5,
+    )
+    servers = []
+    starting = []
+
+    def spawn(args):
+        # the new process, in this one
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        servers.append(Server(config, Game()))
+        starting.append(
+            asyncio.create_task(servers[-1].start(handoff_fd=theirs.detach()))
+        )
+        return ours, FakeProcess()
+
+    monkeypatch.setattr(handoff, "spawn", spawn)
+
+    def kinds(server):
+        return sorted(kind for kind, _ in server.listening_sockets())
+
+    async def run():
+        servers.append(Server(config, Game()))
+        await servers[0].start()
+        listening = kinds(servers[0])
+        running = [asyncio.create_task(servers[0].serve_forever())]
+        reader, writer = await asyncio.open_connection("127.0.0.1", config.listen_port)
+        async with asyncio.timeout(10):
+            await reader.readuntil(b"Welcome!\n")
+            for _ in range(2):
+                await servers[-1].hot_restart()
+                await starting[-1]
+                await asyncio.wait([running[-1]])  # the old one is done
+                running.append(asyncio.create_task(servers[-1].serve_forever()))
+                await reader.readuntil(b"Server restarted in")
+                writer.write(b"xyzzy\n")
+                await reader.readuntil(b"Huh?\n")
+
+            assert kinds(servers[-1]) == listening
+            _, other = await asyncio.open_connection("127.0.0.1", config.listen_port)
+            other.close()
+            uri = f"ws://127.0.0.1:{config.websocket_port}"
+            async with websockets.asyncio.client.connect(uri) as websocket:
+                assert b"Welcome!" in await websocket.recv()
+            writer.close()
+        running[-1].cancel()
+        await asyncio.wait([running[-1]])
+
+    asyncio.run(run())
+
+
+def test_untracked_containers_need_full_saves(tmp_path):
+    config = Config(
+        db_file=str(tmp_path / "world.sav"),
+        log_file=str(tmp_path / "server.log"),
+        track_containers=False,
+        journal=True,
+    )
+    with pytest.raises(ValueError, match="track_containers"):
+        Server(config, Game())
+    config.journal = False
+    assert not Server(config, Game()).game.db.track_containers
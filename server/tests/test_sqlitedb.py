@@ -0,0 +1,65 @@
+import gc
+
+from mushroom.db import Database, DbProxy
+from mushroom.sqlitedb import SqliteDatabase, migrate
+from mushroom.world import Room, Thing
+
+
+def test_lazy_loading(new_game, make_world, tmp_path):
+    db = SqliteDatabase(cache_size=0)
+    new_game.use_database(db)
+    db.load(tmp_path / "world.db")
+    room_id = db.get_id(make_world(db))
+    db.save(None)
+    gc.collect()
+    assert len(db._objects) == 0  # nothing in use
+
+    balls = db.search("ball", type=Thing)
+    assert [b.name for b in balls] == ["red ball", "blue ball"]
+    assert "_ghost" in balls[0].__dict__
+    room = balls[0].location
+    assert db.get_id(room) == room_id
+    assert room.contents[0] is balls[0]
+
+    room.name = "great hall"
+    assert db.changes == 1
+    db.save(None)
+    reloaded = SqliteDatabase()
+    reloaded.load(tmp_path / "world.db")
+    assert reloaded.get(room_id).name == "great hall"
+
+
+def test_soft_code_database(new_game, make_world, tmp_path):
+    db = SqliteDatabase(cache_size=0)
+    new_game.use_database(db)
+    db.load(tmp_path / "world.db")
+    proxy = DbProxy(db)
+    room_id = db.get_id(make_world(db))
+    db.save(None)
+    gc.collect()
+    assert [x.name for x in proxy.search("hall")] == ["hall"]
+    assert [x.name for x in proxy.search(type=Room)] == ["hall"]
+
+    box_id = db.get_id(proxy.add(Thing("box")))
+    proxy.remove(proxy.get(room_id))
+    gc.collect()
+    assert db.get(box_id).name == "box"
+    assert db.get(room_id) is None
+    db.save(None)
+    reloaded = SqliteDatabase()
+    reloaded.load(tmp_path / "world.db")
+    assert reloaded.get(box_id).name == "box"
+    assert reloaded.get(room_id) is None
+
+
+def test_migrate(game, make_world, tmp_path):
+    db = Database()
+    room = make_world(db)
+    db.dump(tmp_path / "world.sav")
+    migrate(tmp_path / "world.sav", tmp_path / "world.db")
+
+    migrated = SqliteDatabase()
+    migrated.load(tmp_path / "world.db")
+    hall = migrated.get(db.get_id(room))
+    assert [x.name for x in hall.contents] == ["red ball", "blue ball", "chair"]
+    assert hall.contents[2].location is hall
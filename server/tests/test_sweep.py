@@ -0,0 +1,78 @@
+import pytest
+
+from mushroom import util
+from mushroom.sweep import Sweep
+from mushroom.world import Player, Room, Thing
+
+
+@pytest.fixture
+def db(new_game):
+    return new_game.db
+
+
+def sweep(db, reclaim=False, budget=0.001):
+    sweep = Sweep(db, reclaim=reclaim)
+    while not sweep.step(budget):
+        pass
+    return sweep
+
+
+def test_sweep(db):
+    hall = db.add(Room("hall"))
+    player = db.add(Player("bob"))
+    util.moveto(player, hall)
+    ball = db.add(Thing("ball"))
+    util.moveto(ball, player)
+    lost = db.add(Thing("lost"))
+    util.moveto(lost, hall)
+    util.moveto(lost, None)
+    gone = db.add(Thing("gone"))
+    util.moveto(gone, hall)
+    db.remove(gone)
+
+    found = sweep(db)
+    assert found.unreachable == [db.get_id(lost)]
+    assert found.dangling == [(db.get_id(hall), "contents", gone)]
+    assert db.get_id(lost) is not None
+    assert db._marking is None
+
+
+def test_sweep_while_moving(db):
+    rooms = [db.add(Room(f"room {i}")) for i in range(300)]
+    things = [db.add(Thing(f"thing {i}")) for i in range(300)]
+    for room, thing in zip(rooms, things, strict=True):
+        util.moveto(thing, room)
+    found = Sweep(db)
+    found.step(0.0005)
+    # into a room the sweep may be done with, out of ones it may not be
+    for thing in things:
+        util.moveto(thing, rooms[0])
+    while not found.step(0.0005):
+        pass
+    assert found.unreachable == [] and found.slices > 1
+
+
+def test_reclaim(db):
+    hall = db.add(Room("hall"))
+    lost = [db.add(Thing(f"lost {i}")) for i in range(3)]
+    lost[0].friend = lost[1]
+    found = sweep(db, reclaim=True)
+    assert found.reclaimed == 3
+    assert db.search(type=Thing) == []
+    assert db.search() == [hall]
+
+
+def test_sweep_while_referring(db):
+    hall = db.add(Room("hall"))
+    for i in range(1000):
+        util.moveto(db.add(Thing(f"thing {i}")), hall)
+    lost, found = db.add(Thing("lost")), db.add(Thing("found"))
+    lost.friend = found
+    swept = Sweep(db)
+    while swept._phase != swept._find_unreachable:
+        swept.step(0.000001)
+    # from an object marked already, while unreachable ones are looked for
+    hall.lost = lost
+    while not swept.step(0.000001):
+        pass
+    assert swept.unreachable == [] and swept.dangling == []
@@ -0,0 +1,15 @@
+from mushroom import telnet
+
+
+def test_parser_strips_commands():
+    received = []
+    parser = telnet.Parser(lambda cmd, opt: received.append((cmd, opt)))
+    data = b"lo" + telnet.command(telnet.DO, telnet.COMPRESS2) + b"ok\xff\xff"
+    assert parser.feed(data[:3]) == b"lo"
+    assert parser.feed(data[3:]) == b"ok\xff"
+    assert received == [(telnet.DO, telnet.COMPRESS2)]
+
+
+def test_parser_drops_subnegotiations():
+    parser = telnet.Parser(lambda cmd, opt: None)
+    assert parser.feed(b"a" + telnet.subnegotiation(24, b"\x00xterm") + b"b") == b"ab"
@@ -11,3 +11,11 @@ def test_is_room(room):
 
 def test_is_thing(thing):
     assert util.is_thing(thing) is True
+
+
+def test_token_bucket():
+    bucket = util.TokenBucket(rate=1, burst=2)
+    assert bucket.take()
+    assert bucket.take()
+    assert not bucket.take()
+    assert 0 < bucket.delay() <= 1
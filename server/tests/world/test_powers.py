@@ -1,4 +1,5 @@
-from mushroom.world import powers
+from mushroom import util
+from mushroom.world import Room, Thing, powers
 
 
 def test_setattr_dbref(player, client, game):
@@ -6,3 +7,25 @@ def test_setattr_dbref(player, client, game):
     client.handle_input("setattr me blarg #0")
     assert hasattr(player, "blarg")
     assert player.blarg == game.db.get(0)
+
+
+def test_demolish(player, client, game, room):
+    player.powers.append(powers.Demolisher())
+    shed = game.db.add(Room("shed"))
+    room.exits.append(shed)
+    things = [game.db.add(Thing(name)) for name in ("rake", "hoe")]
+    for thing in things:
+        util.moveto(thing, shed)
+    client.handle_input("demolish shed")
+    assert game.db.get_id(shed) is None
+    assert all(thing.location is room for thing in things)
+
+    shed = game.db.add(Room("shed"))
+    room.exits.append(shed)
+    util.moveto(things[0], shed)
+    stuck = game.db.add(Thing("anvil"))
+    del stuck.location  # can't be moved
+    shed.contents.append(stuck)
+    client.handle_input("demolish shed")
+    assert game.db.get_id(shed) is not None and shed in room.exits
+    assert shed.contents == [things[0], stuck] and things[0].location is shed